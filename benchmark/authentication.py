@@ -0,0 +1,66 @@
+#!/usr/bin/python
+"""
+Benchmark principal lookups done by the authentication plugin.
+
+Every request looks up the principal of the logged in person; compare
+the cost with and without the shared principal cache.
+"""
+
+from benchmark import *
+
+import transaction
+from zope.component import getUtility, provideUtility
+from zope.component.hooks import setSite
+
+from schooltool.app.interfaces import ISchoolToolAuthenticationPlugin
+from schooltool.app.interfaces import IPrincipalCache
+from schooltool.app.security import PrincipalCache
+from schooltool.person.person import Person
+from schooltool.group.group import Group
+
+
+def setup_benchmark():
+    setup = load_ftesting_zcml()
+    r = http("""POST /@@contents.html HTTP/1.1
+Authorization: Basic mgr:mgrpw
+Content-Length: 81
+Content-Type: application/x-www-form-urlencoded
+
+type_name=BrowserAdd__schooltool.app.app.SchoolToolApplication&new_value=frogpond""")
+    assert r.getStatus() == 303
+
+    app = setup.getRootFolder()['frogpond']
+    setSite(app)
+    create_person_in_groups(app)
+    transaction.commit()
+
+
+def create_person_in_groups(app, count=50):
+    """Create a user 'manager' who is a member of many groups."""
+    person = Person('manager', 'Manager')
+    app['persons']['manager'] = person
+    for i in range(count):
+        group = Group('Group %d' % i)
+        app['groups']['group%d' % i] = group
+        group.members.add(person)
+
+
+def principal_lookups(count=1000):
+    plugin = getUtility(ISchoolToolAuthenticationPlugin)
+    for n in range(count):
+        plugin.getPrincipal('sb.person.manager')
+
+
+def main():
+    print "ZCML took %.3f seconds." % measure(load_ftesting_zcml)
+    print "Setup took %.3f seconds." % measure(setup_benchmark)
+    provideUtility(PrincipalCache(size=0), IPrincipalCache)
+    benchmark("1000 principal lookups without the principal cache",
+              principal_lookups)
+    provideUtility(PrincipalCache(), IPrincipalCache)
+    benchmark("1000 principal lookups with the principal cache",
+              principal_lookups)
+
+
+if __name__ == '__main__':
+    main()
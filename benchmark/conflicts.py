@@ -0,0 +1,83 @@
+#!/usr/bin/python
+"""
+Benchmark write conflicts on objects many users change at once.
+
+Several clients add notes and calendar events to the same objects;
+every client has its own connection and commits in turn, so each of
+them changes an object another client changed since its transaction
+began.  Compare the conflict rates of persistent lists and dicts with
+the conflict resolving containers in schooltool.app.conflicts.
+"""
+
+from benchmark import *
+
+import os
+import shutil
+import tempfile
+
+import transaction
+from persistent.dict import PersistentDict
+from persistent.list import PersistentList
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+from ZODB.POSException import ConflictError
+
+from schooltool.app.conflicts import AppendLog, BTreeMap
+
+
+def append(log, n):
+    log.append(n)
+
+
+def insert(mapping, n):
+    mapping[n] = n
+
+
+def concurrent_writes(factory, change, clients=4, rounds=250):
+    """Return the number of conflicts of all commits."""
+    tempdir = tempfile.mkdtemp()
+    db = DB(FileStorage(os.path.join(tempdir, 'Data.fs')))
+    try:
+        managers = [transaction.TransactionManager() for n in range(clients)]
+        connections = [db.open(transaction_manager=tm) for tm in managers]
+        connections[0].root()['obj'] = factory()
+        managers[0].commit()
+        conflicts = 0
+        for n in range(rounds):
+            for tm, conn in zip(managers, connections):
+                tm.abort()
+            for client, (tm, conn) in enumerate(zip(managers, connections)):
+                change(conn.root()['obj'], (n, client))
+            for tm in managers:
+                try:
+                    tm.commit()
+                except ConflictError:
+                    tm.abort()
+                    conflicts += 1
+        for conn in connections:
+            conn.close()
+        return conflicts
+    finally:
+        db.close()
+        shutil.rmtree(tempdir)
+
+
+def report(title, factory, change, clients=4, rounds=250):
+    commits = clients * rounds
+    conflicts = [None]
+    def run():
+        conflicts[0] = concurrent_writes(factory, change, clients, rounds)
+    benchmark("%s, %d concurrent commits" % (title, commits), run, count=1)
+    print "%d of %d commits conflicted (%.0f%%)" % (
+        conflicts[0], commits, 100.0 * conflicts[0] / commits)
+
+
+def main():
+    report("Notes in a PersistentList", PersistentList, append)
+    report("Notes in an AppendLog", AppendLog, append)
+    report("Events in a PersistentDict", PersistentDict, insert)
+    report("Events in a BTreeMap", BTreeMap, insert)
+
+
+if __name__ == '__main__':
+    main()
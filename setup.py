@@ -64,6 +64,7 @@ Javascript will be usable, although perhaps not very nice or convenient.""",
                       'PasteDeploy',
                       'PasteScript',
                       'Pillow',
+                      'PyPDF2',
                       'pytz',
                       'reportlab',
                       'setuptools',
@@ -165,6 +166,8 @@ Javascript will be usable, although perhaps not very nice or convenient.""",
     start-schooltool-instance = schooltool.paste.run:main
     make-schooltool-instance = schooltool.paste.instance:make_schooltool_instance
     schooltool-server = schooltool.app.main:main
+    schooltool-sampledata = schooltool.sampledata.main:main
+    schooltool-catalog-check = schooltool.app.catalogcheck:main
 
     [paste.paster_create_template]
     schooltool_deploy = schooltool.paste.templates:SchoolToolDeploy
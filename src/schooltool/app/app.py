@@ -48,6 +48,7 @@ from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.app.interfaces import IApplicationPreferences, IApplicationTabs
 from schooltool.app.interfaces import IRequestHelpers, IRequestHelper
 from schooltool.app import relationships
+from schooltool.app.conflicts import BTreeMap
 from schooltool.app.interfaces import IAsset
 from schooltool.relationship.relationship import RelationshipProperty
 from schooltool.common import getRequestFromInteraction
@@ -249,7 +250,7 @@ class ApplicationPreferences(Persistent):
         return 'UTC'
 
 
-class ApplicationTabs(PersistentDict):
+class ApplicationTabs(BTreeMap):
     """Object for storing application tab preferences.
 
     See schooltool.app.interfaces.ApplicationTabs.
@@ -18,12 +18,19 @@
 """
 SchoolTool catalogs.
 """
+import itertools
+import logging
+import threading
+
+import transaction
+from ZODB.POSException import ConflictError
+from zope.app.publication.zopepublication import ZopePublication
 from zope.interface import implementer, implements, implementsOnly
 from zope.intid.interfaces import IIntIds, IIntIdAddedEvent, IIntIdRemovedEvent
 from zope.component import adapter, queryUtility, getUtility
-from zope.component.hooks import getSite
+from zope.component.hooks import getSite, setSite
 from zope.container import btree
-from zope.container.contained import Contained
+from zope.container.contained import Contained, containedEvent
 from zope.lifecycleevent import IObjectModifiedEvent
 from zope.security.proxy import removeSecurityProxy
 
@@ -35,11 +42,19 @@ from schooltool.app.interfaces import ICatalogStartUp
 from schooltool.app.interfaces import ICatalogs
 from schooltool.app.interfaces import IVersionedCatalog
 from schooltool.app.app import ActionBase
+from schooltool.generations.steps import EvolveStep, clearCheckpoints
 from schooltool.table.catalog import FilterImplementing
 
 
+log = logging.getLogger('schooltool.app.catalog')
+
 APP_CATALOGS_KEY = 'schooltool.app.catalog:Catalogs'
 
+# Catalogs of a new version are built in the background under this key
+# suffix, while queries keep using the previous version.
+PENDING_SUFFIX = u':pending'
+REBUILD_CHECKPOINT_PREFIX = u'catalog-rebuild:'
+
 
 class CatalogStartupBase(ActionBase):
     implementsOnly(ICatalogStartUp)
@@ -61,20 +76,45 @@ class VersionedCatalog(Contained):
     implements(IVersionedCatalog)
 
     expired = False
+    ready = True
     version = 0
     catalog = None
 
-    def __init__(self, catalog, version):
+    def __init__(self, catalog, version, ready=True):
         self.catalog = catalog
         self.catalog.__parent__ = self
         self.catalog.__name__ = 'catalog'
         self.version = version
+        self.ready = ready
 
     def __repr__(self):
         return '<%s v. %r>: %s' % (
             self.__class__.__name__, self.version, self.catalog)
 
 
+class IndexCollector(dict):
+    """Stands in for a catalog in setIndexes, collecting the indexes."""
+
+    def __init__(self):
+        dict.__init__(self)
+        self.names = []
+
+    def __setitem__(self, name, index):
+        if name not in self:
+            self.names.append(name)
+        dict.__setitem__(self, name, index)
+
+    def addTo(self, catalog):
+        """Add the indexes to the catalog without indexing anything.
+
+        No ObjectAddedEvent is sent: catalogs index all objects into a
+        new index when they get one.
+        """
+        for name in self.names:
+            index, event = containedEvent(self[name], catalog, name)
+            catalog._setitemf(name, index)
+
+
 class PrepareCatalogContainer(CatalogStartupBase):
 
     def __call__(self):
@@ -119,23 +159,49 @@ class CatalogFactory(CatalogStartupBase):
     def setIndexes(self, catalog):
         raise NotImplementedError()
 
+    def createPendingCatalog(self, catalogs, version):
+        """Create an empty catalog to be filled by rebuildCatalogs."""
+        pending_key = self.key() + PENDING_SUFFIX
+        clearCheckpoints(
+            catalogs._p_jar,
+            prefix=REBUILD_CHECKPOINT_PREFIX + pending_key)
+        catalog = self.createCatalog()
+        catalogs[pending_key] = VersionedCatalog(catalog, version,
+                                                 ready=False)
+        # Objects are indexed by the background rebuild.
+        indexes = IndexCollector()
+        self.setIndexes(indexes)
+        indexes.addTo(catalog)
+
     def __call__(self):
         app = ISchoolToolApplication(None)
         catalogs = ICatalogs(app)
         key = self.key()
+        pending_key = key + PENDING_SUFFIX
         version = self.getVersion()
 
-        if key in catalogs:
-            if catalogs[key].version == version:
-                catalogs[key].expired = False
+        if key in catalogs and catalogs[key].version == version:
+            catalogs[key].expired = False
+            return
+
+        if key in catalogs and catalogs._p_jar is not None:
+            # Keep serving the old catalog until the new one is built.
+            catalogs[key].expired = False
+            if (pending_key in catalogs and
+                catalogs[pending_key].version == version):
+                catalogs[pending_key].expired = False
             else:
-                del catalogs[key]
+                if pending_key in catalogs:
+                    del catalogs[pending_key]
+                self.createPendingCatalog(catalogs, version)
+            return
 
-        if key not in catalogs:
-            catalog = self.createCatalog()
-            catalogs[key] = VersionedCatalog(catalog, version)
-            # XXX: if setIndexes throw, delete the catalog and rethrow
-            self.setIndexes(catalog)
+        if key in catalogs:
+            del catalogs[key]
+        catalog = self.createCatalog()
+        catalogs[key] = VersionedCatalog(catalog, version)
+        # XXX: if setIndexes throw, delete the catalog and rethrow
+        self.setIndexes(catalog)
 
 
 class CatalogImplementing(CatalogFactory):
@@ -217,6 +283,126 @@ def unindexDocSubscriber(event):
         entry.catalog.unindex_doc(obj_id)
 
 
+class CatalogRebuildStep(EvolveStep):
+    """Index all objects in a pending catalog, in chunks.
+
+    Objects added, changed or removed meanwhile are indexed by the
+    usual subscribers, as the pending catalog is in the catalogs
+    container already.
+    """
+
+    batch_size = 500
+
+    def __init__(self, connection, catalogs, pending_key, batch_size=None):
+        self.entry = catalogs[pending_key]
+        self.intids = getUtility(IIntIds)
+        name = u'%s%s:%s' % (REBUILD_CHECKPOINT_PREFIX, pending_key,
+                             self.entry.version)
+        super(CatalogRebuildStep, self).__init__(
+            connection, name=name, batch_size=batch_size)
+        self.title = 'Rebuilding %s' % pending_key[:-len(PENDING_SUFFIX)]
+
+    def total(self):
+        return len(self.intids)
+
+    def units(self, after):
+        # The step commits after every batch and requests change intids
+        # meanwhile, so keys are read anew for every batch.
+        while True:
+            if after is None:
+                uids = self.intids.refs.keys()
+            else:
+                uids = self.intids.refs.keys(min=after, excludemin=True)
+            batch = list(itertools.islice(uids, self.batch_size))
+            if not batch:
+                return
+            for uid in batch:
+                yield uid, uid
+            after = batch[-1]
+
+    def process(self, uid):
+        obj = self.intids.queryObject(uid)
+        if obj is not None:
+            self.entry.catalog.index_doc(uid, obj)
+
+
+def activatePendingCatalog(catalogs, pending_key):
+    """Replace the catalog in use with the pending one, which is built."""
+    key = pending_key[:-len(PENDING_SUFFIX)]
+    entry = catalogs[pending_key]
+    del catalogs[pending_key]
+    if key in catalogs:
+        del catalogs[key]
+    entry.ready = True
+    catalogs[key] = entry
+
+
+def rebuildCatalog(connection, catalogs, pending_key, batch_size=None):
+    CatalogRebuildStep(connection, catalogs, pending_key,
+                       batch_size=batch_size)()
+    activatePendingCatalog(catalogs, pending_key)
+    clearCheckpoints(connection,
+                     prefix=REBUILD_CHECKPOINT_PREFIX + pending_key)
+    transaction.commit()
+    log.info("Switched to the new version of %s",
+             pending_key[:-len(PENDING_SUFFIX)])
+
+
+def rebuildPendingCatalog(connection, catalogs, pending_key, retries=5):
+    """Rebuild a pending catalog, retry on conflicts.
+
+    Returns True if the catalog was built.  On other errors, or when
+    out of retries, the old catalog stays in use until the next start.
+    """
+    for attempt in range(retries):
+        try:
+            rebuildCatalog(connection, catalogs, pending_key)
+            return True
+        except ConflictError:
+            # The step continues from its last checkpoint.
+            transaction.abort()
+            log.warning("Conflict while rebuilding %s, retrying",
+                        pending_key)
+        except Exception:
+            transaction.abort()
+            log.exception("Failed to rebuild %s, giving up", pending_key)
+            return False
+    log.error("Could not rebuild %s after %d conflicts, giving up",
+              pending_key, retries)
+    return False
+
+
+def rebuildCatalogs(db, retries=5):
+    """Build all pending catalogs of the application."""
+    last_site = getSite()
+    connection = None
+    try:
+        connection = db.open()
+        app = connection.root()[ZopePublication.root_name]
+        setSite(app)
+        catalogs = ICatalogs(app)
+        pending = [key for key in catalogs if key.endswith(PENDING_SUFFIX)]
+        for pending_key in pending:
+            rebuildPendingCatalog(connection, catalogs, pending_key,
+                                  retries=retries)
+    except Exception:
+        log.exception("Catalog rebuild failed")
+    finally:
+        transaction.abort()
+        setSite(last_site)
+        if connection is not None:
+            connection.close()
+
+
+def startCatalogRebuilds(db):
+    """Build pending catalogs in a background thread."""
+    thread = threading.Thread(target=rebuildCatalogs, args=(db, ),
+                              name='schooltool.app.catalog.rebuild')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
 def appendGlobbing(text):
     words = filter(None, text.split(' '))
     return ' '.join([word.endswith('*') and word or ('%s*' % word)
@@ -0,0 +1,350 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Catalog consistency checks.
+
+Catalogs are kept up to date by event subscribers only.  The checker
+compares the extent and index values of every catalog with what
+indexing the objects registered in the IntIds utility would store, in
+batches, and can repair just the documents that differ.
+
+Usage: schooltool-catalog-check -c schooltool.conf [--repair] [catalog ...]
+"""
+import itertools
+import logging
+import sys
+
+import transaction
+from ZODB.POSException import ConflictError
+from zope.app.publication.zopepublication import ZopePublication
+from zope.catalog.attribute import AttributeIndex
+from zope.component import getUtility
+from zope.component.hooks import getSite, setSite
+from zope.intid.interfaces import IIntIds
+from zc.catalog.index import ValueIndex, SetIndex
+from zc.catalog.interfaces import IExtentCatalog
+
+from schooltool.app.catalog import PENDING_SUFFIX
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.app.interfaces import ICatalogs
+from schooltool.app.main import SchoolToolCommand
+from schooltool.task.tasks import RemoteTask
+
+
+log = logging.getLogger('schooltool.app.catalog')
+
+# Value of indexes the checker does not know how to compute.
+UNKNOWN = object()
+
+
+def expectedValue(index, obj):
+    """Return the value the index would store for the object.
+
+    Returns None if the object would not be indexed and UNKNOWN if
+    values of this index cannot be checked.
+    """
+    if not isinstance(index, (ValueIndex, SetIndex)):
+        return UNKNOWN
+    value_factory = getattr(index, 'value_factory', None)
+    if value_factory is not None:
+        value = value_factory(obj)
+    elif isinstance(index, AttributeIndex):
+        if index.interface is not None:
+            obj = index.interface(obj, None)
+            if obj is None:
+                return None
+        value = getattr(obj, index.field_name, None)
+        if value is not None and index.field_callable:
+            value = value()
+    else:
+        return UNKNOWN
+    if value is not None and isinstance(index, SetIndex):
+        value = set([v for v in value if v is not None]) or None
+    return value
+
+
+def storedValue(index, docid):
+    value = index.documents_to_values.get(docid)
+    if value is not None and isinstance(index, SetIndex):
+        value = set(value)
+    return value
+
+
+class CatalogDrift(object):
+    """Documents of a catalog that differ from the indexed objects."""
+
+    def __init__(self, name):
+        self.name = name
+        self.checked = 0
+        self.missing = []
+        self.stale = []
+        self.changed = []
+        self.errors = []
+        self.repaired = 0
+
+    def __len__(self):
+        return len(self.missing) + len(self.stale) + len(self.changed)
+
+    def summary(self):
+        text = '%s: %d checked, %d missing, %d stale, %d changed' % (
+            self.name, self.checked, len(self.missing), len(self.stale),
+            len(self.changed))
+        if self.errors:
+            text += ', %d errors' % len(self.errors)
+        if self.repaired:
+            text += ', %d repaired' % self.repaired
+        return text
+
+
+class CatalogChecker(object):
+    """Check (and repair) catalogs of the application in batches.
+
+    Objects registered in IntIds are loaded once and checked against all
+    catalogs.  Every batch_size documents the transaction is committed (if
+    commit is set) or a savepoint is made, and the connection cache is
+    cleaned.  Conflicts are not recorded as errors, they abort the check.
+    """
+
+    batch_size = 1000
+
+    def __init__(self, app, repair=False, commit=False, batch_size=None):
+        self.app = app
+        self.repair = repair
+        self.commit = commit
+        if batch_size is not None:
+            self.batch_size = batch_size
+        self.intids = getUtility(IIntIds)
+        self.pending = 0
+
+    def catalogs(self, names=None):
+        catalogs = ICatalogs(self.app)
+        for name, entry in sorted(catalogs.items()):
+            if name.endswith(PENDING_SUFFIX):
+                # Still being built.
+                continue
+            if names and name not in names:
+                continue
+            yield name, entry.catalog
+
+    def step(self):
+        self.pending += 1
+        if self.pending < self.batch_size:
+            return
+        self.pending = 0
+        if self.commit:
+            transaction.commit()
+        else:
+            transaction.savepoint(optimistic=True)
+        jar = getattr(self.app, '_p_jar', None)
+        if jar is not None:
+            jar.cacheGC()
+
+    def checkDocument(self, catalog, docid, obj, drift):
+        indexed = True
+        if IExtentCatalog.providedBy(catalog):
+            extent = catalog.extent
+            addable = getattr(extent, 'addable', None)
+            expected = addable is None or bool(addable(docid, obj))
+            indexed = docid in extent
+            if expected and not indexed:
+                drift.missing.append(docid)
+                return
+            if indexed and not expected:
+                drift.stale.append(docid)
+                return
+            if not indexed:
+                return
+        for name, index in catalog.items():
+            value = expectedValue(index, obj)
+            if value is UNKNOWN:
+                continue
+            if value != storedValue(index, docid):
+                drift.changed.append((docid, name))
+
+    def indexedDocuments(self, catalog):
+        docids = set()
+        if IExtentCatalog.providedBy(catalog):
+            docids.update(catalog.extent)
+        for index in catalog.values():
+            if isinstance(index, (ValueIndex, SetIndex)):
+                docids.update(index.documents_to_values.keys())
+        return docids
+
+    def documents(self):
+        """Yield (docid, object) pairs of the IntIds utility.
+
+        Keys are read a batch at a time, starting after the last one seen,
+        so that the walk survives commits made in between.
+        """
+        refs = self.intids.refs
+        last = None
+        while True:
+            if last is None:
+                keys = refs.keys()
+            else:
+                keys = refs.keys(min=last, excludemin=True)
+            batch = list(itertools.islice(keys, self.batch_size))
+            if not batch:
+                return
+            for docid in batch:
+                obj = self.intids.queryObject(docid)
+                if obj is not None:
+                    yield docid, obj
+            last = batch[-1]
+
+    def check(self, catalogs):
+        """Check the catalogs, loading every registered object once."""
+        drifts = [(CatalogDrift(name), catalog) for name, catalog in catalogs]
+        if not drifts:
+            return []
+        for docid, obj in self.documents():
+            for drift, catalog in drifts:
+                try:
+                    self.checkDocument(catalog, docid, obj, drift)
+                except ConflictError:
+                    raise
+                except Exception, e:
+                    drift.errors.append((docid, e))
+                drift.checked += 1
+            self.step()
+        for drift, catalog in drifts:
+            self.checkIndexed(catalog, drift)
+            if self.repair:
+                self.repairDrift(catalog, drift)
+            log.info(drift.summary())
+        return [drift for drift, catalog in drifts]
+
+    def checkIndexed(self, catalog, drift):
+        """Find documents indexed, but not known to IntIds any more."""
+        extent = getattr(catalog, 'extent', None)
+        missing = set(drift.missing)
+        for docid in sorted(self.indexedDocuments(catalog)):
+            if docid not in self.intids.refs:
+                drift.stale.append(docid)
+            elif extent is not None and docid not in extent:
+                if docid not in missing:
+                    drift.stale.append(docid)
+
+    def repairDrift(self, catalog, drift):
+        reindex = set(drift.missing)
+        reindex.update([docid for docid, name in drift.changed])
+        stale = set(drift.stale)
+        for docid in sorted(stale):
+            for index in catalog.values():
+                index.unindex_doc(docid)
+            extent = getattr(catalog, 'extent', None)
+            if extent is not None:
+                extent.discard(docid)
+            drift.repaired += 1
+            self.step()
+        for docid in sorted(reindex - stale):
+            obj = self.intids.queryObject(docid)
+            if obj is None:
+                continue
+            catalog.index_doc(docid, obj)
+            drift.repaired += 1
+            self.step()
+        if self.commit:
+            transaction.commit()
+
+    def __call__(self, names=None):
+        return self.check(list(self.catalogs(names)))
+
+
+class CatalogCheckTask(RemoteTask):
+    """Check and repair all catalogs, i.e. nightly."""
+
+    routing_key = "zodb.report"
+
+    repair = True
+
+    def __init__(self, repair=True):
+        RemoteTask.__init__(self)
+        self.repair = repair
+
+    def execute(self, request):
+        app = ISchoolToolApplication(None)
+        checker = CatalogChecker(app, repair=self.repair, commit=True)
+        return '\n'.join([drift.summary() for drift in checker()])
+
+
+def scheduleCatalogCheck(request=None, repair=True):
+    task = CatalogCheckTask(repair=repair)
+    return task.schedule(request)
+
+
+class CatalogCheckOptions(SchoolToolCommand.Options):
+    repair = False
+    catalogs = ()
+
+
+class CatalogCheckScript(SchoolToolCommand):
+
+    Options = CatalogCheckOptions
+
+    short_options = 'c:rh'
+    long_options = ['config=', 'repair', 'help']
+
+    def usage(self, progname):
+        return "\n".join([
+            "Usage: %s -c schooltool.conf [options] [catalog ...]" % progname,
+            "Options:",
+            "  -c, --config xxx       use this configuration file",
+            "  -r, --repair           reindex documents that differ",
+            "  -h, --help             show this help message",
+            ])
+
+    def handleOption(self, options, opt, value, progname):
+        if opt in ('-r', '--repair'):
+            options.repair = True
+
+    def handleArguments(self, options, args):
+        options.catalogs = args
+
+    def checkCatalogs(self, db, options):
+        connection = db.open()
+        root = connection.root()
+        app = root[ZopePublication.root_name]
+        last_site = getSite()
+        setSite(app)
+        try:
+            checker = CatalogChecker(app, repair=options.repair,
+                                     commit=options.repair)
+            return checker(options.catalogs)
+        finally:
+            transaction.abort()
+            setSite(last_site)
+            connection.close()
+
+    def main(self, argv=sys.argv):
+        options = self.load_options(argv)
+        db = self.setup(options)
+        drifts = self.checkCatalogs(db, options)
+        db.close()
+        for drift in drifts:
+            print drift.summary()
+        if [drift for drift in drifts if len(drift) and not drift.repaired]:
+            sys.exit(1)
+
+
+def main():
+    CatalogCheckScript().main()
+
+
+if __name__ == '__main__':
+    main()
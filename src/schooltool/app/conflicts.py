@@ -0,0 +1,196 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Persistent structures for objects many users write to at once.
+
+A PersistentList or PersistentDict is stored as one record, so two
+transactions that add to the same one conflict, and one of them is
+retried.  AppendLog and BTreeMap keep items in BTrees (which merge
+changes to different keys) and count them in BTrees.Length counters
+(which merge concurrent increments).
+"""
+import time
+
+from persistent import Persistent
+from BTrees.Length import Length
+from BTrees.LOBTree import LOBTree
+from BTrees.OOBTree import OOBTree
+
+
+_marker = object()
+
+
+class AppendLog(Persistent):
+    """A sequence of items that merges concurrent appends.
+
+    Items are kept in buckets of an LOBTree, so an append only stores
+    the last bucket.  Keys are a sequence number from a Length counter,
+    followed by the time of the append, so appends of concurrent
+    transactions get different keys, which the BTree merges.
+
+        >>> log = AppendLog(['a'])
+        >>> log.append('b')
+        >>> list(log), len(log), log[-1], log[0]
+        (['a', 'b'], 2, 'b', 'a')
+        >>> 'b' in log, 'c' in log
+        (True, False)
+        >>> log.remove('a')
+        >>> list(log), len(log)
+        (['b'], 1)
+        >>> log.clear()
+        >>> list(log), len(log)
+        ([], 0)
+
+    """
+
+    def __init__(self, items=()):
+        self._items = LOBTree()
+        self._sequence = Length()
+        self._length = Length()
+        for item in items:
+            self.append(item)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __len__(self):
+        return self._length()
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError(index)
+        return self._items.values()[index]
+
+    def __contains__(self, item):
+        for other in self:
+            if other == item:
+                return True
+        return False
+
+    def append(self, item):
+        sequence = self._sequence()
+        self._sequence.change(1)
+        key = (sequence << 32) | (int(time.time() * 1000000) & 0xffffffff)
+        self._items[key] = item
+        self._length.change(1)
+
+    def remove(self, item):
+        for key, other in self._items.items():
+            if other == item:
+                del self._items[key]
+                self._length.change(-1)
+                return
+        raise ValueError(item)
+
+    def clear(self):
+        self._items.clear()
+        self._length.set(0)
+
+
+class BTreeMap(Persistent):
+    """A mapping stored in an OOBTree, with a conflict free length.
+
+        >>> m = BTreeMap({'b': 2})
+        >>> m['a'] = 1
+        >>> m.setdefault('a', 3), m.get('c')
+        (1, None)
+        >>> len(m), list(m), m.items()
+        (2, ['a', 'b'], [('a', 1), ('b', 2)])
+        >>> m.pop('b'), 'b' in m, len(m)
+        (2, False, 1)
+        >>> m.clear()
+        >>> len(m), m.keys()
+        (0, [])
+
+    """
+
+    def __init__(self, items=()):
+        self._data = OOBTree()
+        self._length = Length()
+        self.update(items)
+
+    def __len__(self):
+        return self._length()
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    has_key = __contains__
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key not in self._data:
+            self._length.change(1)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._length.change(-1)
+
+    def pop(self, key, default=_marker):
+        if key in self._data:
+            value = self._data[key]
+            del self[key]
+            return value
+        if default is _marker:
+            raise KeyError(key)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self._data:
+            self[key] = default
+        return self._data[key]
+
+    def update(self, items=(), **kw):
+        if hasattr(items, 'items'):
+            items = items.items()
+        for key, value in items:
+            self[key] = value
+        for key, value in kw.items():
+            self[key] = value
+
+    def clear(self):
+        self._data.clear()
+        self._length.set(0)
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def values(self):
+        return list(self._data.values())
+
+    def items(self):
+        return list(self._data.items())
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        return iter(self._data.values())
+
+    def iteritems(self):
+        return iter(self._data.items())
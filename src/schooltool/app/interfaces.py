@@ -235,6 +235,19 @@ class ISchoolToolAuthenticationPlugin(ISchoolToolAuthentication):
     """A plugin for local schooltool authentication utility. """
 
 
+class IPrincipalCache(Interface):
+    """Principal data shared between requests."""
+
+    def get(key):
+        """Return data stored under the key, None if there is none."""
+
+    def set(key, data):
+        """Store principal data under the key."""
+
+    def clear():
+        """Forget all stored data."""
+
+
 class IVersionedCatalog(IContained):
     """Versioned catalog entry."""
 
@@ -67,8 +67,10 @@ from schooltool.person.interfaces import IPersonFactory
 from schooltool.app.interfaces import ICookieLanguageSelector
 from schooltool.app.interfaces import CatalogSetUpEvent
 from schooltool.app.interfaces import CatalogStartUpEvent
+from schooltool.app.catalog import startCatalogRebuilds
 from schooltool.utility.utility import setUpUtilities
 from schooltool.utility.utility import UtilitySpecification
+from schooltool.securitypolicy import profiler
 
 
 MANAGER_USERNAME = 'manager'
@@ -502,12 +504,22 @@ class SchoolToolMachinery(object):
             site_zcml=options.config.site_definition)
         setLanguage(options.config.lang)
         self.configureReportlab(options.config.reportlab_fontdir)
+        self.configureSecurityProfiler(options.config)
+
+    def configureSecurityProfiler(self, config):
+        rate = getattr(config, 'security_profile_rate', 0)
+        if not rate and getattr(config, 'devmode', False):
+            rate = 1.0
+        profiler.setSampleRate(rate)
 
 
 class SchoolToolServer(SchoolToolMachinery):
 
     system_name = "SchoolTool"
 
+    # Rebuild catalogs left pending by evolution in a background thread.
+    start_catalog_rebuilds = True
+
     def load_options(self, argv):
         """Parse the command line and read the configuration file."""
         options = self.Options()
@@ -639,6 +651,8 @@ class SchoolToolServer(SchoolToolMachinery):
         setSite(last_site)
         transaction.commit()
         connection.close()
+        if self.start_catalog_rebuilds:
+            startCatalogRebuilds(db)
 
     def restoreManagerUser(self, app, password):
         """Ensure there is a manager user
@@ -717,6 +731,64 @@ class SchoolToolServer(SchoolToolMachinery):
         db = self.setup(options)
 
 
+class SchoolToolCommand(SchoolToolServer):
+    """Base of command line scripts that work on the SchoolTool database.
+
+    Subclasses add their options with short_options, long_options and
+    handleOption, and get the positional arguments in handleArguments.
+    Catalogs pending a rebuild are left to the server.
+    """
+
+    start_catalog_rebuilds = False
+
+    short_options = 'c:h'
+    long_options = ['config=', 'help']
+
+    def usage(self, progname):
+        return "\n".join([
+            "Usage: %s -c schooltool.conf [options]" % progname,
+            "Options:",
+            "  -c, --config xxx       use this configuration file",
+            "  -h, --help             show this help message",
+            ])
+
+    def handleOption(self, options, opt, value, progname):
+        """Handle a command line option specific to the script."""
+
+    def handleArguments(self, options, args):
+        """Handle positional command line arguments."""
+
+    def load_options(self, argv):
+        """Parse the command line and read the configuration file."""
+        options = self.Options()
+        progname = os.path.basename(argv[0])
+        try:
+            opts, args = getopt.gnu_getopt(argv[1:], self.short_options,
+                                           self.long_options)
+        except getopt.error, e:
+            print >> sys.stderr, "%s: %s" % (progname, e)
+            sys.exit(1)
+        for k, v in opts:
+            if k in ('-h', '--help'):
+                print self.usage(progname)
+                sys.exit(0)
+            if k in ('-c', '--config'):
+                options.config_file = v
+            else:
+                self.handleOption(options, k, v, progname)
+        self.handleArguments(options, args)
+
+        if not options.config_file:
+            print >> sys.stderr, "No configuration file given"
+            sys.exit(1)
+        try:
+            options.config, handler = self.readConfig(options.config_file)
+        except ZConfig.ConfigurationError, e:
+            print >> sys.stderr, "%s: %s" % (progname, e)
+            sys.exit(1)
+        return options
+
+
 def main():
     SchoolToolServer().main()
 
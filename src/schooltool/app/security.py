@@ -19,9 +19,14 @@
 SchoolTool security infrastructure
 """
 
+import datetime
+import threading
 import urllib
+from collections import OrderedDict
 
 from persistent import Persistent
+from BTrees.Length import Length
+from zope.annotation.interfaces import IAnnotations
 from zope.component import getUtility, queryUtility
 from zope.component import getNextUtility
 from zope.container.contained import Contained
@@ -45,12 +50,15 @@ from schooltool.app.interfaces import ISchoolToolAuthentication
 from schooltool.app.interfaces import IAsset
 from schooltool.person.interfaces import IPerson
 from schooltool.app.interfaces import ISchoolToolAuthenticationPlugin
+from schooltool.app.interfaces import IPrincipalCache
+from schooltool.app.membership import URIMembership
 from schooltool.app.interfaces import ICalendarParentCrowd
 from schooltool.securitypolicy.interfaces import ICrowdDescription
 from schooltool.securitypolicy.crowds import Crowd, Description
 from schooltool.securitypolicy.crowds import ManagerGroupCrowd
 # XXX: move ConfigurableCrowd here
 from schooltool.securitypolicy.crowds import ConfigurableCrowd, ParentCrowd
+from schooltool.term.interfaces import IDateManager
 
 from schooltool.common import SchoolToolMessage as _
 
@@ -70,6 +78,78 @@ class Principal(Contained):
             return self._person
 
 
+MEMBERSHIP_REVISION_KEY = 'schooltool.app.security.membership_revision'
+
+
+def getMembershipRevision(app):
+    """Return the revision of group memberships in the application."""
+    revision = IAnnotations(app).get(MEMBERSHIP_REVISION_KEY)
+    if revision is None:
+        return 0
+    return revision()
+
+
+def bumpMembershipRevision(app):
+    annotations = IAnnotations(app)
+    revision = annotations.get(MEMBERSHIP_REVISION_KEY)
+    if revision is None:
+        revision = annotations[MEMBERSHIP_REVISION_KEY] = Length()
+    revision.change(1)
+
+
+def updateMembershipRevision(event):
+    """Invalidate cached principals when group memberships change."""
+    rel_type = getattr(event, 'rel_type', None)
+    if rel_type is None:
+        rel_type = getattr(getattr(event, 'link', None), 'rel_type', None)
+    if rel_type != URIMembership:
+        return
+    app = ISchoolToolApplication(None, None)
+    if app is not None:
+        bumpMembershipRevision(app)
+
+
+def updateMembershipRevisionOnGroupMove(group, event):
+    """Group principal ids depend on group names."""
+    app = ISchoolToolApplication(None, None)
+    if app is not None:
+        bumpMembershipRevision(app)
+
+
+class PrincipalCache(object):
+    """A bounded cache of principal data, shared between threads.
+
+    Least recently used entries are dropped when the cache is full.
+    """
+    implements(IPrincipalCache)
+
+    size = 1000
+
+    def __init__(self, size=None):
+        if size is not None:
+            self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._data.pop(key, None)
+            if data is not None:
+                self._data[key] = data
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = data
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 class PersonContainerAuthenticationPlugin(object):
     implements(ISchoolToolAuthenticationPlugin)
 
@@ -168,11 +248,10 @@ class PersonContainerAuthenticationPlugin(object):
             username = id[len(self.person_prefix):]
             if username in app['persons']:
                 person = app['persons'][username]
-                principal = Principal(id, person.title,
+                title, groups = self.getPrincipalData(app, person)
+                principal = Principal(id, title,
                                       person=ProxyFactory(person))
-                for group in person.groups:
-                    group_principal_id = self.group_prefix + group.__name__
-                    principal.groups.append(group_principal_id)
+                principal.groups.extend(groups)
                 authenticated = queryUtility(IAuthenticatedGroup)
                 if authenticated:
                     principal.groups.append(authenticated.id)
@@ -182,6 +261,42 @@ class PersonContainerAuthenticationPlugin(object):
                 return principal
         return None
 
+    def principalCacheKey(self, app, person):
+        """Return the principal cache key of a person.
+
+        Returns None if principal data of the person cannot be cached.
+        """
+        jar = person._p_jar
+        if jar is None:
+            return None
+        person._p_activate()
+        if person._p_changed:
+            return None
+        dateman = queryUtility(IDateManager)
+        if dateman is not None:
+            today = dateman.today
+        else:
+            today = datetime.date.today()
+        return (jar.db().database_name, person._p_oid, person._p_serial,
+                getMembershipRevision(app), today)
+
+    def getPrincipalData(self, app, person):
+        """Return the title and group principal ids of a person."""
+        cache = queryUtility(IPrincipalCache)
+        key = None
+        if cache is not None:
+            key = self.principalCacheKey(app, person)
+        if key is not None:
+            data = cache.get(key)
+            if data is not None:
+                return data
+        groups = tuple([self.group_prefix + group.__name__
+                        for group in person.groups])
+        data = (person.title, groups)
+        if key is not None:
+            cache.set(key, data)
+        return data
+
     def setCredentials(self, request, username, password):
         # avoid circular imports
         from schooltool.person.person import hash_password
@@ -22,10 +22,14 @@ import unittest
 import doctest
 from transaction import abort
 
+from persistent import Persistent
+from BTrees.IOBTree import IOBTree
+
 from zope.app.testing import setup
 from zope.interface import implements, Interface
 from zope.interface.verify import verifyObject
-from zope.component import provideAdapter
+from zope.component import provideAdapter, provideUtility
+from zope.intid.interfaces import IIntIds
 from zope.component.hooks import getSite
 from zope.site import SiteManagerContainer
 from zope.site.folder import rootFolder
@@ -46,6 +50,44 @@ class CatalogStub(dict):
         return '<%s %r>' % (self.__class__.__name__, self.name)
 
 
+class IndexingCatalogStub(Persistent):
+
+    def __init__(self, name):
+        self.name = name
+        self.indexes = []
+        self.indexed = []
+
+    def __setitem__(self, name, index):
+        print 'Indexing all objects in %s' % name
+        self._setitemf(name, index)
+
+    def _setitemf(self, name, index):
+        self.indexes.append(name)
+
+    def index_doc(self, uid, obj):
+        self.indexed.append(uid)
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.name)
+
+
+class IntIdsStub(object):
+
+    def __init__(self):
+        self.refs = IOBTree()
+
+    def __len__(self):
+        return len(self.refs)
+
+    def register(self, obj):
+        uid = len(self.refs) + 1
+        self.refs[uid] = obj
+        return uid
+
+    def queryObject(self, uid, default=None):
+        return self.refs.get(uid, default)
+
+
 def provideApplicationStub():
     app = AppStub()
     return app
@@ -348,6 +390,149 @@ def doctest_CatalogFactory_versioning():
     """
 
 
+def doctest_CatalogFactory_background_rebuild():
+    """Tests for background rebuilds of stored catalogs.
+
+        >>> import transaction
+        >>> from schooltool.app.catalog import CatalogFactory, rebuildCatalog
+
+        >>> app = provideApplicationStub()
+        >>> catalogs = ICatalogs(app)
+        >>> intids = IntIdsStub()
+        >>> provideUtility(intids, IIntIds)
+        >>> for n in range(5):
+        ...     uid = intids.register(object())
+
+        >>> class Factory(CatalogFactory):
+        ...    version = 1
+        ...    def createCatalog(self):
+        ...        return IndexingCatalogStub('v%s' % self.version)
+        ...    def setIndexes(self, catalog):
+        ...        catalog['title'] = 'Title index'
+
+        >>> Factory(app)()
+        Indexing all objects in title
+        >>> transaction.commit()
+        >>> old_catalog = Factory.get()
+
+    When the version of a stored catalog changes, the new catalog is
+    created empty, under a pending key.  Its indexes are added without
+    indexing anything.  The old one is still used.
+
+        >>> Factory.version = 2
+        >>> Factory(app)()
+        >>> transaction.commit()
+
+        >>> print sorted(catalogs.keys())
+        [u'catalog:schooltool.app.tests.test_catalog.Factory',
+         u'catalog:schooltool.app.tests.test_catalog.Factory:pending']
+        >>> pending = catalogs[Factory.key() + ':pending']
+        >>> pending.ready, pending.catalog, pending.catalog.indexes
+        (False, <IndexingCatalogStub 'v2'>, ['title'])
+        >>> Factory.get() is old_catalog
+        True
+
+    The pending catalog survives restarts.
+
+        >>> Factory(app)()
+        >>> catalogs[Factory.key() + ':pending'] is pending
+        True
+
+    rebuildCatalog indexes all objects in chunks, then switches over.
+
+        >>> rebuildCatalog(app._p_jar, catalogs, Factory.key() + ':pending',
+        ...                batch_size=2)
+        >>> print sorted(catalogs.keys())
+        [u'catalog:schooltool.app.tests.test_catalog.Factory']
+        >>> catalog = Factory.get()
+        >>> catalog, catalog.indexed, catalog.__parent__.ready
+        (<IndexingCatalogStub 'v2'>, [1, 2, 3, 4, 5], True)
+
+    """
+
+
+def doctest_CatalogRebuildStep_units():
+    """Tests for CatalogRebuildStep.units.
+
+        >>> from schooltool.app.catalog import CatalogRebuildStep
+        >>> from schooltool.app.catalog import VersionedCatalog
+
+        >>> app = provideApplicationStub()
+        >>> catalogs = ICatalogs(app)
+        >>> intids = IntIdsStub()
+        >>> provideUtility(intids, IIntIds)
+        >>> for n in range(5):
+        ...     uid = intids.register(object())
+        >>> catalogs['catalog:pending'] = VersionedCatalog(
+        ...     IndexingCatalogStub('v2'), 2, ready=False)
+
+    The step commits after every batch, while intids keep changing.
+    Keys are read again for every batch, after the last processed one.
+
+        >>> step = CatalogRebuildStep(app._p_jar, catalogs, 'catalog:pending',
+        ...                           batch_size=2)
+        >>> units = step.units(None)
+        >>> [units.next()[0] for n in range(2)]
+        [1, 2]
+
+        >>> del intids.refs[3]
+        >>> intids.refs[6] = object()
+        >>> [uid for uid, unit in units]
+        [4, 5, 6]
+
+    """
+
+
+def doctest_rebuildPendingCatalog():
+    """Tests for rebuildPendingCatalog.
+
+        >>> from zope.testing.loggingsupport import InstalledHandler
+        >>> from ZODB.POSException import ConflictError
+        >>> from schooltool.app import catalog as catalog_module
+        >>> from schooltool.app.catalog import rebuildPendingCatalog
+
+        >>> def rebuildCatalog(connection, catalogs, pending_key):
+        ...     print 'Rebuilding', pending_key
+        ...     raise errors.pop(0)
+        >>> old_rebuildCatalog = catalog_module.rebuildCatalog
+        >>> catalog_module.rebuildCatalog = rebuildCatalog
+        >>> handler = InstalledHandler('schooltool.app.catalog')
+
+    Conflicts are retried, the step continues from its checkpoint.
+
+        >>> errors = [ConflictError(), ConflictError(), ConflictError()]
+        >>> rebuildPendingCatalog(None, None, 'catalog:pending', retries=2)
+        Rebuilding catalog:pending
+        Rebuilding catalog:pending
+        False
+        >>> print handler
+        schooltool.app.catalog WARNING
+          Conflict while rebuilding catalog:pending, retrying
+        schooltool.app.catalog WARNING
+          Conflict while rebuilding catalog:pending, retrying
+        schooltool.app.catalog ERROR
+          Could not rebuild catalog:pending after 2 conflicts, giving up
+
+    Other errors are logged and the rebuild gives up, the old catalog
+    stays in use.
+
+        >>> handler.clear()
+        >>> errors = [ValueError('broken index')]
+        >>> rebuildPendingCatalog(None, None, 'catalog:pending')
+        Rebuilding catalog:pending
+        False
+        >>> print handler
+        schooltool.app.catalog ERROR
+          Failed to rebuild catalog:pending, giving up
+        >>> handler.records[0].exc_info[1]
+        ValueError('broken index',)
+
+        >>> handler.uninstall()
+        >>> catalog_module.rebuildCatalog = old_rebuildCatalog
+
+    """
+
+
 def doctest_CatalogImplementing():
     """Tests for CatalogImplementing.  This is a factory of catalogs that
     contain only objects implementing given interface.
@@ -0,0 +1,241 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.app.catalogcheck
+"""
+import unittest
+import doctest
+from transaction import abort
+
+from BTrees.IOBTree import IOBTree
+from zope.app.testing import setup
+from zope.component import provideAdapter, provideUtility
+from zope.interface import implements, Interface
+from zope.intid.interfaces import IIntIds
+
+from schooltool.app.catalog import getAppCatalogs
+
+
+class IFoo(Interface):
+    pass
+
+
+class Foo(object):
+    implements(IFoo)
+
+    def __init__(self, title):
+        self.title = title
+
+
+class IntIdsStub(object):
+
+    loaded = 0
+
+    def __init__(self, objects):
+        self.refs = IOBTree(dict(enumerate(objects, 1)))
+
+    def queryObject(self, uid, default=None):
+        self.loaded += 1
+        return self.refs.get(uid, default)
+
+
+def doctest_CatalogChecker():
+    """Tests for CatalogChecker.
+
+        >>> from schooltool.testing.stubs import AppStub
+        >>> from schooltool.app.catalog import AttributeCatalog
+        >>> from schooltool.app.catalogcheck import CatalogChecker
+
+        >>> app = AppStub()
+        >>> objects = [Foo('one'), Foo('two'), object(), Foo('four')]
+        >>> intids = IntIdsStub(objects)
+        >>> provideUtility(intids, IIntIds)
+
+        >>> class FooCatalog(AttributeCatalog):
+        ...     interface = IFoo
+        ...     attributes = ('title', )
+        >>> FooCatalog(app)()
+        >>> catalog = FooCatalog.get()
+        >>> for uid, obj in intids.refs.items():
+        ...     catalog.index_doc(uid, obj)
+
+    A consistent catalog has no drift.
+
+        >>> checker = CatalogChecker(app, batch_size=2)
+        >>> [drift] = checker()
+        >>> print drift.summary()
+        catalog:schooltool.app.tests.test_catalogcheck.FooCatalog:
+          4 checked, 0 missing, 0 stale, 0 changed
+
+    Now some subscribers were bypassed: an object changed, another was
+    not indexed and one was removed from IntIds only.
+
+        >>> objects[0].title = 'uno'
+        >>> catalog.unindex_doc(2)
+        >>> del intids.refs[4]
+
+        >>> [drift] = checker()
+        >>> print drift.summary()
+        catalog:...: 3 checked, 1 missing, 1 stale, 1 changed
+        >>> drift.missing, drift.stale, drift.changed
+        ([2], [4], [(1, u'title')])
+
+    The checker can repair only these documents.
+
+        >>> [drift] = CatalogChecker(app, repair=True)()
+        >>> print drift.summary()
+        catalog:...: 3 checked, 1 missing, 1 stale, 1 changed, 3 repaired
+
+        >>> sorted(catalog.extent)
+        [1, 2]
+        >>> sorted(catalog['title'].documents_to_values.items())
+        [(1, 'uno'), (2, 'two')]
+
+        >>> [drift] = checker()
+        >>> len(drift)
+        0
+
+    """
+
+
+def doctest_CatalogChecker_several_catalogs():
+    """Tests for CatalogChecker with several catalogs.
+
+        >>> from schooltool.testing.stubs import AppStub
+        >>> from schooltool.app.catalog import AttributeCatalog
+        >>> from schooltool.app.catalogcheck import CatalogChecker
+
+        >>> app = AppStub()
+        >>> objects = [Foo('one'), Foo('two'), Foo('three')]
+        >>> intids = IntIdsStub(objects)
+        >>> provideUtility(intids, IIntIds)
+
+        >>> class FooCatalog(AttributeCatalog):
+        ...     interface = IFoo
+        ...     attributes = ('title', )
+        >>> class BarCatalog(FooCatalog):
+        ...     pass
+        >>> FooCatalog(app)()
+        >>> BarCatalog(app)()
+        >>> for uid, obj in intids.refs.items():
+        ...     FooCatalog.get().index_doc(uid, obj)
+        ...     BarCatalog.get().index_doc(uid, obj)
+
+    Every object is loaded once, however many catalogs are checked, and
+    keys are read in batches.
+
+        >>> checker = CatalogChecker(app, batch_size=2)
+        >>> for drift in checker():
+        ...     print drift.summary()
+        catalog:...BarCatalog: 3 checked, 0 missing, 0 stale, 0 changed
+        catalog:...FooCatalog: 3 checked, 0 missing, 0 stale, 0 changed
+        >>> intids.loaded
+        3
+
+    Errors indexing a document are recorded in the drift.
+
+        >>> class Broken(object):
+        ...     implements(IFoo)
+        ...     @property
+        ...     def title(self):
+        ...         raise ValueError('broken')
+        >>> intids.refs[2] = Broken()
+        >>> drift = checker(['catalog:schooltool.app.tests'
+        ...                  '.test_catalogcheck.FooCatalog'])[0]
+        >>> print drift.summary()
+        catalog:...FooCatalog: 3 checked, 0 missing, 0 stale, 0 changed,
+          1 errors
+        >>> drift.errors
+        [(2, ValueError('broken',))]
+
+    Conflicts are not errors of the catalog, they abort the check.
+
+        >>> from ZODB.POSException import ReadConflictError
+        >>> class Conflicting(object):
+        ...     implements(IFoo)
+        ...     @property
+        ...     def title(self):
+        ...         raise ReadConflictError()
+        >>> intids.refs[2] = Conflicting()
+        >>> checker()
+        Traceback (most recent call last):
+          ...
+        ReadConflictError: database read conflict error
+
+    """
+
+
+def doctest_CatalogCheckScript_load_options():
+    """Tests for CatalogCheckScript.load_options.
+
+        >>> import os
+        >>> from schooltool.app import tests
+        >>> from schooltool.app.catalogcheck import CatalogCheckScript
+        >>> config_file = os.path.join(os.path.dirname(tests.__file__),
+        ...                            'sample.conf')
+
+        >>> script = CatalogCheckScript()
+        >>> options = script.load_options(
+        ...     ['check', '-c', config_file, '--repair', 'catalog:one'])
+        >>> options.config_file == config_file
+        True
+        >>> options.repair, options.catalogs
+        (True, ['catalog:one'])
+        >>> options.config.database
+        <ZODB.config.ZODBDatabase instance at ...>
+
+        >>> try:
+        ...     script.load_options(['check', '-h'])
+        ... except SystemExit, e:
+        ...     print '[exited with status %s]' % e
+        Usage: check -c schooltool.conf [options] [catalog ...]
+        Options:
+          -c, --config xxx       use this configuration file
+          -r, --repair           reindex documents that differ
+          -h, --help             show this help message
+        [exited with status 0]
+
+    The check does not start rebuilding pending catalogs like the server.
+
+        >>> script.start_catalog_rebuilds
+        False
+
+    """
+
+
+def setUp(test):
+    setup.placefulSetUp()
+    provideAdapter(getAppCatalogs)
+
+
+def tearDown(test):
+    setup.placefulTearDown()
+    abort()
+
+
+def test_suite():
+    optionflags = (doctest.NORMALIZE_WHITESPACE |
+                   doctest.ELLIPSIS | doctest.REPORT_NDIFF)
+    return unittest.TestSuite([
+        doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                             optionflags=optionflags),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
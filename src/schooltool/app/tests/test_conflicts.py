@@ -0,0 +1,175 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2009 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.app.conflicts.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import doctest
+from datetime import date
+
+import transaction
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+
+
+def doctest_concurrent_notes():
+    """Notes added by two users at the same time do not conflict.
+
+        >>> from schooltool.note.note import Notes, Note
+        >>> tm1, conn1, tm2, conn2 = connections
+        >>> conn1.root()['notes'] = Notes()
+        >>> tm1.commit()
+        >>> tm2.abort()
+
+        >>> conn1.root()['notes'].add(Note(title='first'))
+        >>> conn2.root()['notes'].add(Note(title='second'))
+        >>> tm1.commit()
+        >>> tm2.commit()
+
+        >>> tm1.abort()
+        >>> [note.title for note in conn1.root()['notes']]
+        ['first', 'second']
+
+    Removals still conflict with other changes.
+
+        >>> tm2.abort()
+        >>> conn1.root()['notes'].clear()
+        >>> conn2.root()['notes'].add(Note(title='third'))
+        >>> tm1.commit()
+        >>> tm2.commit()
+        Traceback (most recent call last):
+          ...
+        ConflictError: database conflict error ...
+
+    """
+
+
+def doctest_AppendLog_buckets():
+    """Appending to a long log does not store all of its items again.
+
+        >>> from schooltool.app.conflicts import AppendLog
+        >>> tm1, conn1, tm2, conn2 = connections
+        >>> log = conn1.root()['log'] = AppendLog(range(1000))
+        >>> tm1.commit()
+
+        >>> log.append(1000)
+        >>> sorted(type(obj).__name__ for obj in conn1._registered_objects)
+        ['LOBucket', 'Length', 'Length']
+        >>> tm1.commit()
+        >>> len(log), log[-1], log[500]
+        (1001, 1000, 500)
+
+    """
+
+
+def doctest_concurrent_events():
+    """Events added to one calendar at the same time do not conflict.
+
+        >>> from schooltool.app.conflicts import BTreeMap
+        >>> tm1, conn1, tm2, conn2 = connections
+        >>> conn1.root()['events'] = BTreeMap()
+        >>> tm1.commit()
+        >>> tm2.abort()
+
+        >>> conn1.root()['events']['e1'] = 'event 1'
+        >>> conn2.root()['events']['e2'] = 'event 2'
+        >>> tm1.commit()
+        >>> tm2.commit()
+
+        >>> tm1.abort()
+        >>> events = conn1.root()['events']
+        >>> len(events), events.items()
+        (2, [('e1', 'event 1'), ('e2', 'event 2')])
+
+    """
+
+
+def doctest_concurrent_schooldays():
+    """Schooldays changed at the same time are merged.
+
+        >>> from schooltool.term.term import Term
+        >>> tm1, conn1, tm2, conn2 = connections
+        >>> term = conn1.root()['term'] = Term('Fall', date(2014, 9, 1),
+        ...                                    date(2014, 12, 31))
+        >>> term.add(date(2014, 9, 2))
+        >>> tm1.commit()
+        >>> tm2.abort()
+
+        >>> conn1.root()['term'].add(date(2014, 9, 3))
+        >>> term2 = conn2.root()['term']
+        >>> term2.remove(date(2014, 9, 2))
+        >>> term2.add(date(2014, 12, 1))
+        >>> tm1.commit()
+        >>> tm2.commit()
+
+        >>> tm1.abort()
+        >>> term = conn1.root()['term']
+        >>> [day for day in term if term.isSchoolday(day)]
+        [datetime.date(2014, 9, 3), datetime.date(2014, 12, 1)]
+
+    Changes to the dates of the term still conflict.
+
+        >>> tm2.abort()
+        >>> conn1.root()['term'].add(date(2014, 9, 4))
+        >>> conn2.root()['term'].title = 'Autumn'
+        >>> tm1.commit()
+        >>> tm2.commit()
+        Traceback (most recent call last):
+          ...
+        ConflictError: database conflict error ...
+
+    """
+
+
+def setUp(test):
+    test.tempdir = tempfile.mkdtemp()
+    db = DB(FileStorage(os.path.join(test.tempdir, 'Data.fs')))
+    connections = []
+    for n in range(2):
+        tm = transaction.TransactionManager()
+        connections.extend([tm, db.open(transaction_manager=tm)])
+    test.globs.update({
+        'db': db,
+        'connections': connections,
+        })
+
+
+def tearDown(test):
+    tm1, conn1, tm2, conn2 = test.globs['connections']
+    for tm, conn in [(tm1, conn1), (tm2, conn2)]:
+        tm.abort()
+        conn.close()
+    test.globs['db'].close()
+    shutil.rmtree(test.tempdir)
+
+
+def test_suite():
+    optionflags = doctest.ELLIPSIS | doctest.IGNORE_EXCEPTION_DETAIL
+    return unittest.TestSuite([
+        doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                             optionflags=optionflags),
+        doctest.DocTestSuite('schooltool.app.conflicts',
+                             optionflags=doctest.ELLIPSIS),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
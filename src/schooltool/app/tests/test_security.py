@@ -22,6 +22,8 @@ Unit tests for schooltool.app.security
 import unittest
 import doctest
 
+from persistent import Persistent
+
 from zope.app.testing import setup
 from zope.component import provideUtility, getUtility
 from zope.traversing.api import traverse
@@ -63,13 +65,129 @@ class TestAuthSetUpSubscriber(unittest.TestCase):
         authSetUpSubscriber(self.app, event)
 
 
+class GroupStub(object):
+
+    def __init__(self, name):
+        self.__name__ = name
+
+
+class PersonStub(Persistent):
+
+    title = 'Frog'
+
+    @property
+    def groups(self):
+        print 'Looking up groups'
+        return [GroupStub('pond')]
+
+
+def doctest_PrincipalCache():
+    """Tests for PrincipalCache.
+
+        >>> from schooltool.app.security import PrincipalCache
+        >>> cache = PrincipalCache(size=2)
+        >>> cache.set('a', 1)
+        >>> cache.set('b', 2)
+        >>> cache.get('a')
+        1
+
+    Least recently used entries are dropped.
+
+        >>> cache.set('c', 3)
+        >>> cache.get('a'), cache.get('b'), cache.get('c')
+        (1, None, 3)
+
+        >>> cache.clear()
+        >>> print cache.get('a')
+        None
+
+    """
+
+
+def doctest_PersonContainerAuthenticationPlugin_getPrincipalData():
+    """Tests for PersonContainerAuthenticationPlugin.getPrincipalData.
+
+        >>> import transaction
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> from zope.annotation.interfaces import IAnnotations
+        >>> from schooltool.app.interfaces import IPrincipalCache
+        >>> from schooltool.app.security import PrincipalCache
+        >>> from schooltool.app.security import bumpMembershipRevision
+        >>> from schooltool.app.security import PersonContainerAuthenticationPlugin
+
+        >>> class AppStub(object):
+        ...     annotations = {}
+        ...     def __conform__(self, iface):
+        ...         if iface == IAnnotations:
+        ...             return self.annotations
+
+        >>> app = AppStub()
+        >>> plugin = PersonContainerAuthenticationPlugin()
+        >>> provideUtility(PrincipalCache(), IPrincipalCache)
+
+    Principal data of persons that are not stored is not cached.
+
+        >>> person = PersonStub()
+        >>> plugin.getPrincipalData(app, person)
+        Looking up groups
+        ('Frog', ('sb.group.pond',))
+        >>> plugin.getPrincipalData(app, person)
+        Looking up groups
+        ('Frog', ('sb.group.pond',))
+
+    Stored persons are cached until they, or group memberships, change.
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> connection.root()['frog'] = person
+        >>> transaction.commit()
+
+        >>> plugin.getPrincipalData(app, person)
+        Looking up groups
+        ('Frog', ('sb.group.pond',))
+        >>> plugin.getPrincipalData(app, person)
+        ('Frog', ('sb.group.pond',))
+
+        >>> bumpMembershipRevision(app)
+        >>> plugin.getPrincipalData(app, person)
+        Looking up groups
+        ('Frog', ('sb.group.pond',))
+
+        >>> person.title = 'Toad'
+        >>> plugin.getPrincipalData(app, person)
+        Looking up groups
+        ('Toad', ('sb.group.pond',))
+        >>> transaction.commit()
+        >>> plugin.getPrincipalData(app, person)
+        Looking up groups
+        ('Toad', ('sb.group.pond',))
+        >>> plugin.getPrincipalData(app, person)
+        ('Toad', ('sb.group.pond',))
+
+        >>> transaction.abort()
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
+def setUp(test):
+    setup.placelessSetUp()
+
+
+def tearDown(test):
+    setup.placelessTearDown()
+
+
 def test_suite():
     optionflags = (doctest.ELLIPSIS |
                    doctest.NORMALIZE_WHITESPACE | doctest.REPORT_ONLY_FIRST_FAILURE |
                    doctest.REPORT_NDIFF)
     return unittest.TestSuite([
         unittest.makeSuite(TestAuthSetUpSubscriber),
-        doctest.DocTestSuite(optionflags=optionflags),
+        doctest.DocTestSuite(optionflags=optionflags,
+                             setUp=setUp, tearDown=tearDown),
         doctest.DocFileSuite('../security.txt', optionflags=optionflags),
         ])
 
@@ -88,10 +88,13 @@ from schooltool.skin.flourish.form import FormViewlet
 from schooltool.skin.flourish.viewlet import Viewlet, ViewletManager
 from schooltool.skin.flourish.content import ContentProvider
 from schooltool import table
+from schooltool.table.catalog import IndexedItems, LazyOrder
 from schooltool.table.catalog import IndexedLocaleAwareGetterColumn
+from schooltool.table.interfaces import IIndexedItems
 from schooltool.task.interfaces import IMessageContainer
 from schooltool.task.tasks import MessageCatalog
 from schooltool.task.tasks import getLastMessagesReadTime
+from schooltool.task.tasks import getMessageInbox
 from schooltool.task.tasks import markMessagesRead
 from schooltool.task.browser.task import MessageColumn
 from schooltool.term.interfaces import IDateManager
@@ -1236,7 +1239,8 @@ class IDCardsPageTemplate(DefaultPageTemplate):
                                     content_type="text/xml")
 
 
-class FlourishPersonIDCardsViewBase(ReportPDFView):
+class FlourishPersonIDCardsViewBase(ReportPDFView,
+                                    flourish.report.ChunkedReportMixin):
 
     template=ViewPageTemplateFile('templates/f_person_id_cards.pt')
     title = _('ID Cards')
@@ -1284,9 +1288,18 @@ class FlourishPersonIDCardsViewBase(ReportPDFView):
     def left(self):
         return self.LEFT_BASE
 
+    def getPersons(self):
+        """Returns an ordered list of persons to print ID cards for"""
+        raise NotImplementedError('do this in subclass')
+
+    def getChunkKeys(self):
+        return [person.__name__ for person in self.getPersons()]
+
     def persons(self):
         """Returns a list of getPersonData calls"""
-        raise NotImplementedError('do this in subclass')
+        return [self.getPersonData(person)
+                for person in self.getPersons()
+                if self.inChunk(person.__name__)]
 
     def getPersonData(self, person):
         demographics = IDemographics(person)
@@ -1323,6 +1336,11 @@ class FlourishPersonIDCardsViewBase(ReportPDFView):
     def total_cards_in_page(self):
         return self.COLUMNS * self.ROWS
 
+    @property
+    def chunk_size(self):
+        # Chunks must fill whole pages.
+        return self.total_cards_in_page * 25
+
     def insertBreak(self, repeat):
         return repeat['person'].number() % self.total_cards_in_page  == 0
 
@@ -1418,6 +1436,11 @@ class FlourishPersonIDCardView(FlourishPersonIDCardsViewBase):
         return _('ID Card: ${person}',
                  mapping={'person': self.context.title})
 
+    chunk_size = None
+
+    def getPersons(self):
+        return [self.context]
+
     def persons(self):
         return [self.getPersonData(self.context)] * self.total_cards_in_page
 
@@ -1542,6 +1565,13 @@ class PersonMessageFilter(table.table.DoNotFilter):
         person_intid = self.active_person_intid
         if person_intid is None:
             return []
+        inbox = getMessageInbox(self.person)
+        if inbox is not None and IIndexedItems.providedBy(results):
+            # The inbox is ordered newest first already.
+            order = LazyOrder(iter(inbox), len(inbox))
+            return IndexedItems(results.catalog, order=order,
+                                family=results.family,
+                                sorted_on=('updated_on', True))
         recipient_index = self.catalog['recipient_ids']
         message_ids = recipient_index.apply({'any_of': set([person_intid])})
         results = [item for item in results
@@ -1616,6 +1646,9 @@ class NewMessageIndicatorViewlet(flourish.page.LinkViewlet):
         person_intid = self.authenticated_person_intid
         if person_intid is None:
             return None
+        inbox = getMessageInbox(person)
+        if inbox is not None:
+            return inbox.unread
         dt = getLastMessagesReadTime(person)
         catalog = MessageCatalog.get()
         new_ids = catalog['updated_on'].apply(
@@ -366,6 +366,37 @@ def doctest_GroupTerm():
     """
 
 
+class PersonStub(object):
+
+    def __init__(self, name):
+        self.__name__ = name
+
+
+class TestFlourishPersonIDCardsViewBase(unittest.TestCase):
+
+    def makeView(self, chunkable):
+        from schooltool.basicperson.browser.person import \
+            FlourishPersonIDCardsViewBase
+        class IDCardsView(FlourishPersonIDCardsViewBase):
+            def __init__(self):
+                pass
+            def getPersons(self):
+                return [PersonStub('john'), PersonStub('pete')]
+        view = IDCardsView()
+        view.chunkable = chunkable
+        return view
+
+    def test_getReportChunks(self):
+        view = self.makeView(chunkable=True)
+        self.assertEqual(view.getChunkKeys(), ['john', 'pete'])
+        self.assertEqual(view.getReportChunks(), [['john', 'pete']])
+
+    def test_getReportChunks_not_chunkable(self):
+        # Views that override persons() render all cards in one piece.
+        view = self.makeView(chunkable=False)
+        self.assertEqual(view.getReportChunks(), None)
+
+
 def setUp(test):
     setup.placefulSetUp()
     from z3c.form import testing
@@ -396,8 +427,11 @@ def tearDown(test):
 
 def test_suite():
     optionflags = doctest.NORMALIZE_WHITESPACE | doctest.ELLIPSIS
-    return doctest.DocTestSuite(optionflags=optionflags,
-                                setUp=setUp, tearDown=tearDown)
+    return unittest.TestSuite([
+        doctest.DocTestSuite(optionflags=optionflags,
+                             setUp=setUp, tearDown=tearDown),
+        unittest.makeSuite(TestFlourishPersonIDCardsViewBase),
+        ])
 
 
 if __name__ == '__main__':
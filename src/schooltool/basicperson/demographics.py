@@ -35,16 +35,21 @@ from zope.interface import implements
 from zope.interface import implementer
 from zope.component import adapts
 from zope.component import adapter
+from zope.component import queryUtility
 from zope.container.btree import BTreeContainer
 from zope.container.ordered import OrderedContainer
 from zope.lifecycleevent.interfaces import IObjectRemovedEvent
 from zope.schema.vocabulary import SimpleVocabulary
 from zope.schema.vocabulary import SimpleTerm
+from zope.intid.interfaces import IIntIds
+from zope.proxy import removeAllProxies
+from zope.security.proxy import removeSecurityProxy
 
 import z3c.form.field
 
 from schooltool.app.app import InitBase, StartUpBase
 from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.app.interfaces import ICatalogs
 from schooltool.basicperson.interfaces import IEnumFieldDescription
 from schooltool.basicperson.interfaces import IIntFieldDescription
 from schooltool.basicperson.interfaces import IDemographicsFields
@@ -52,6 +57,7 @@ from schooltool.basicperson.interfaces import IBasicPerson
 from schooltool.basicperson.interfaces import IDemographics
 from schooltool.basicperson.interfaces import IFieldDescription
 from schooltool.common import SchoolToolMessage as _
+from schooltool.common.snapshot import SerialCache
 
 
 LEAVE_SCHOOL_FIELDS = ['leave_date', 'leave_reason', 'leave_destination']
@@ -74,7 +80,7 @@ class PersonDemographicsData(PersistentDict):
     def isValidKey(self, key):
         app = ISchoolToolApplication(None)
         demographics_fields = IDemographicsFields(app)
-        return key in demographics_fields
+        return key in demographics_fields.snapshot()
 
     def __repr__(self):
         return '%s: %s' % (
@@ -88,19 +94,148 @@ class PersonDemographicsData(PersistentDict):
 
     def __getitem__(self, key):
         if key not in self and self.isValidKey(key):
-            self[key] = None
+            # Defined, but not set: don't store the None.
+            return None
         return super(PersonDemographicsData, self).__getitem__(key)
 
 
+class PersonDemographics(object):
+    """Demographics of a person.
+
+    Reading never writes: the data of a person is stored only when a
+    value is set.  Setting a value of an indexed field reindexes the
+    person.
+    """
+    implements(IDemographics)
+
+    def __init__(self, person, container, fields):
+        self.person = person
+        self.container = container
+        self.fields = fields
+
+    @property
+    def data(self):
+        # Stored data may be wrapped in a ContainedProxy.
+        return removeAllProxies(self.container.get(self.person.username, None))
+
+    def __repr__(self):
+        return '<%s of %r>: %r' % (
+            self.__class__.__name__, self.person.username,
+            dict(self.data or {}))
+
+    def __getitem__(self, key):
+        data = self.data
+        if data is not None and key in data:
+            return PersistentDict.__getitem__(data, key)
+        if key in self.fields:
+            return None
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        data = self.data
+        if data is None:
+            return default
+        return data.get(key, default)
+
+    def __contains__(self, key):
+        data = self.data
+        return data is not None and key in data
+
+    def keys(self):
+        return list(self.data or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __len__(self):
+        return len(self.data or ())
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise InvalidKeyError(key)
+        data = self.data
+        if data is None:
+            if value is None:
+                return
+            data = PersonDemographicsData()
+            self.container[self.person.username] = data
+        elif key in data and PersistentDict.__getitem__(data, key) == value:
+            return
+        PersistentDict.__setitem__(data, key, value)
+        if key in self.fields.indexed:
+            reindexDemographics(self.person)
+
+    def __delitem__(self, key):
+        data = self.data
+        if data is None:
+            raise KeyError(key)
+        del data[key]
+        if key in self.fields.indexed:
+            reindexDemographics(self.person)
+
+
 @adapter(IBasicPerson)
 @implementer(IDemographics)
 def getPersonDemographics(person):
     app = ISchoolToolApplication(None)
     pdc = app['schooltool.basicperson.demographics_data']
-    demographics = pdc.get(person.username, None)
-    if demographics is None:
-        pdc[person.username] = demographics = PersonDemographicsData()
-    return demographics
+    fields = IDemographicsFields(app).snapshot()
+    return PersonDemographics(person, pdc, fields)
+
+
+def indexedDemographics(person):
+    """Return (field name, value) pairs of indexed demographics."""
+    app = ISchoolToolApplication(None)
+    pdc = app.get('schooltool.basicperson.demographics_data')
+    fields = app.get('schooltool.basicperson.demographics_fields')
+    if pdc is None or fields is None:
+        return None
+    data = pdc.get(person.username, None)
+    if not data:
+        return None
+    indexed = fields.snapshot().indexed
+    values = [(name, value) for name, value in data.items()
+              if name in indexed and value is not None]
+    return values or None
+
+
+def reindexDemographics(person):
+    app = ISchoolToolApplication(None, None)
+    intids = queryUtility(IIntIds)
+    if app is None or intids is None:
+        return
+    person = removeSecurityProxy(person)
+    docid = intids.queryId(person)
+    if docid is None:
+        # Not added yet, gets indexed when added.
+        return
+    for entry in ICatalogs(app).values():
+        index = entry.catalog.get('demographics')
+        if getattr(index, 'value_factory', None) is indexedDemographics:
+            index.index_doc(docid, person)
+
+
+def searchDemographics(catalog, **values):
+    """Return ids of persons having all the given demographics values.
+
+    Only enum, date, bool and int fields are indexed, i.e.
+
+        searchDemographics(catalog, grade=u'7', IEP=True)
+
+    Values of fields that are not indexed (any more) match nobody.
+    """
+    index = catalog['demographics']
+    app = ISchoolToolApplication(None)
+    indexed = IDemographicsFields(app).snapshot().indexed
+    if [name for name in values if name not in indexed]:
+        return index.family.IF.Set()
+    return index.apply({'all_of': sorted(values.items())})
 
 
 @adapter(IBasicPerson, IObjectRemovedEvent)
@@ -127,9 +262,44 @@ class DemographicsFormAdapter(object):
         return self.demographics.get(name, None)
 
 
+class DemographicsSnapshot(object):
+    """Read only names and indexed kinds of demographics fields."""
+
+    def __init__(self, fields):
+        self.names = frozenset([name for name, field in fields])
+        self.indexed = dict([(name, field.index_kind)
+                             for name, field in fields
+                             if getattr(field, 'index_kind', None)])
+
+    def __contains__(self, name):
+        return name in self.names
+
+
+# Snapshots of stored demographics fields.
+_snapshots = SerialCache()
+clearSnapshots = _snapshots.clear
+
+
 class DemographicsFields(OrderedContainer):
     implements(IDemographicsFields)
 
+    def __setitem__(self, key, value):
+        super(DemographicsFields, self).__setitem__(key, value)
+        # Fields are stored in subobjects; bump our own serial so that
+        # cached snapshots get stale.
+        self._p_changed = True
+
+    def __delitem__(self, key):
+        super(DemographicsFields, self).__delitem__(key)
+        self._p_changed = True
+
+    def snapshot(self):
+        """Return a snapshot of the field definitions.
+
+        Snapshots of committed fields are cached by their serial.
+        """
+        return _snapshots.get(self, lambda: DemographicsSnapshot(self.items()))
+
     def filter_key(self, key):
         """Return the subset of fields whose limited_keys list is either
            empty, or it contains the key passed."""
@@ -214,6 +384,8 @@ class FieldDescription(Persistent, Location):
 
     limit_keys = []
     description = None
+    # Kind of values kept in the demographics index, None if not indexed.
+    index_kind = None
 
     def __init__(self, name, title, required=False, limit_keys=[],
                  description=None):
@@ -250,6 +422,7 @@ class EnumFieldDescription(FieldDescription):
     implements(IEnumFieldDescription)
 
     items = []
+    index_kind = 'enum'
 
     def makeField(self):
         return self.setUpField(Choice(
@@ -260,6 +433,8 @@ class EnumFieldDescription(FieldDescription):
 
 class DateFieldDescription(FieldDescription):
 
+    index_kind = 'date'
+
     def makeField(self):
         return self.setUpField(Date(title=unicode(self.title)))
 
@@ -272,6 +447,8 @@ class TextFieldDescription(FieldDescription):
 
 class BoolFieldDescription(FieldDescription):
 
+    index_kind = 'bool'
+
     def makeField(self):
         return self.setUpField(Bool(title=unicode(self.title)))
 
@@ -286,6 +463,7 @@ class IntFieldDescription(FieldDescription):
 
     implements(IIntFieldDescription)
 
+    index_kind = 'int'
     min_value = None
     max_value = None
 
@@ -122,6 +122,9 @@ class IDemographicsFields(IOrderedContainer):
         """Return the subset of fields whose limited_keys list is either
            empty, or it contains one of the keys passed"""
 
+    def snapshot():
+        """Return a read only snapshot of field names and indexed kinds."""
+
 
 class FilterKeyList(List):
     """Marker field to pin widgets on."""
@@ -30,6 +30,7 @@ from schooltool.person.interfaces import IPersonFactory
 from schooltool.course.section import PersonInstructorsCrowd
 from schooltool.level.level import URILevel
 from schooltool.person.person import PersonCalendarCrowd
+from schooltool.table.catalog import ConvertingSetIndex
 from schooltool.table.catalog import IndexedLocaleAwareGetterColumn
 from schooltool.table.table import url_cell_formatter
 from schooltool.relationship import RelationshipProperty
@@ -37,6 +38,7 @@ from schooltool.relationship import RelationshipSchema
 from schooltool.relationship.temporal import TemporalURIObject
 from schooltool.basicperson.advisor import URIAdvisor, URIAdvising, URIStudent
 from schooltool.basicperson.interfaces import IBasicPerson
+from schooltool.basicperson.demographics import indexedDemographics
 from schooltool.app.catalog import AttributeCatalog
 from schooltool.contact.contact import ParentCrowd
 from schooltool.common import SchoolToolMessage as _
@@ -161,13 +163,15 @@ class BasicPersonCalendarCrowd(PersonCalendarCrowd):
 
 class PersonCatalog(AttributeCatalog):
 
-    version = '3 - updated title'
+    version = '4 - demographics'
     interface = IBasicPerson
     attributes = ('__name__', 'title', 'first_name', 'last_name')
 
     def setIndexes(self, catalog):
         super(PersonCatalog, self).setIndexes(catalog)
         catalog['text'] = TextIndex('getSearchableText', ISearchableText, True)
+        catalog['demographics'] = ConvertingSetIndex(
+            converter=indexedDemographics)
 
 
 getPersonCatalog = PersonCatalog.get
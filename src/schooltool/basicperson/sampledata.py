@@ -22,6 +22,8 @@ import datetime
 import os
 from pytz import utc
 
+import transaction
+
 from zope.interface import implements
 from zope.security.proxy import removeSecurityProxy
 
@@ -55,6 +57,9 @@ class SampleStudents(object):
     # Number of persons to generate
     power = 1000
 
+    # Persons created between savepoints
+    batch_size = 500
+
     def personFactory(self, namegen, prefixgen, gendergen, count):
         first_name, last_name, full_name = namegen.generate()
         person_id = 'student%03d' % count
@@ -75,6 +80,8 @@ class SampleStudents(object):
             # group.
             app['persons'][person.username] = person
             removeSecurityProxy(students.members).add(person)
+            if (count + 1) % self.batch_size == 0:
+                transaction.savepoint(optimistic=True)
 
 
 class SampleTeachers(object):
@@ -86,6 +93,9 @@ class SampleTeachers(object):
     # Number of teachers to generate
     power = 48
 
+    # Persons created between savepoints
+    batch_size = 500
+
     def personFactory(self, namegen, count):
         first_name, last_name, full_name = namegen.generate()
         person_id = 'teacher%03d' % count
@@ -102,6 +112,8 @@ class SampleTeachers(object):
             # group.
             app['persons'][person.username] = person
             removeSecurityProxy(teachers.members).add(person)
+            if (count + 1) % self.batch_size == 0:
+                transaction.savepoint(optimistic=True)
 
 
 class SamplePersonalEvents(object):
@@ -114,6 +126,9 @@ class SamplePersonalEvents(object):
 
     probability = 2     # probability of having an event on any day
 
+    # Persons processed between savepoints
+    batch_size = 500
+
     def _readLines(self, filename):
         """Read in lines from file
 
@@ -137,7 +152,9 @@ class SamplePersonalEvents(object):
         first = min(dates)
         last = max(dates)
         days = DateRange(first, last)
-        for person_id in person_ids:
+        for n, person_id in enumerate(person_ids):
+            if n and n % self.batch_size == 0:
+                transaction.savepoint(optimistic=True)
             person = app['persons'][person_id]
             calendar = ISchoolToolCalendar(person)
             for day in days:
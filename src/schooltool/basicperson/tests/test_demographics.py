@@ -92,16 +92,91 @@ def doctest_getPersonDemographics():
 
         >>> app = ISchoolToolApplication(None)
         >>> john = BasicPerson("johansen", "John", "Johansen")
-        >>> IDemographics(john)
-        <...basicperson.demographics.PersonDemographicsData object at ...>: {}
+        >>> demographics = IDemographics(john)
+        >>> demographics
+        <PersonDemographics of 'johansen'>: {}
 
-    The demographics object is being stored in the demographics object
-    container and if we try to access it again we will get the same
-    object:
+    Reading does not store anything, defined fields are just None.
 
         >>> ddc = app['schooltool.basicperson.demographics_data']
-        >>> ddc['johansen'] is IDemographics(john)
+        >>> demographics['ethnicity'] is None
         True
+        >>> demographics.get('ethnicity', 'default')
+        'default'
+        >>> 'johansen' in ddc
+        False
+
+    The demographics data is stored in the demographics object
+    container when a value is set:
+
+        >>> demographics['ID'] = 'an ID'
+        >>> ddc['johansen'] is IDemographics(john).data
+        True
+        >>> IDemographics(john)['ID']
+        'an ID'
+
+        >>> demographics['weight'] = 70
+        Traceback (most recent call last):
+        ...
+        InvalidKeyError: weight
+
+    """
+
+
+def doctest_indexedDemographics():
+    """Tests for demographics indexing
+
+        >>> from schooltool.basicperson.demographics import indexedDemographics
+        >>> app = ISchoolToolApplication(None)
+        >>> fields = IDemographicsFields(app)
+        >>> fields['IEP'] = BoolFieldDescription("IEP", "IEP")
+        >>> fields['grade'] = IntFieldDescription("grade", "Grade")
+
+    Enum, date, bool and int values are indexed, text values are not.
+
+        >>> sorted(fields.snapshot().indexed.items())
+        [('IEP', 'bool'), ('ethnicity', 'enum'), ('grade', 'int'),
+         ('leave_date', 'date'), ('leave_destination', 'enum'),
+         ('leave_reason', 'enum')]
+
+        >>> john = BasicPerson("johansen", "John", "Johansen")
+        >>> print indexedDemographics(john)
+        None
+
+        >>> demographics = IDemographics(john)
+        >>> demographics['ID'] = 'an ID'
+        >>> demographics['grade'] = 7
+        >>> demographics['IEP'] = True
+        >>> sorted(indexedDemographics(john))
+        [('IEP', True), ('grade', 7)]
+
+    Persons are found in the person catalog by their demographics.
+
+        >>> from zope.intid.interfaces import IIntIds
+        >>> from zope.component import getUtility
+        >>> from schooltool.basicperson.demographics import searchDemographics
+        >>> from schooltool.basicperson.person import getPersonCatalog
+        >>> app['persons']['johansen'] = john
+        >>> catalog = getPersonCatalog()
+        >>> john_id = getUtility(IIntIds).getId(john)
+
+        >>> list(searchDemographics(catalog, grade=7, IEP=True)) == [john_id]
+        True
+
+    Changing an indexed value reindexes the person.
+
+        >>> demographics['IEP'] = False
+        >>> list(searchDemographics(catalog, grade=7, IEP=True))
+        []
+
+    Values of fields removed since are left in the index, but are not
+    searched any more.
+
+        >>> list(searchDemographics(catalog, grade=7)) == [john_id]
+        True
+        >>> del fields['grade']
+        >>> list(searchDemographics(catalog, grade=7))
+        []
 
     """
 
@@ -114,12 +189,10 @@ def doctest_removePersonDemographicsSubscriber():
         >>> app = ISchoolToolApplication(None)
         >>> persons = app['persons']
         >>> persons['johansen'] = john = BasicPerson("johansen", "John", "Johansen")
-
-        >>> IDemographics(john)
-        <...basicperson.demographics.PersonDemographicsData object at ...>: {}
+        >>> IDemographics(john)['ID'] = 'an ID'
 
         >>> ddc = app['schooltool.basicperson.demographics_data']
-        >>> ddc['johansen'] is IDemographics(john)
+        >>> ddc['johansen'] is IDemographics(john).data
         True
 
     If we remove the person, its demographics is removed
@@ -20,7 +20,6 @@ SchoolTool calendaring objects.
 """
 import base64
 
-from persistent.dict import PersistentDict
 from persistent import Persistent
 from zope.interface import implements, implementer
 from zope.schema import getFieldNames
@@ -29,6 +28,7 @@ from zope.annotation.interfaces import IAttributeAnnotatable, IAnnotations
 from zope.container.contained import Contained
 from zope.location.interfaces import ILocation
 
+from schooltool.app.conflicts import BTreeMap
 from schooltool.calendar.icalendar import read_icalendar
 from schooltool.calendar.interfaces import ICalendar
 from schooltool.calendar.interfaces import ICalendarEvent
@@ -102,7 +102,7 @@ class Calendar(Persistent, CalendarMixin):
     title = property(lambda self: self.__parent__.title)
 
     def __init__(self, owner):
-        self.events = PersistentDict()
+        self.events = BTreeMap()
         self.__parent__ = owner
 
     def __iter__(self):
@@ -0,0 +1,139 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Size-specific renditions of stored images.
+
+Renditions are generated on first use and stored in the annotations of
+the original image file.  Uploading a new image creates a new file, so
+renditions of the old one simply go away with it.
+"""
+from cStringIO import StringIO
+
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+from BTrees.OOBTree import OOBTree
+from zope.annotation.interfaces import IAnnotations
+from zope.security.proxy import removeSecurityProxy
+
+from schooltool.common.fields import ImageFile
+
+
+RENDITIONS_KEY = 'schooltool.common.renditions'
+
+
+class RenditionSpec(object):
+    """Description of an image rendition."""
+
+    def __init__(self, name, size, format='JPEG', quality=85):
+        self.name = name
+        self.size = size
+        self.format = format
+        self.quality = quality
+
+    @property
+    def key(self):
+        return '%s-%dx%d-%s-%d' % (
+            self.name, self.size[0], self.size[1], self.format, self.quality)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.key)
+
+
+renditions = {}
+
+
+def registerRendition(name, size, format='JPEG', quality=85):
+    renditions[name] = RenditionSpec(name, size, format, quality)
+
+
+# Person tables, ID cards (print resolution) and the profile page.
+registerRendition('table', (33, 44))
+registerRendition('card', (198, 264))
+registerRendition('profile', (99, 132))
+
+
+def renderRendition(image_file, spec):
+    """Render the rendition of an image file.
+
+    Returns None if the original already fits the rendition.
+    """
+    stream = image_file.open()
+    try:
+        image = Image.open(stream)
+        image.load()
+    finally:
+        stream.close()
+    if (image.format == spec.format and
+        image.size[0] <= spec.size[0] and
+        image.size[1] <= spec.size[1]):
+        return None
+    image.thumbnail(spec.size, Image.ANTIALIAS)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    data = StringIO()
+    image.save(data, spec.format, quality=spec.quality)
+    result = ImageFile(mimeType=Image.MIME[spec.format])
+    writer = result.open('w')
+    writer.write(data.getvalue())
+    writer.close()
+    return result
+
+
+def queryRendition(image_file, name, default=None):
+    """Return a stored rendition of the image file, if it was generated."""
+    spec = renditions.get(name)
+    if spec is None:
+        return default
+    image_file = removeSecurityProxy(image_file)
+    stored = IAnnotations(image_file).get(RENDITIONS_KEY)
+    if stored is None:
+        return default
+    return stored.get(spec.key, default)
+
+
+def getRendition(image_file, name):
+    """Return the rendition of the image file, generating it if needed.
+
+    Images that already fit the rendition are their own rendition.
+    Unknown rendition names give the original image.
+    """
+    spec = renditions.get(name)
+    if spec is None:
+        return image_file
+    image_file = removeSecurityProxy(image_file)
+    annotations = IAnnotations(image_file)
+    stored = annotations.get(RENDITIONS_KEY)
+    if stored is None:
+        stored = annotations[RENDITIONS_KEY] = OOBTree()
+    rendition = stored.get(spec.key)
+    if rendition is None:
+        rendition = renderRendition(image_file, spec)
+        if rendition is None:
+            rendition = image_file
+        stored[spec.key] = rendition
+    return rendition
+
+
+def generateRenditions(image_file, names=None):
+    """Generate (missing) renditions of the image file."""
+    if names is None:
+        names = sorted(renditions)
+    return [getRendition(image_file, name) for name in names]
@@ -0,0 +1,62 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Values computed from persistent objects, shared by all threads.
+"""
+import threading
+
+
+class SerialCache(object):
+    """Values computed from persistent objects, cached by their serial.
+
+    Values are shared by all threads and connections.  They are keyed
+    by the database name and oid of the object and recomputed when its
+    serial changes.  Values of objects that are not committed yet or
+    changed in the current transaction are not cached.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+        try:
+            from zope.testing.cleanup import addCleanUp
+        except ImportError:
+            pass
+        else:
+            addCleanUp(self.clear)
+
+    def get(self, obj, factory):
+        """Return the value of factory() for the current state of obj."""
+        jar = obj._p_jar
+        if jar is not None:
+            obj._p_activate()
+        if jar is None or obj._p_changed:
+            return factory()
+        key = (jar.db().database_name, obj._p_oid)
+        serial = obj._p_serial
+        cached = self._values.get(key)
+        if cached is not None and cached[0] == serial:
+            return cached[1]
+        value = factory()
+        with self._lock:
+            self._values[key] = (serial, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
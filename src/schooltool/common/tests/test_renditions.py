@@ -0,0 +1,119 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.common.renditions
+"""
+import unittest
+import doctest
+from cStringIO import StringIO
+
+try:
+    import Image
+except ImportError:
+    from PIL import Image
+
+from zope.annotation.interfaces import IAttributeAnnotatable
+from zope.app.testing import setup
+from zope.interface import classImplements
+
+from schooltool.common.fields import ImageFile
+
+
+def makeImageFile(size, format='PNG'):
+    data = StringIO()
+    Image.new('RGB', size, (200, 10, 10)).save(data, format)
+    result = ImageFile(mimeType=Image.MIME[format])
+    stream = result.open('w')
+    stream.write(data.getvalue())
+    stream.close()
+    return result
+
+
+def imageInfo(image_file):
+    stream = image_file.open()
+    image = Image.open(stream)
+    image.load()
+    stream.close()
+    return image_file.mimeType, image.format, image.size
+
+
+def doctest_getRendition():
+    """Tests for getRendition.
+
+        >>> from schooltool.common.renditions import getRendition
+        >>> from schooltool.common.renditions import queryRendition
+
+    Renditions are scaled down, keeping the aspect ratio.
+
+        >>> photo = makeImageFile((300, 400))
+        >>> print queryRendition(photo, 'table')
+        None
+
+        >>> table = getRendition(photo, 'table')
+        >>> imageInfo(table)
+        ('image/jpeg', 'JPEG', (33, 44))
+
+    They are stored, so the next time the same file is returned.
+
+        >>> queryRendition(photo, 'table') is table
+        True
+        >>> getRendition(photo, 'table') is table
+        True
+
+        >>> imageInfo(getRendition(photo, 'profile'))
+        ('image/jpeg', 'JPEG', (99, 132))
+
+    Images are never scaled up; a small JPEG is its own rendition.
+
+        >>> small = makeImageFile((90, 120), format='JPEG')
+        >>> getRendition(small, 'card') is small
+        True
+
+    But other formats are converted.
+
+        >>> imageInfo(getRendition(makeImageFile((90, 120)), 'card'))
+        ('image/jpeg', 'JPEG', (90, 120))
+
+    Unknown renditions give the original image.
+
+        >>> getRendition(photo, 'poster') is photo
+        True
+
+    """
+
+
+def setUp(test):
+    setup.placelessSetUp()
+    setup.setUpAnnotations()
+    classImplements(ImageFile, IAttributeAnnotatable)
+
+
+def tearDown(test):
+    setup.placelessTearDown()
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS
+                   | doctest.REPORT_NDIFF
+                   | doctest.NORMALIZE_WHITESPACE)
+    return doctest.DocTestSuite(optionflags=optionflags,
+                                setUp=setUp, tearDown=tearDown)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
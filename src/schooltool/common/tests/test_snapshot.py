@@ -0,0 +1,102 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.common.snapshot
+"""
+import unittest
+import doctest
+
+import transaction
+from persistent.mapping import PersistentMapping
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+
+
+def doctest_SerialCache():
+    """Tests for SerialCache.
+
+        >>> from schooltool.common.snapshot import SerialCache
+        >>> cache = SerialCache()
+
+        >>> def factory():
+        ...     print 'Computing'
+        ...     return dict(obj)
+
+    Values of objects not stored yet are not cached.
+
+        >>> obj = PersistentMapping(a=1)
+        >>> cache.get(obj, factory)
+        Computing
+        {'a': 1}
+        >>> cache.get(obj, factory)
+        Computing
+        {'a': 1}
+
+    Values of committed objects are computed once per serial.
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> connection.root()['obj'] = obj
+        >>> transaction.commit()
+
+        >>> cache.get(obj, factory)
+        Computing
+        {'a': 1}
+        >>> cache.get(obj, factory)
+        {'a': 1}
+
+    Other connections share the value.
+
+        >>> other = db.open(transaction.TransactionManager())
+        >>> cache.get(other.root()['obj'], factory)
+        {'a': 1}
+
+    Objects changed in the transaction get fresh values, until the change
+    is committed.
+
+        >>> obj['b'] = 2
+        >>> cache.get(obj, factory)
+        Computing
+        {'a': 1, 'b': 2}
+        >>> transaction.commit()
+        >>> cache.get(obj, factory)
+        Computing
+        {'a': 1, 'b': 2}
+        >>> cache.get(obj, factory)
+        {'a': 1, 'b': 2}
+
+        >>> cache.clear()
+        >>> cache.get(obj, factory)
+        Computing
+        {'a': 1, 'b': 2}
+
+        >>> other.close()
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
+def test_suite():
+    return unittest.TestSuite([
+        doctest.DocTestSuite(optionflags=doctest.ELLIPSIS),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -761,7 +761,7 @@ class SendEmailView(form.Form):
         subject = data['subject']
         email = Email(self.from_address, self.to_addresses, body, subject)
         utility = getUtility(IEmailUtility)
-        success = utility.send(email)
+        utility.enqueue(email)
         url = absoluteURL(self.context, self.request)
         self.request.response.redirect(url)
 
@@ -0,0 +1,101 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Course and section sample data generation
+"""
+import transaction
+from zope.interface import implements
+from zope.security.proxy import removeSecurityProxy
+
+from schooltool.course.course import Course
+from schooltool.course.section import Section
+from schooltool.course.interfaces import ICourseContainer
+from schooltool.course.interfaces import ISectionContainer
+from schooltool.sampledata import PortableRandom
+from schooltool.sampledata.interfaces import ISampleDataPlugin
+from schooltool.schoolyear.interfaces import ISchoolYearContainer
+from schooltool.term.interfaces import ITermContainer
+
+
+SUBJECTS = ('Math', 'English', 'History', 'Biology', 'Chemistry',
+            'Physics', 'Geography', 'Art', 'Music', 'Physical Education',
+            'French', 'Spanish')
+
+
+class SampleCourses(object):
+
+    implements(ISampleDataPlugin)
+
+    name = 'courses'
+    dependencies = ('terms', )
+
+    # Number of courses to generate
+    power = 24
+
+    def generate(self, app, seed=None):
+        schoolyear = ISchoolYearContainer(app).getActiveSchoolYear()
+        courses = ICourseContainer(schoolyear)
+        for count in range(self.power):
+            subject = SUBJECTS[count % len(SUBJECTS)]
+            level = count // len(SUBJECTS) + 1
+            course = Course(title='%s %d' % (subject, level))
+            course.course_id = 'course%03d' % count
+            courses[course.course_id] = course
+
+
+class SampleSections(object):
+
+    implements(ISampleDataPlugin)
+
+    name = 'sections'
+    dependencies = ('courses', 'students', 'teachers')
+
+    sections_per_course = 10
+    section_size = 25
+
+    # Sections created between savepoints
+    batch_size = 100
+
+    def generate(self, app, seed=None):
+        random = PortableRandom(str(seed) + self.name)
+        schoolyear = ISchoolYearContainer(app).getActiveSchoolYear()
+        terms = sorted(ITermContainer(schoolyear).values(),
+                       key=lambda term: term.first)
+        courses = ICourseContainer(schoolyear)
+        persons = app['persons']
+        students = [persons[username] for username in sorted(persons)
+                    if username.startswith('student')]
+        teachers = [persons[username] for username in sorted(persons)
+                    if username.startswith('teacher')]
+        size = min(self.section_size, len(students))
+        count = 0
+        for course_id in sorted(courses):
+            course = courses[course_id]
+            for n in range(self.sections_per_course):
+                term = terms[n % len(terms)]
+                section = Section(title='%s (%d)' % (course.title, n + 1))
+                ISectionContainer(term)['%s-%02d' % (course_id, n)] = section
+                section = removeSecurityProxy(section)
+                section.courses.add(course)
+                if teachers:
+                    section.instructors.add(random.choice(teachers))
+                for student in random.sample(students, size):
+                    section.members.add(student)
+                count += 1
+                if count % self.batch_size == 0:
+                    transaction.savepoint(optimistic=True)
@@ -20,7 +20,7 @@ Section implementation
 """
 from persistent import Persistent
 
-from zope.annotation.interfaces import IAttributeAnnotatable
+from zope.annotation.interfaces import IAnnotations, IAttributeAnnotatable
 from zope.intid.interfaces import IIntIds
 from zope.interface import implements
 from zope.interface import implementer
@@ -31,6 +31,7 @@ from zope.component import adapts
 from zope.container.interfaces import INameChooser
 from zope.container.btree import BTreeContainer
 from zope.container.contained import Contained
+from zope.lifecycleevent.interfaces import IObjectAddedEvent
 from zope.lifecycleevent.interfaces import IObjectRemovedEvent
 from zope.proxy import sameProxiedObjects
 from zope.security.proxy import removeSecurityProxy
@@ -63,6 +64,7 @@ from schooltool.common import SchoolToolMessage as _
 
 
 SECTION_CONTAINERS_KEY = 'schooltool.course.section'
+ROLE_SUMMARY_KEY = 'schooltool.course.section.roles'
 COMPLETED = 'c'
 
 
@@ -502,38 +504,106 @@ def get_active_year():
     return schoolyears.getActiveSchoolYear()
 
 
-def is_teacher(person, only_active_year=False):
-    active = get_active_year()
+def _year_name(schoolyear):
+    if schoolyear is None:
+        return None
+    return schoolyear.__name__
+
+
+def _section_year_name(section):
+    term = ITerm(section, None)
+    if term is None:
+        return None
+    return _year_name(ISchoolYear(term, None))
+
+
+def scan_roles(person):
+    """Scan membership and instruction relationships of a person.
+
+    Returns a pair of frozensets: names of school years the person is
+    a teacher in and a student in.  None stands for a school year that
+    could not be determined.
+    """
     person = removeSecurityProxy(person)
-    is_wanted_group = lambda g: (g.__name__ == 'teachers' and
-                                 not interfaces.ISection.providedBy(g))
+    teacher = set()
+    student = set()
     group_relation = membership.Membership
     for link_info in group_relation.bind(member=person).all().relationships:
         target = removeSecurityProxy(link_info.target)
-        if (is_wanted_group(target) and
-            (not only_active_year or
-             ISchoolYear(target.__parent__) == active)):
-            return True
+        if interfaces.ISection.providedBy(target):
+            student.add(_section_year_name(target))
+        elif target.__name__ == 'teachers':
+            teacher.add(_year_name(ISchoolYear(target.__parent__, None)))
+        elif target.__name__ == 'students':
+            schoolyear = ISchoolYear(target.__parent__, None)
+            if schoolyear is not None:
+                student.add(_year_name(schoolyear))
     for link_info in Instruction.bind(instructor=person).all().relationships:
         target = removeSecurityProxy(link_info.target)
-        schoolyear = ISchoolYear(ITerm(target))
-        if not only_active_year or schoolyear == active:
-            return True
-    return False
+        teacher.add(_section_year_name(target))
+    return frozenset(teacher), frozenset(student)
 
 
-def is_student(person, only_active_year=False):
-    active = get_active_year()
+def get_role_summary(person):
+    """Return the (teacher years, student years) summary of a person.
+
+    Persons without a stored summary are scanned.
+    """
     person = removeSecurityProxy(person)
-    group_relation = membership.Membership
-    for link_info in group_relation.bind(member=person).all().relationships:
-        target = removeSecurityProxy(link_info.target)
-        schoolyear = None
-        if interfaces.ISection.providedBy(target):
-            schoolyear = ISchoolYear(ITerm(target))
-        elif target.__name__ == 'students':
-            schoolyear = ISchoolYear(target.__parent__)
-        if (schoolyear is not None and
-            (not only_active_year or schoolyear == active)):
-            return True
-    return False
+    annotations = IAnnotations(person, None)
+    if annotations is not None:
+        summary = annotations.get(ROLE_SUMMARY_KEY)
+        if summary is not None:
+            return summary
+    return scan_roles(person)
+
+
+def update_role_summary(person):
+    person = removeSecurityProxy(person)
+    annotations = IAnnotations(person, None)
+    if annotations is None:
+        return
+    summary = scan_roles(person)
+    if annotations.get(ROLE_SUMMARY_KEY) != summary:
+        annotations[ROLE_SUMMARY_KEY] = summary
+
+
+def updateRoleSummaries(event):
+    if event.rel_type == membership.URIMembership:
+        person = event[membership.URIMember]
+    elif event.rel_type == relationships.URIInstruction:
+        person = event[relationships.URIInstructor]
+    else:
+        return
+    if IPerson.providedBy(person):
+        update_role_summary(person)
+
+
+def updateRoleSummariesOnGroupMove(group, event):
+    """Roles depend on the names of teachers and students groups."""
+    if (IObjectAddedEvent.providedBy(event) or
+        IObjectRemovedEvent.providedBy(event)):
+        return
+    names = ('teachers', 'students')
+    if event.oldName not in names and event.newName not in names:
+        return
+    for member in group.members.all():
+        if IPerson.providedBy(member):
+            update_role_summary(member)
+
+
+def _has_role(years, only_active_year):
+    if not only_active_year:
+        return bool(years)
+    active = get_active_year()
+    return active is not None and active.__name__ in years
+
+
+def is_teacher(person, only_active_year=False):
+    teacher_years, student_years = get_role_summary(person)
+    return _has_role(teacher_years, only_active_year)
+
+
+def is_student(person, only_active_year=False):
+    teacher_years, student_years = get_role_summary(person)
+    return _has_role(student_years, only_active_year)
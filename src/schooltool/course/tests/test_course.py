@@ -412,6 +412,115 @@ def doctest_Section_linking():
     """
 
 
+def doctest_role_summaries():
+    r"""Tests for role summaries of persons.
+
+        >>> from zope.component import provideAdapter, provideHandler
+        >>> from zope.lifecycleevent.interfaces import IObjectMovedEvent
+        >>> from schooltool.relationship.interfaces import (
+        ...     IRelationshipAddedEvent, IRelationshipRemovedEvent)
+        >>> from schooltool.group.interfaces import IGroup, IGroupContainer
+        >>> from schooltool.schoolyear.interfaces import ISchoolYear
+        >>> from schooltool.course.section import updateRoleSummaries
+        >>> from schooltool.course.section import updateRoleSummariesOnGroupMove
+        >>> provideHandler(updateRoleSummaries, [IRelationshipAddedEvent])
+        >>> provideHandler(updateRoleSummaries, [IRelationshipRemovedEvent])
+        >>> provideHandler(updateRoleSummariesOnGroupMove,
+        ...                [IGroup, IObjectMovedEvent])
+
+        >>> from zope.annotation.interfaces import IAnnotations
+        >>> from schooltool.course.section import ROLE_SUMMARY_KEY
+        >>> from schooltool.course.section import is_teacher, is_student
+        >>> def summary(person):
+        ...     teacher, student = IAnnotations(person)[ROLE_SUMMARY_KEY]
+        ...     return sorted(teacher), sorted(student)
+
+        >>> year2000 = setUpSchoolYear(2000)
+        >>> setUpTerms(year2000, 1)
+        >>> year2001 = setUpSchoolYear(2001)
+        >>> setUpTerms(year2001, 1)
+        >>> sections2000 = ISectionContainer(year2000['Term1'])
+        >>> sections2001 = ISectionContainer(year2001['Term1'])
+
+        >>> from schooltool.course.section import Section
+        >>> from schooltool.person.person import Person
+        >>> section = sections2000['1'] = Section('Math')
+        >>> teacher = persons['teacher'] = Person('teacher', 'Teacher')
+        >>> pupil = persons['pupil'] = Person('pupil', 'Pupil')
+
+    The summary of a person is updated when a section instructor or
+    member is added or removed.
+
+        >>> section.instructors.add(teacher)
+        >>> section.members.add(pupil)
+        >>> summary(teacher), summary(pupil)
+        (([u'2000'], []), ([], [u'2000']))
+        >>> is_teacher(teacher), is_student(teacher)
+        (True, False)
+        >>> is_teacher(pupil), is_student(pupil)
+        (False, True)
+
+    Withdrawn members keep their role, as links to the section stay.
+    Removing the link updates the summary.
+
+        >>> section.members.remove(pupil)
+        >>> is_student(pupil)
+        True
+
+        >>> from schooltool.app.membership import Membership
+        >>> Membership.unlink(member=pupil, group=section)
+        >>> summary(pupil)
+        ([], [])
+        >>> is_student(pupil)
+        False
+
+    Roles in the active school year are answered from the summary, so
+    they follow the active school year.
+
+        >>> section2001 = sections2001['1'] = Section('Physics')
+        >>> section2001.members.add(pupil)
+        >>> is_teacher(teacher, only_active_year=True)
+        True
+        >>> is_student(pupil, only_active_year=True)
+        False
+
+        >>> from schooltool.schoolyear.interfaces import ISchoolYearContainer
+        >>> ISchoolYearContainer(app).activateNextSchoolYear('2001')
+        >>> is_teacher(teacher, only_active_year=True)
+        False
+        >>> is_student(pupil, only_active_year=True)
+        True
+        >>> is_teacher(teacher), is_student(pupil)
+        (True, True)
+
+    Members of the teachers and students groups of a school year have
+    these roles too.  Summaries are updated when a group is renamed to
+    or from these names.
+
+        >>> from schooltool.group.group import Group, GroupContainer
+        >>> year_groups = groups['2001'] = GroupContainer()
+        >>> provideAdapter(lambda container: year2001,
+        ...                adapts=[IGroupContainer], provides=ISchoolYear)
+        >>> staff = year_groups['staff'] = Group('Staff')
+        >>> staff.members.add(pupil)
+        >>> summary(pupil)
+        ([], [u'2001'])
+
+        >>> year_groups['teachers'] = staff
+        >>> del year_groups['staff']
+        >>> summary(pupil)
+        ([u'2001'], [u'2001'])
+        >>> is_teacher(pupil, only_active_year=True)
+        True
+
+        >>> year_groups['staff'] = staff
+        >>> del year_groups['teachers']
+        >>> summary(pupil)
+        ([], [u'2001'])
+
+    """
+
+
 def doctest_PersonInstructorCrowd():
     """Unit test for the PersonInstructorCrowd
 
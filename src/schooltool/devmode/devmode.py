@@ -25,6 +25,7 @@ from zope.security.proxy import removeSecurityProxy
 
 from schooltool.skin import flourish
 from schooltool.securitypolicy.policy import CachingSecurityPolicy
+from schooltool.securitypolicy.profiler import PROFILE_ATTR
 from schooltool.app.browser import SchoolToolAPI
 
 
@@ -132,6 +133,44 @@ class DebugSecurityPolicy(CachingSecurityPolicy):
             cache['debug_order'].append((key, extra_info))
 
 
+class SecurityProfileViewlet(flourish.viewlet.Viewlet):
+    """Security checks of the request so far."""
+
+    limit = 10
+
+    @property
+    def profile(self):
+        return getattr(self.request, PROFILE_ATTR, None) or None
+
+    def rows(self, counters):
+        return [{'name': name,
+                 'count': counter.count,
+                 'time': '%.1f' % (counter.time * 1000)}
+                for name, counter in self.profile.top(counters, self.limit)]
+
+    @property
+    def permissions(self):
+        return self.rows(self.profile.permissions)
+
+    @property
+    def crowds(self):
+        return self.rows(self.profile.crowds)
+
+    @property
+    def depths(self):
+        return [{'depth': depth, 'count': count}
+                for depth, count in sorted(self.profile.depths.items())]
+
+    @property
+    def total_time(self):
+        return '%.1f' % (self.profile.time * 1000)
+
+    def render(self, *args, **kw):
+        if self.profile is None:
+            return ''
+        return self.template(*args, **kw)
+
+
 class DevmodeSchoolToolAPI(SchoolToolAPI):
 
     devmode = True
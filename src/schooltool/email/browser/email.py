@@ -574,11 +574,10 @@ class EmailContainerView(TableContainerView):
     def __call__(self):
         if 'RETRY' in self.request:
             utility = getUtility(IEmailUtility)
+            # Sent in the background, sent emails leave the queue.
             for key in self.listIdsForDeletion():
                 email = removeSecurityProxy(self.context[key])
-                success = utility.send(email)
-                if success:
-                    del self.context[key]
+                utility.enqueue(email)
         return super(EmailContainerView, self).__call__()
 
 
@@ -635,6 +634,24 @@ class FlourishEmailQueueView(table.table.TableContainerView):
             url = absoluteURL(self.context, self.request) + '/queue.html'
             self.request.response.redirect(url)
 
+    def statistics(self):
+        utility = getUtility(IEmailUtility)
+        stats = utility.statistics
+        result = {
+            'depth': utility.queueDepth(),
+            'sent': 0,
+            'failed': 0,
+            'throughput': None,
+            }
+        if stats is None:
+            return result
+        throughput = stats.throughput
+        if throughput is not None:
+            result['throughput'] = '%.1f' % throughput
+        result['sent'] = stats.sent
+        result['failed'] = stats.failed
+        return result
+
 
 # URL Adapter
 
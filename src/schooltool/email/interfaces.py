@@ -23,7 +23,7 @@ Email interfaces
 from zope.container.constraints import contains, containers
 from zope.location.interfaces import IContained
 from zope.container.interfaces import IReadContainer, IWriteContainer
-from zope.interface import Interface
+from zope.interface import Interface, Attribute
 from zope.location.interfaces import ILocation
 from zope.schema import Bool, Datetime, Dict
 from zope.schema import TextLine, List, Text, Int, Password
@@ -131,6 +131,9 @@ class IEmailContained(IEmail, IContained):
 class IEmailUtility(Interface):
     """An utility to send IEmail objects"""
 
+    statistics = Attribute(
+        """Counters of sent and failed emails and dispatch throughput.""")
+
     def send(email):
         """Sends an email message.
 
@@ -150,3 +153,21 @@ class IEmailUtility(Interface):
         Returns True if the service is enabled. False otherwise.
 
         """
+
+    def enqueue(email):
+        """Queues an email to be sent in the background.
+
+        `email` is added to the IEmailContainer and a dispatcher task
+        is scheduled, which sends it and removes it from the container.
+
+        """
+
+    def dispatch():
+        """Sends the queued emails that are due.
+
+        Returns the number of emails sent.
+
+        """
+
+    def queueDepth():
+        """Returns the number of emails waiting to be sent or retried."""
@@ -22,17 +22,26 @@ Email functionality
 
 import email.Charset
 from email.MIMEText import MIMEText
-from datetime import datetime
+from datetime import datetime, timedelta
+import logging
+import math
 import pytz
 import smtplib
 import socket
+import threading
+import time
+import weakref
+
+import transaction
 
 from persistent import Persistent
 from persistent.dict import PersistentDict
+from BTrees.Length import Length
+from ZODB.POSException import ConflictError
 from zope.container.btree import BTreeContainer
 from zope.container.contained import Contained
 from zope.container.interfaces import INameChooser
-from zope.component import adapter
+from zope.component import adapter, getUtility
 from zope.interface import implements, implementer
 
 from schooltool.app.app import InitBase, StartUpBase
@@ -41,13 +50,34 @@ from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.common import SchoolToolMessage as _
 from schooltool.email.interfaces import IEmailContained, IEmailContainer
 from schooltool.email.interfaces import IEmailUtility
+from schooltool.task.tasks import RemoteTask
 
 
 email.Charset.add_charset('utf-8', email.Charset.SHORTEST, None, None)
 EMAIL_KEY = 'schooltool.email'
 
+log = logging.getLogger('schooltool.email')
+
+
+# Status of emails waiting for the dispatcher.
+QUEUED = 5
+
+# Status of emails claimed by a dispatcher that is sending them.
+SENDING = 6
+
+# Seconds after which an email claimed by a dispatcher that died is
+# sent again.
+CLAIM_TIMEOUT_SECONDS = 15*60
+
+# Failures that may go away by themselves; such emails are retried.
+TRANSIENT_STATUS_CODES = (20, 30, 70)
+
+# Seconds to wait before retrying an email that failed n times.
+RETRY_BACKOFF_SECONDS = (60, 5*60, 20*60, 60*60, 4*60*60)
 
 status_messages = {
+    QUEUED: _('Waiting to be sent'),
+    SENDING: _('Being sent'),
     10: _('The SchoolTool mail service is disabled'),
     20: _("Couldn't connect to the SMTP server (${info})"),
     30: _('Error sending HELO to the SMTP server (${info})'),
@@ -73,6 +103,59 @@ class Email(Persistent, Contained):
         self.time_created = pytz.utc.localize(datetime.utcnow())
         self.time_sent = None
 
+    # Number of failed attempts to send the email.
+    attempts = 0
+
+
+class MailQueueStatistics(Persistent):
+    """Counters of the mail dispatcher.
+
+    Dispatchers run in the task workers, so the counters are stored in
+    the database, in conflict free Length objects.
+    """
+
+    last_dispatch = None
+    last_sent = 0
+    last_duration = 0.0
+
+    def __init__(self):
+        self._sent = Length()
+        self._failed = Length()
+        self._connections = Length()
+
+    @property
+    def sent(self):
+        return self._sent()
+
+    @property
+    def failed(self):
+        return self._failed()
+
+    @property
+    def connections(self):
+        return self._connections()
+
+    def recordSent(self):
+        self._sent.change(1)
+
+    def recordFailed(self):
+        self._failed.change(1)
+
+    def recordDispatch(self, sent, connections, duration, now=None):
+        if now is None:
+            now = pytz.utc.localize(datetime.utcnow())
+        self._connections.change(connections)
+        self.last_dispatch = now
+        self.last_sent = sent
+        self.last_duration = duration
+
+    @property
+    def throughput(self):
+        """Emails per second sent by the last dispatch."""
+        if not self.last_duration:
+            return None
+        return self.last_sent / self.last_duration
+
 
 class EmailContainer(BTreeContainer):
 
@@ -84,6 +167,11 @@ class EmailContainer(BTreeContainer):
     username = None
     password = None
     tls = None
+    statistics = None
+
+    def __init__(self):
+        super(EmailContainer, self).__init__()
+        self.statistics = MailQueueStatistics()
 
 
 class EmailAppStartup(StartUpBase):
@@ -91,6 +179,9 @@ class EmailAppStartup(StartUpBase):
     def __call__(self):
         if EMAIL_KEY not in self.app:
             self.app[EMAIL_KEY] = EmailContainer()
+        container = self.app[EMAIL_KEY]
+        if container.statistics is None:
+            container.statistics = MailQueueStatistics()
 
 
 class EmailInit(InitBase):
@@ -105,12 +196,108 @@ def getEmailContainer(app):
     return app.get(EMAIL_KEY)
 
 
+class SMTPConnectionPool(object):
+    """Authenticated SMTP connections kept open between sends.
+
+    Connections are pooled by server settings.  Idle connections older
+    than max_idle seconds are closed instead of reused.
+    """
+
+    def __init__(self, size=2, max_idle=60):
+        self.size = size
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def key(self, container):
+        return (container.hostname, container.port or 25,
+                container.username, bool(container.tls))
+
+    def discard(self, connection):
+        try:
+            connection.quit()
+        except (socket.error, smtplib.SMTPException):
+            pass
+
+    def acquire(self, key):
+        """Return an idle connection that still works, or None."""
+        now = time.time()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                released, connection = idle.pop()
+            if now - released > self.max_idle:
+                self.discard(connection)
+                continue
+            try:
+                code, response = connection.noop()
+            except (socket.error, smtplib.SMTPException):
+                continue
+            if code == 250:
+                return connection
+            self.discard(connection)
+
+    def release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((time.time(), connection))
+                return
+        self.discard(connection)
+
+    def clear(self):
+        with self._lock:
+            connections = [connection
+                           for idle in self._idle.values()
+                           for released, connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            self.discard(connection)
+
+
+connection_pool = SMTPConnectionPool()
+
+# Transactions that already scheduled a dispatch.
+_dispatch_scheduled = weakref.WeakKeyDictionary()
+
+
+def countdownTo(when):
+    """Whole seconds from now until the given UTC datetime, at least 1."""
+    now = pytz.utc.localize(datetime.utcnow())
+    return max(1, int(math.ceil((when - now).total_seconds())))
+
+
+class SMTPFailure(Exception):
+    """Sending failed; carries the status code and parameters."""
+
+    def __init__(self, status_code, status_parameters, broken=False):
+        Exception.__init__(self, status_code, status_parameters)
+        self.status_code = status_code
+        self.status_parameters = status_parameters
+        # The connection cannot be used any more.
+        self.broken = broken
+
+
 class EmailUtility(object):
 
     implements(IEmailUtility)
 
     smtp_factory = None
 
+    pool = connection_pool
+
+    # Emails sent over one connection before it is given back.
+    batch_size = 50
+
+    # Attempts to commit the outcome of a sent email.
+    commit_retries = 3
+
+    @property
+    def statistics(self):
+        return getattr(self.getEmailContainer(), 'statistics', None)
+
     def getEmailContainer(self):
         app = ISchoolToolApplication(None)
         return IEmailContainer(app)
@@ -146,13 +333,26 @@ class EmailUtility(object):
         container = self.getEmailContainer()
         return container.enabled
 
-    def send(self, email):
-        self.container = self.getEmailContainer()
-        if not self.enabled():
-            self.queue(email, 10)
-            return False
-        server_info = '%s:%d' % (self.container.hostname,
-                                 self.container.port or 25)
+    @property
+    def server_info(self):
+        return '%s:%d' % (self.container.hostname, self.container.port or 25)
+
+    def connect(self):
+        """Return a pooled or a new authenticated connection.
+
+        Raises SMTPFailure if the connection cannot be made.
+        """
+        connection = self.pool.acquire(self.pool.key(self.container))
+        if connection is not None:
+            return connection
+        return self.open()
+
+    def open(self):
+        """Return a new authenticated connection.
+
+        Raises SMTPFailure if the connection cannot be made.
+        """
+        server_info = self.server_info
         try:
             connection = self.smtp_factory()
             if self.container.port:
@@ -174,17 +374,27 @@ class EmailUtility(object):
                     connection.login(self.container.username,
                                      self.container.password)
         except (socket.error,), e:
-            self.queue(email, 20, {'info': server_info})
-            return False
+            raise SMTPFailure(20, {'info': server_info}, broken=True)
         except (smtplib.SMTPHeloError,), e:
-            self.queue(email, 30, {'info': server_info})
             connection.quit()
-            return False
+            raise SMTPFailure(30, {'info': server_info}, broken=True)
         except (smtplib.SMTPException,), e:
-            self.queue(email, 40, {'info': server_info,
-                                   'username': self.container.username})
             connection.quit()
-            return False
+            raise SMTPFailure(40, {'info': server_info,
+                                   'username': self.container.username},
+                              broken=True)
+        return connection
+
+    def release(self, connection):
+        self.pool.release(self.pool.key(self.container), connection)
+
+    def deliver(self, connection, email):
+        """Send the email over an open connection.
+
+        Raises SMTPFailure if the email was not sent to all recipients;
+        to_addresses are then left to the ones that failed.
+        """
+        server_info = self.server_info
         message = self.emailAsString(email)
         result = {}
         try:
@@ -192,36 +402,227 @@ class EmailUtility(object):
                                          email.to_addresses,
                                          message)
         except (smtplib.SMTPSenderRefused,), e:
-            self.queue(email, 50, {'info': server_info,
+            raise SMTPFailure(50, {'info': server_info,
                                    'from_address': e.sender})
-            connection.quit()
-            return False
         except (smtplib.SMTPRecipientsRefused,), e:
             addresses = e.recipients.keys()
-            self.queue(email, 60, {'info': server_info,
+            raise SMTPFailure(60, {'info': server_info,
                                    'addresses': ', '.join(addresses)})
-            connection.quit()
-            return False
         except (smtplib.SMTPHeloError,), e:
-            self.queue(email, 30, {'info': server_info})
-            connection.quit()
-            return False
+            raise SMTPFailure(30, {'info': server_info}, broken=True)
         except (smtplib.SMTPDataError,), e:
-            self.queue(email, 70, {'info': server_info})
-            connection.quit()
-            return False
+            raise SMTPFailure(70, {'info': server_info})
+        except (socket.error, smtplib.SMTPServerDisconnected), e:
+            raise SMTPFailure(20, {'info': server_info}, broken=True)
         if result:
             addresses = [address for address in email.to_addresses
                          if address in result.keys()]
             email.to_addresses = addresses[:]
-            self.queue(email, 60, {'info': server_info,
+            raise SMTPFailure(60, {'info': server_info,
                                    'addresses': ', '.join(addresses)})
-            connection.quit()
+
+    def send(self, email):
+        self.container = self.getEmailContainer()
+        if not self.enabled():
+            self.queue(email, 10)
+            return False
+        try:
+            connection = self.connect()
+        except SMTPFailure, failure:
+            self.fail(email, failure)
+            return False
+        try:
+            self.deliver(connection, email)
+        except SMTPFailure, failure:
+            self.fail(email, failure)
+            if failure.broken:
+                self.pool.discard(connection)
+            else:
+                self.release(connection)
             return False
-        connection.quit()
+        self.release(connection)
         return True
 
+    def fail(self, email, failure):
+        """Queue the failed email; transient failures are retried."""
+        email.attempts += 1
+        self.queue(email, failure.status_code, failure.status_parameters)
+        retry_at = self.retryAt(email)
+        if retry_at is not None:
+            self.scheduleDispatch(countdown=countdownTo(retry_at))
+
+    def enqueue(self, email):
+        self.container = self.getEmailContainer()
+        if not self.enabled():
+            self.queue(email, 10)
+            return
+        email.attempts = 0
+        self.queue(email, QUEUED)
+        self.scheduleDispatch()
+
+    def scheduleDispatch(self, countdown=None):
+        if not self.enabled():
+            return None
+        current = transaction.get()
+        if current in _dispatch_scheduled:
+            return None
+        _dispatch_scheduled[current] = True
+        task = DispatchEmailTask()
+        if countdown is None:
+            return task.schedule(None)
+        return task.schedule(None, countdown=countdown)
+
+    def retryAt(self, email):
+        if email.status_code == QUEUED:
+            return email.time_sent
+        if email.status_code == SENDING:
+            return email.time_sent + timedelta(seconds=CLAIM_TIMEOUT_SECONDS)
+        if email.status_code not in TRANSIENT_STATUS_CODES:
+            return None
+        backoff = RETRY_BACKOFF_SECONDS[
+            min(max(email.attempts, 1), len(RETRY_BACKOFF_SECONDS)) - 1]
+        return email.time_sent + timedelta(seconds=backoff)
+
+    def pending(self, now=None):
+        """Return emails due to be sent (by the dispatcher) and the time
+        the next one will be due."""
+        if now is None:
+            now = pytz.utc.localize(datetime.utcnow())
+        due = []
+        next_retry = None
+        for name, email in self.container.items():
+            retry_at = self.retryAt(email)
+            if retry_at is None:
+                continue
+            if retry_at <= now:
+                due.append((email.time_created, name))
+            elif next_retry is None or retry_at < next_retry:
+                next_retry = retry_at
+        return [name for time_created, name in sorted(due)], next_retry
+
+    def queueDepth(self):
+        """Number of emails the dispatcher will send or retry."""
+        self.container = self.getEmailContainer()
+        return len([email for email in self.container.values()
+                    if self.retryAt(email) is not None])
+
+    def commitOutcome(self, name, change):
+        """Record what happened to a handed over email, and commit.
+
+        change(email) is applied in a transaction of its own, retried on
+        conflicts, so that a sent email is not sent again.  Returns the
+        email, or None if it is gone.
+        """
+        for attempt in range(self.commit_retries):
+            email = self.container.get(name)
+            if email is not None:
+                change(email)
+            try:
+                transaction.commit()
+                return email
+            except ConflictError:
+                transaction.abort()
+        log.error("Could not record the outcome of sending email %s", name)
+        return None
+
+    def claim(self, name, now=None):
+        """Mark a due email as being sent, and commit.
+
+        Of the dispatchers running at the same time only one can claim
+        an email, the others get a conflict and then see it claimed.
+        Returns the email, or None if it is gone or not due any more.
+        """
+        if now is None:
+            now = pytz.utc.localize(datetime.utcnow())
+        claimed = []
+        def change(email):
+            del claimed[:]
+            retry_at = self.retryAt(email)
+            if retry_at is None or retry_at > now:
+                return
+            self.queue(email, SENDING)
+            claimed.append(email)
+        email = self.commitOutcome(name, change)
+        if email is None or not claimed:
+            return None
+        return email
+
+    def removeSent(self, email):
+        del self.container[email.__name__]
+        self.statistics.recordSent()
+
+    def recordFailure(self, failure):
+        def change(email):
+            email.attempts += 1
+            self.queue(email, failure.status_code, failure.status_parameters)
+            self.statistics.recordFailed()
+        return change
+
+    def dispatch(self):
+        """Send the queued emails, batch_size per connection.
+
+        Each email is claimed before it is sent, so that concurrent
+        dispatchers do not send it twice.  Sent emails are removed from
+        the queue, each in a transaction of its own.  Emails that failed for a transient reason are retried
+        later, with growing delays.  Returns the number of emails sent.
+        """
+        self.container = self.getEmailContainer()
+        if not self.enabled():
+            return 0
+        started = time.time()
+        names, next_retry = self.pending()
+        sent = opened = 0
+        connection = None
+        in_batch = 0
+        key = self.pool.key(self.container)
+        for name in names:
+            email = self.claim(name)
+            if email is None:
+                # Deleted or claimed by someone else meanwhile.
+                continue
+            try:
+                if connection is None:
+                    connection = self.pool.acquire(key)
+                    if connection is None:
+                        connection = self.open()
+                        opened += 1
+                    in_batch = 0
+                self.deliver(connection, email)
+            except SMTPFailure, failure:
+                if failure.broken and connection is not None:
+                    self.pool.discard(connection)
+                    connection = None
+                email = self.commitOutcome(name, self.recordFailure(failure))
+                retry_at = email is not None and self.retryAt(email)
+                if (retry_at and
+                    (next_retry is None or retry_at < next_retry)):
+                    next_retry = retry_at
+                if failure.status_code == 20:
+                    # No server to talk to, leave the rest for later.
+                    break
+                continue
+            self.commitOutcome(name, self.removeSent)
+            sent += 1
+            in_batch += 1
+            if in_batch >= self.batch_size:
+                self.release(connection)
+                connection = None
+        if connection is not None:
+            self.release(connection)
+        self.statistics.recordDispatch(sent, opened, time.time() - started)
+        if next_retry is not None:
+            self.scheduleDispatch(countdown=countdownTo(next_retry))
+        return sent
+
 
 class SMTPEmailUtility(EmailUtility):
 
     smtp_factory = smtplib.SMTP
+
+
+class DispatchEmailTask(RemoteTask):
+    """Send queued emails in the background."""
+
+    def execute(self, request):
+        utility = getUtility(IEmailUtility)
+        return utility.dispatch()
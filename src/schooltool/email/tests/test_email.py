@@ -22,6 +22,7 @@ Unit tests for email functionality.
 import unittest
 import doctest
 
+from ZODB.POSException import ConflictError
 from zope.interface import implements
 from zope.interface.verify import verifyObject
 from zope.component import provideAdapter
@@ -238,6 +239,255 @@ def doctest_EmailUtility():
     """
 
 
+class SMTPStub(object):
+    """Fake SMTP connection that refuses some recipients."""
+
+    does_esmtp = False
+    opened = 0
+
+    def __init__(self):
+        SMTPStub.opened += 1
+        self.sent = []
+
+    def connect(self, hostname, port):
+        if hostname == 'down':
+            import socket
+            raise socket.error('connection refused')
+
+    def ehlo(self):
+        return 250, 'hello'
+
+    def has_extn(self, name):
+        return False
+
+    def noop(self):
+        return 250, 'ok'
+
+    def sendmail(self, from_address, to_addresses, message):
+        self.sent.append(to_addresses)
+        return dict([(address, (550, 'no such user'))
+                     for address in to_addresses
+                     if address.startswith('bad')])
+
+    def quit(self):
+        pass
+
+
+def doctest_EmailUtility_dispatch():
+    """Tests for sending queued emails in the background.
+
+        >>> from schooltool.email.mail import Email, EmailContainer
+        >>> from schooltool.email.mail import EmailUtility, SMTPConnectionPool
+        >>> from schooltool.email.mail import QUEUED
+
+        >>> class AppStub(object):
+        ...     implements(ISchoolToolApplication)
+        ...     emails = EmailContainer()
+        >>> app = AppStub()
+        >>> app.emails.enabled = True
+        >>> app.emails.hostname = 'localhost'
+        >>> provideAdapter(lambda app: app.emails,
+        ...                adapts=(ISchoolToolApplication, ),
+        ...                provides=IEmailContainer)
+        >>> provideAdapter(lambda ignored: app,
+        ...                adapts=(None, ), provides=ISchoolToolApplication)
+
+        >>> class UtilityStub(EmailUtility):
+        ...     smtp_factory = SMTPStub
+        ...     batch_size = 2
+        ...     def emailAsString(self, email):
+        ...         return email.body
+        ...     def scheduleDispatch(self, countdown=None):
+        ...         print 'Dispatch scheduled, countdown %s' % countdown
+        >>> util = UtilityStub()
+        >>> util.pool = SMTPConnectionPool()
+
+    Enqueued emails wait in the container for the dispatcher task.
+
+        >>> for n in range(5):
+        ...     util.enqueue(Email(u'from@test', [u'to%d@test' % n], u'Hi'))
+        Dispatch scheduled, countdown None
+        Dispatch scheduled, countdown None
+        Dispatch scheduled, countdown None
+        Dispatch scheduled, countdown None
+        Dispatch scheduled, countdown None
+        >>> util.enqueue(Email(u'from@test', [u'bad@test'], u'Hi'))
+        Dispatch scheduled, countdown None
+        >>> [email.status_code == QUEUED for email in app.emails.values()]
+        [True, True, True, True, True, True]
+        >>> util.queueDepth()
+        6
+
+    The dispatcher sends them in batches over pooled connections; sent
+    emails leave the queue, each in a transaction of its own.
+
+        >>> SMTPStub.opened = 0
+        >>> util.dispatch()
+        5
+        >>> SMTPStub.opened
+        1
+        >>> len(util.pool._idle.values()[0])
+        1
+
+    Refused recipients are a permanent failure, not retried.
+
+        >>> [(email.to_addresses, email.status_code, email.attempts)
+        ...  for email in app.emails.values()]
+        [([u'bad@test'], 60, 1)]
+        >>> util.queueDepth()
+        0
+
+    The counters are kept in the email container, so that the web
+    server sees what the task workers did.
+
+        >>> stats = util.statistics
+        >>> stats is app.emails.statistics
+        True
+        >>> stats.sent, stats.failed, stats.connections, stats.last_sent
+        (5, 1, 1, 5)
+
+    When the server is down, emails are retried later, with growing
+    delays.
+
+        >>> del app.emails[app.emails.keys()[0]]
+        >>> util.pool.clear()
+        >>> app.emails.hostname = 'down'
+        >>> util.enqueue(Email(u'from@test', [u'to@test'], u'Hi'))
+        Dispatch scheduled, countdown None
+        >>> util.dispatch()
+        Dispatch scheduled, countdown 60
+        0
+        >>> email = app.emails.values()[0]
+        >>> email.status_code, email.attempts
+        (20, 1)
+        >>> util.retryAt(email) - email.time_sent
+        datetime.timedelta(0, 60)
+        >>> email.attempts = 2
+        >>> util.retryAt(email) - email.time_sent
+        datetime.timedelta(0, 300)
+
+    The email is not due yet, so the dispatcher just waits.
+
+        >>> util.dispatch()
+        Dispatch scheduled, countdown 300
+        0
+
+    """
+
+
+class ConflictingDataManager(object):
+    """Data manager that fails to commit a few times."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+
+    def abort(self, txn):
+        pass
+
+    def tpc_begin(self, txn):
+        pass
+
+    def commit(self, txn):
+        pass
+
+    def tpc_vote(self, txn):
+        if self.conflicts:
+            self.conflicts -= 1
+            raise ConflictError()
+
+    def tpc_finish(self, txn):
+        pass
+
+    def tpc_abort(self, txn):
+        pass
+
+    def sortKey(self):
+        return 'conflicting'
+
+
+def doctest_EmailUtility_commitOutcome():
+    """Tests for EmailUtility.commitOutcome.
+
+        >>> import transaction
+        >>> from schooltool.email.mail import Email, EmailContainer
+        >>> from schooltool.email.mail import EmailUtility
+
+        >>> util = EmailUtility()
+        >>> util.container = EmailContainer()
+        >>> util.container['1'] = Email(u'from@test', [u'to@test'], u'Hi')
+
+    The outcome of sending an email is retried on conflicts, so that a
+    sent email does not stay in the queue.
+
+        >>> manager = ConflictingDataManager(conflicts=2)
+        >>> def change(email):
+        ...     print 'Changing', email.__name__
+        ...     transaction.get().join(manager)
+        >>> util.commitOutcome('1', change) is util.container['1']
+        Changing 1
+        Changing 1
+        Changing 1
+        True
+
+    Retries are limited.
+
+        >>> manager = ConflictingDataManager(conflicts=5)
+        >>> print util.commitOutcome('1', change)
+        Changing 1
+        Changing 1
+        Changing 1
+        None
+
+    Emails deleted meanwhile are skipped.
+
+        >>> print util.commitOutcome('2', change)
+        None
+
+    """
+
+
+def doctest_EmailUtility_claim():
+    """Tests for EmailUtility.claim.
+
+        >>> from datetime import timedelta
+        >>> from schooltool.email.mail import Email, EmailContainer
+        >>> from schooltool.email.mail import EmailUtility
+        >>> from schooltool.email.mail import QUEUED, SENDING
+
+        >>> util = EmailUtility()
+        >>> util.container = EmailContainer()
+        >>> util.queue(Email(u'from@test', [u'to@test'], u'Hi'), QUEUED)
+        >>> email = util.container.values()[0]
+        >>> name = email.__name__
+
+    Before sending, a dispatcher claims the email in a transaction of
+    its own.
+
+        >>> util.claim(name) is email
+        True
+        >>> email.status_code == SENDING
+        True
+
+    Another dispatcher running at the same time leaves it alone.
+
+        >>> print util.claim(name)
+        None
+        >>> print util.claim('missing')
+        None
+
+    If the claiming dispatcher died, the email is sent again later.
+
+        >>> later = util.retryAt(email)
+        >>> later - email.time_sent
+        datetime.timedelta(0, 900)
+        >>> print util.claim(name, now=later - timedelta(seconds=1))
+        None
+        >>> util.claim(name, now=later) is email
+        True
+
+    """
+
+
 def setUp(test=None):
     setup.placefulSetUp()
     provideAdapter(NameChooser, adapts=(IEmailContainer, ))
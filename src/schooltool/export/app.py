@@ -20,8 +20,14 @@ SchoolTool exporter generic views.
 """
 
 from schooltool.export.export import RequestXLSReportDialog
+from schooltool.export.export import RequestXLSXReportDialog
 
 
 class FlourishRequestXLSExportView(RequestXLSReportDialog):
 
     report_builder = 'export.xls'
+
+
+class FlourishRequestXLSXExportView(RequestXLSXReportDialog):
+
+    report_builder = 'export.xlsx'
@@ -40,6 +40,7 @@ from schooltool.contact.interfaces import IContact, IContactContainer
 from schooltool.contact.interfaces import IContactable
 from schooltool.export.interfaces import IXLSExportView
 from schooltool.export.interfaces import IXLSProgressMessage
+from schooltool.export import xlsx
 from schooltool.schoolyear.interfaces import ISchoolYearContainer
 from schooltool.term.interfaces import ITermContainer
 from schooltool.course.interfaces import ICourseContainer
@@ -902,12 +903,15 @@ class MegaExporter(SchoolTimetableExportView):
         self.setUpHeaders(data)
         return data
 
+    def createWorkbook(self):
+        return xlwt.Workbook()
+
     def __call__(self):
         self.makeProgress()
         self.task_progress.title = _("Exporting school data")
         self.addImporters(self.task_progress)
 
-        wb = xlwt.Workbook()
+        wb = self.createWorkbook()
         self.export_school_years(wb)
         self.export_terms(wb)
         self.export_school_timetables(wb)
@@ -938,6 +942,18 @@ class XLSReportTask(AbstractReportTask):
         workbook.save(stream)
 
 
+class XLSXReportTask(XLSReportTask):
+
+    default_filename = 'report.xlsx'
+    default_mimetype = xlsx.XLSX_MIMETYPE
+
+    def renderReport(self, renderer, stream, *args, **kw):
+        # Rows are written straight to the report file as they are made.
+        renderer.workbook_stream = stream
+        super(XLSXReportTask, self).renderReport(
+            renderer, stream, *args, **kw)
+
+
 class RemoteMegaExporter(MegaExporter):
 
     base_filename = 'school'
@@ -949,11 +965,26 @@ class RemoteMegaExporter(MegaExporter):
         return workbook
 
 
+class RemoteXLSXMegaExporter(RemoteMegaExporter):
+
+    file_extension = 'xlsx'
+    mimetype = xlsx.XLSX_MIMETYPE
+    workbook_stream = None
+
+    def createWorkbook(self):
+        return xlsx.Workbook(self.workbook_stream)
+
+
 class RequestXLSReportDialog(RequestRemoteReportDialog):
 
     task_factory = XLSReportTask
 
 
+class RequestXLSXReportDialog(RequestRemoteReportDialog):
+
+    task_factory = XLSXReportTask
+
+
 class XLSProgressMessage(ReportMessage):
     implements(IXLSProgressMessage)
 
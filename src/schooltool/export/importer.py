@@ -19,7 +19,6 @@
 SchoolTool simple import views.
 """
 import xlrd
-import datetime
 import urllib
 import transaction
 from decimal import Decimal, InvalidOperation
@@ -52,6 +51,7 @@ from schooltool.contact.interfaces import IContact, IContactContainer
 from schooltool.contact.interfaces import IContactable
 from schooltool.contact.contact import getAppContactStates
 from schooltool.export.interfaces import IImporterTask, IImportFile
+from schooltool.export.sheets import columnar, open_workbook
 from schooltool.resource.resource import Resource
 from schooltool.resource.resource import Location
 from schooltool.resource.resource import Equipment
@@ -165,15 +165,129 @@ no_date = object()
 no_data = object()
 
 
+class ImportLookups(object):
+    """Objects the importers of one import run look up by id.
+
+    Found objects are cached, misses are not.  Importers remember the
+    objects they create or update, so that later rows and importers
+    find them without traversing the containers again.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.persons = {}
+        self.years = {}
+        self.terms = {}
+        self.courses = {}
+        self.sections = {}
+        self.resources = {}
+        self.app_states = {}
+        self.members = {}
+
+    def _lookup(self, cache, key, container, name):
+        obj = cache.get(key)
+        if obj is None and container is not None:
+            obj = container.get(name)
+            if obj is not None:
+                cache[key] = obj
+        return obj
+
+    def person(self, username):
+        return self._lookup(self.persons, username,
+                            self.context['persons'], username)
+
+    def rememberPerson(self, person):
+        self.persons[person.username] = person
+
+    def resource(self, resource_id):
+        return self._lookup(self.resources, resource_id,
+                            self.context['resources'], resource_id)
+
+    def schoolYear(self, year_id):
+        return self._lookup(self.years, year_id,
+                            ISchoolYearContainer(self.context), year_id)
+
+    def term(self, year_id, term_id):
+        key = (year_id, term_id)
+        if key in self.terms:
+            return self.terms[key]
+        return self._lookup(self.terms, key, self.schoolYear(year_id),
+                            term_id)
+
+    def termKey(self, term):
+        return (term.__parent__.__name__, term.__name__)
+
+    def rememberTerm(self, term):
+        self.terms[self.termKey(term)] = term
+
+    def course(self, year_id, course_id):
+        key = (year_id, course_id)
+        if key in self.courses:
+            return self.courses[key]
+        year = self.schoolYear(year_id)
+        courses = ICourseContainer(year) if year is not None else None
+        return self._lookup(self.courses, key, courses, course_id)
+
+    def rememberCourse(self, year_id, course):
+        self.courses[year_id, course.__name__] = course
+
+    def section(self, year_id, term_id, section_id):
+        key = (year_id, term_id, section_id)
+        if key in self.sections:
+            return self.sections[key]
+        term = self.term(year_id, term_id)
+        sections = ISectionContainer(term) if term is not None else None
+        return self._lookup(self.sections, key, sections, section_id)
+
+    def termSection(self, term, section_id):
+        year_id, term_id = self.termKey(term)
+        key = (year_id, term_id, section_id)
+        if key in self.sections:
+            return self.sections[key]
+        return self._lookup(self.sections, key, ISectionContainer(term),
+                            section_id)
+
+    def rememberSection(self, term, section):
+        self.sections[self.termKey(term) + (section.__name__, )] = section
+
+    def appStates(self, name):
+        states = self.app_states.get(name)
+        if states is None:
+            container = IRelationshipStateContainer(
+                ISchoolToolApplication(None))
+            states = self.app_states[name] = container[name]
+        return states
+
+    def allMembers(self, group):
+        """Everyone ever related to the group, as a set."""
+        group = removeSecurityProxy(group)
+        key = id(group)
+        if key not in self.members:
+            self.members[key] = (
+                group, set([removeSecurityProxy(member)
+                            for member in group.members.all()]))
+        return self.members[key][1]
+
+    def addMember(self, group, person):
+        person = removeSecurityProxy(person)
+        members = self.allMembers(group)
+        if person not in members:
+            removeSecurityProxy(group).members.add(person)
+            members.add(person)
+
+
 class ImporterBase(object):
 
     title = _("Import")
 
     def __init__(self, context, request,
-                 progress_callback=None):
+                 progress_callback=None, lookups=None):
         self.context, self.request = context, request
         self.errors = []
         self.progress_callback = progress_callback
+        if lookups is None:
+            lookups = ImportLookups(context)
+        self.lookups = lookups
 
     def progress(self, *args):
         progress = normalized_progress(*args)
@@ -184,14 +298,9 @@ class ImporterBase(object):
         # We'll pick 30 as an arbitrary number of columns to test so that we
         # don't need the caller to specify the number.  When a new column is
         # added to a sheet, the needed change in calling this method would
-        # likely be overlooked.  It's not that expensive anyway to test all 30.
-        for col in range(num_cols):
-            try:
-                if sheet.cell_value(rowx=row, colx=col):
-                    return False
-            except IndexError:
-                break
-        return True
+        # likely be overlooked.  The sheet knows the first non empty column
+        # of every row, so testing all 30 is free.
+        return sheet.isEmptyRow(row, num_cols)
 
     def getCellValue(self, sheet, row, col, default=no_data):
         try:
@@ -274,10 +383,8 @@ class ImporterBase(object):
             if not raw_date:
                 break
 
-            try:
-                date_tuple = xlrd.xldate_as_tuple(raw_date, self.wb.datemode)
-                date = datetime.datetime(*date_tuple).date()
-            except ValueError:
+            date = sheet.date(row, col)
+            if date is None:
                 self.error(row, col, ERROR_NO_DATE)
                 continue
 
@@ -307,12 +414,10 @@ class ImporterBase(object):
                 return None
             else:
                 return default
-        try:
-            dt = xlrd.xldate_as_tuple(value, self.wb.datemode)
-        except:
+        date = sheet.date(row, col)
+        if date is None:
             self.error(row, col, ERROR_NO_DATE)
-            return None
-        return datetime.datetime(*dt).date()
+        return date
 
     def getBoolFromCell(self, sheet, row, col):
         value, found = self.getCellAndFound(sheet, row, col)
@@ -378,7 +483,7 @@ class ImporterBase(object):
         return self.wb.sheet_by_name(self.sheet_name)
 
     def import_data(self, wb):
-        self.wb = wb
+        self.wb = columnar(wb)
         if self.sheet:
             return self.process()
 
@@ -422,6 +527,7 @@ class ImporterBase(object):
             sc[section.__name__] = section
         for course in courses:
             section.courses.add(removeSecurityProxy(course))
+        self.lookups.rememberSection(term, section)
         return section
 
     def updateRelationships(self, relationship, target, app_states, codes):
@@ -462,6 +568,7 @@ class SchoolYearImporter(ImporterBase):
         if sy.__name__ is None:
             sy.__name__ = SimpleNameChooser(syc).chooseName('', sy)
         syc[sy.__name__] = sy
+        self.lookups.years[sy.__name__] = sy
 
     def testOverlap(self, name, date):
         for sy in ISchoolYearContainer(self.context).values():
@@ -521,6 +628,7 @@ class TermImporter(ImporterBase):
         if term.__name__ is None:
             term.__name__ = SimpleNameChooser(sy).chooseName('', term)
         sy[term.__name__] = term
+        self.lookups.rememberTerm(term)
 
     def testBeforeYearStart(self, sy, date):
         return date < ISchoolYearContainer(self.context)[sy].first
@@ -911,6 +1019,7 @@ class PersonImporter(ImporterBase):
             self.applyData(person, data)
         else:
             pc[person.username] = person
+        self.lookups.rememberPerson(person)
         return person
 
     def process(self):
@@ -1118,8 +1227,7 @@ class ContactRelationshipImporter(ImporterBase):
         sh = self.sheet
         app = ISchoolToolApplication(None)
         app_states = getAppContactStates()
-        app_codes = list(app_states.states)
-        persons = app['persons']
+        app_codes = frozenset(app_states.states)
         contacts = IContactContainer(app)
         nrows = sh.nrows
         for row in range(1, nrows):
@@ -1132,10 +1240,10 @@ class ContactRelationshipImporter(ImporterBase):
             data['__name__'] = self.getRequiredIdFromCell(sh, row, 0)
             self.validateUnicode(data['__name__'], row, 0)
             if num_errors == len(self.errors):
-                if data['__name__'] not in persons:
+                person = removeSecurityProxy(
+                    self.lookups.person(data['__name__']))
+                if person is None:
                     self.error(row, 0, ERROR_INVALID_PERSON_ID)
-                else:
-                    person = persons[data['__name__']]
 
             current_errors = len(self.errors)
             data['contact_name'] = self.getRequiredTextFromCell(sh, row, 1)
@@ -1143,8 +1251,9 @@ class ContactRelationshipImporter(ImporterBase):
             if current_errors == len(self.errors):
                 self.validateUnicode(name, row, 1)
             if current_errors == len(self.errors):
-                if name in persons:
-                    contact = IContact(persons[name])
+                contact_person = removeSecurityProxy(self.lookups.person(name))
+                if contact_person is not None:
+                    contact = IContact(contact_person)
                 elif name in contacts:
                     contact = contacts[name]
                 else:
@@ -1200,6 +1309,7 @@ class CourseImporter(ImporterBase):
             if not course.__name__:
                 course.__name__ = SimpleNameChooser(cc).chooseName('', course)
             cc[course.__name__] = course
+        self.lookups.rememberCourse(data['school_year'], course)
         self.updateCourse(course, data)
 
     def process(self):
@@ -1258,6 +1368,7 @@ class SectionImporter(ImporterBase):
 
         if section.__name__ not in sc:
             sc[section.__name__] = section
+        self.lookups.rememberSection(term, section)
 
         if data['link']:
             previous_term = getPreviousTerm(term)
@@ -1379,7 +1490,6 @@ class SectionImporter(ImporterBase):
             self.error(row, 0, ERROR_HAS_NO_COURSES)
             return
 
-        persons = self.context['persons']
         if self.getCellValue(sh, row, 0, '') == 'Students':
             row += 1
             for row in range(row, sh.nrows):
@@ -1390,10 +1500,10 @@ class SectionImporter(ImporterBase):
                 username = self.getRequiredIdFromCell(sh, row, 0)
                 if num_errors < len(self.errors):
                     continue
-                if username not in persons:
+                member = self.lookups.person(username)
+                if member is None:
                     self.error(row, 0, ERROR_INVALID_PERSON_ID)
                     continue
-                member = persons[username]
 
                 if member not in section.members:
                     section.members.add(removeSecurityProxy(member))
@@ -1411,10 +1521,10 @@ class SectionImporter(ImporterBase):
                 username = self.getRequiredIdFromCell(sh, row, 0)
                 if num_errors < len(self.errors):
                     continue
-                if username not in persons:
+                instructor = self.lookups.person(username)
+                if instructor is None:
                     self.error(row, 0, ERROR_INVALID_PERSON_ID)
                     continue
-                instructor = persons[username]
 
                 if instructor not in section.instructors:
                     section.instructors.add(removeSecurityProxy(instructor))
@@ -1456,7 +1566,7 @@ class SectionImporter(ImporterBase):
                 self.progress(n, nsheets, row, nrows)
 
     def import_data(self, wb):
-        self.wb = wb
+        self.wb = columnar(wb)
         self.sheet_names = []
         for sheet_name in self.wb.sheet_names():
             if (sheet_name.startswith('Section') and sheet_name not in
@@ -1479,9 +1589,10 @@ class SectionsImporter(ImporterBase):
             if previous_term is None:
                 self.error(row, 4, ERROR_CURRENT_SECTION_FIRST_TERM)
             else:
-                previous_sections = ISectionContainer(previous_term)
-                if link_id in previous_sections:
-                    previous_sections[link_id].next = section
+                previous_section = self.lookups.termSection(
+                    previous_term, link_id)
+                if previous_section is not None:
+                    previous_section.next = section
                 else:
                     self.error(row, 4, ERROR_INVALID_PREV_TERM_SECTION)
 
@@ -1491,16 +1602,15 @@ class SectionsImporter(ImporterBase):
             if next_term is None:
                 self.error(row, 5, ERROR_CURRENT_SECTION_LAST_TERM)
             else:
-                next_sections = ISectionContainer(next_term)
-                if link_id in next_sections:
-                    next_sections[link_id].previous = section
+                next_section = self.lookups.termSection(next_term, link_id)
+                if next_section is not None:
+                    next_section.previous = section
                 else:
                     self.error(row, 5, ERROR_INVALID_NEXT_TERM_SECTION)
 
     def process(self):
         sh = self.sheet
-        schoolyears = ISchoolYearContainer(self.context)
-        resources = self.context['resources']
+        lookups = self.lookups
         prev_links, next_links = {}, {}
 
         nrows = sh.nrows
@@ -1522,34 +1632,30 @@ class SectionsImporter(ImporterBase):
             if num_errors < len(self.errors):
                 continue
 
-            for resource_id in data['resources']:
-                if resource_id not in resources:
-                    self.error(row, 8, ERROR_INVALID_RESOURCE_ID_LIST)
-                    break
+            resources = [lookups.resource(resource_id)
+                         for resource_id in data['resources']]
+            if None in resources:
+                self.error(row, 8, ERROR_INVALID_RESOURCE_ID_LIST)
 
-            if data['year'] not in schoolyears:
+            if lookups.schoolYear(data['year']) is None:
                 self.error(row, 0, ERROR_INVALID_SCHOOL_YEAR)
                 continue
 
-            year = schoolyears[data['year']]
-            course_container = ICourseContainer(year)
-
             courses = []
             for course_id in data['courses']:
-                if course_id not in course_container:
+                course = lookups.course(data['year'], course_id)
+                if course is None:
                     self.error(row, 1, ERROR_INVALID_COURSE_ID_LIST)
                     break
-                else:
-                    course = course_container[course_id]
-                    courses.append(removeSecurityProxy(course))
+                courses.append(removeSecurityProxy(course))
 
-            if data['term'] not in year:
+            term = lookups.term(data['year'], data['term'])
+            if term is None:
                 self.error(row, 2, ERROR_INVALID_TERM_ID)
 
             if num_errors < len(self.errors):
                 continue
 
-            term = year[data['term']]
             section = self.createSection(data, term, courses)
 
             if data['link_prev']:
@@ -1558,8 +1664,7 @@ class SectionsImporter(ImporterBase):
             if data['link_next']:
                 next_links[row] = (section, data['link_next'])
 
-            for resource_id in data['resources']:
-                resource = resources[resource_id]
+            for resource in resources:
                 if resource not in section.resources:
                     section.resources.add(removeSecurityProxy(resource))
 
@@ -1571,7 +1676,7 @@ class SectionsImporter(ImporterBase):
 class SectionMixin(object):
 
     def get_sections(self, sh, row):
-        schoolyears = ISchoolYearContainer(self.context)
+        lookups = self.lookups
 
         sections = []
         current_year_id = None
@@ -1587,25 +1692,23 @@ class SectionMixin(object):
             if num_errors < len(self.errors):
                 continue
 
-            if year_id not in schoolyears:
+            if lookups.schoolYear(year_id) is None:
                 self.error(row, 0, ERROR_INVALID_SCHOOL_YEAR)
                 continue
             if current_year_id is not None and year_id != current_year_id:
                 self.error(row, 0, ERROR_INCONSISTENT_SCHOOL_YEAR)
                 continue
             current_year_id = year_id
-            year = schoolyears[year_id]
 
-            if term_id not in year:
+            if lookups.term(year_id, term_id) is None:
                 self.error(row, 1, ERROR_INVALID_TERM_ID)
                 continue
-            term = year[term_id]
-            section_container = ISectionContainer(term)
 
-            if section_id not in section_container:
+            section = lookups.section(year_id, term_id, section_id)
+            if section is None:
                 self.error(row, 2, ERROR_TERM_SECTION_ID)
                 continue
-            sections.append(section_container[section_id])
+            sections.append(section)
 
             self.progress(row, nrows)
 
@@ -1620,21 +1723,14 @@ class SectionEnrollmentImporter(ImporterBase, SectionMixin):
 
     @Lazy
     def student_app_states(self):
-        app = ISchoolToolApplication(None)
-        container = IRelationshipStateContainer(app)
-        app_states = container['section-membership']
-        return app_states
+        return self.lookups.appStates('section-membership')
 
     @Lazy
     def instructor_app_states(self):
-        app = ISchoolToolApplication(None)
-        container = IRelationshipStateContainer(app)
-        app_states = container['section-instruction']
-        return app_states
+        return self.lookups.appStates('section-instruction')
 
     def get_persons(self, sh, row, header, app_states):
-        app_codes = list(app_states.states)
-        persons = self.context['persons']
+        app_codes = frozenset(app_states.states)
         for row in range(row + 1, sh.nrows):
             if sh.cell_value(rowx=row, colx=0) == header:
                 break
@@ -1651,7 +1747,8 @@ class SectionEnrollmentImporter(ImporterBase, SectionMixin):
             if person_id is None:
                 continue
 
-            if person_id not in persons:
+            person = self.lookups.person(person_id)
+            if person is None:
                 self.error(row, 0, ERROR_INVALID_PERSON_ID)
                 self.progress(row, nrows)
                 continue
@@ -1663,7 +1760,7 @@ class SectionEnrollmentImporter(ImporterBase, SectionMixin):
                 else:
                     relationships[rel_date] = rel_code
 
-            result.append((persons[person_id], relationships))
+            result.append((person, relationships))
 
             self.progress(row, nrows)
 
@@ -1691,25 +1788,21 @@ class SectionEnrollmentImporter(ImporterBase, SectionMixin):
             year = ISchoolYear(sections[0])
 
             students_group = self.ensure_students_group(year)
-            all_student_members = students_group.members.all()
             student_states = self.student_app_states
 
             teachers_group = self.ensure_teachers_group(year)
             instructor_states = self.instructor_app_states
-            all_teacher_members = teachers_group.members.all()
 
             for section in sections:
                 for student, codes in students:
                     self.updateRelationships(
                         section.members, student, student_states, codes)
-                    if student not in all_student_members:
-                        students_group.members.add(removeSecurityProxy(student))
+                    self.lookups.addMember(students_group, student)
 
                 for instructor, codes in instructors:
                     self.updateRelationships(
                         section.instructors, instructor, instructor_states, codes)
-                    if instructor not in all_teacher_members:
-                        teachers_group.members.add(removeSecurityProxy(instructor))
+                    self.lookups.addMember(teachers_group, instructor)
 
             self.progress(row, nrows)
 
@@ -1853,9 +1946,7 @@ class LinkedSectionImporter(ImporterBase):
 
     def process(self):
         sh = self.sheet
-        schoolyears = ISchoolYearContainer(self.context)
-        persons = self.context['persons']
-        resources = self.context['resources']
+        lookups = self.lookups
 
         nrows = sh.nrows
         for row in range(1, nrows):
@@ -1876,32 +1967,30 @@ class LinkedSectionImporter(ImporterBase):
             if num_errors < len(self.errors):
                 continue
 
-            for person_id in data['instructors']:
-                if person_id not in persons:
-                    self.error(row, 6, ERROR_INVALID_PERSON_ID_LIST)
-                    break
+            instructors = [lookups.person(person_id)
+                           for person_id in data['instructors']]
+            if None in instructors:
+                self.error(row, 6, ERROR_INVALID_PERSON_ID_LIST)
 
-            for resource_id in data['resources']:
-                if resource_id not in resources:
-                    self.error(row, 8, ERROR_INVALID_RESOURCE_ID_LIST)
-                    break
+            resources = [lookups.resource(resource_id)
+                         for resource_id in data['resources']]
+            if None in resources:
+                self.error(row, 8, ERROR_INVALID_RESOURCE_ID_LIST)
 
-            if data['year'] not in schoolyears:
+            year = lookups.schoolYear(data['year'])
+            if year is None:
                 self.error(row, 0, ERROR_INVALID_SCHOOL_YEAR)
                 continue
 
-            year = schoolyears[data['year']]
             teachers = self.ensure_teachers_group(year)
-            course_container = ICourseContainer(year)
 
             courses = []
             for course_id in data['courses']:
-                if course_id not in course_container:
+                course = lookups.course(data['year'], course_id)
+                if course is None:
                     self.error(row, 1, ERROR_INVALID_COURSE_ID_LIST)
                     break
-                else:
-                    course = course_container[course_id]
-                    courses.append(removeSecurityProxy(course))
+                courses.append(removeSecurityProxy(course))
 
             terms = self.validateStartEndTerms(year, data, row, 2)
             if num_errors < len(self.errors):
@@ -1909,16 +1998,14 @@ class LinkedSectionImporter(ImporterBase):
 
             sections = self.createSectionsByTerm(data, terms, courses)
 
-            for person_id in data['instructors']:
-                teacher = persons[person_id]
+            for teacher in instructors:
                 for section in sections:
                     if teacher not in section.instructors:
                         section.instructors.add(removeSecurityProxy(teacher))
                     if teacher not in teachers.members:
                         teachers.members.add(removeSecurityProxy(teacher))
 
-            for resource_id in data['resources']:
-                resource = resources[resource_id]
+            for resource in resources:
                 for section in sections:
                     if resource not in section.resources:
                         section.resources.add(removeSecurityProxy(resource))
@@ -1955,10 +2042,7 @@ class GroupImporter(ImporterBase):
 
     @Lazy
     def group_app_states(self):
-        app = ISchoolToolApplication(None)
-        container = IRelationshipStateContainer(app)
-        app_states = container['group-membership']
-        return app_states
+        return self.lookups.appStates('group-membership')
 
     def import_group(self, sh, row):
         num_errors = len(self.errors)
@@ -1980,8 +2064,7 @@ class GroupImporter(ImporterBase):
         row += 4
 
         app_states = self.group_app_states
-        app_codes = list(app_states.states)
-        persons = self.context['persons']
+        app_codes = frozenset(app_states.states)
         if self.getCellValue(sh, row, 0, '') == 'Members':
             row += 1
             nrows = sh.nrows
@@ -1993,10 +2076,10 @@ class GroupImporter(ImporterBase):
                 username = self.getRequiredIdFromCell(sh, row, 0)
                 if num_errors < len(self.errors):
                     continue
-                if username not in persons:
+                member = self.lookups.person(username)
+                if member is None:
                     self.error(row, 0, ERROR_INVALID_PERSON_ID)
                     continue
-                member = persons[username]
 
                 relationships = {}
                 for rel_date, rel_code in self.iterRelationships(sh, row, 2):
@@ -2059,7 +2142,7 @@ class MegaImporter(BrowserView):
         self.data_provided = True
 
         try:
-            wb = xlrd.open_workbook(file_contents=xlsfile.read())
+            wb = open_workbook(xlsfile.read())
         except (xlrd.XLRDError,):
             self.is_xls = False
             wb = None
@@ -2071,9 +2154,10 @@ class MegaImporter(BrowserView):
         sp = transaction.savepoint(optimistic=True)
 
         importers = self.importers
+        lookups = ImportLookups(self.context)
 
         for importer in importers:
-            imp = importer(self.context, self.request)
+            imp = importer(self.context, self.request, lookups=lookups)
             imp.import_data(wb)
             self.errors.extend(imp.errors)
 
@@ -2309,7 +2393,7 @@ class RemoteMegaImporter(MegaImporter):
         progress = ImportProgress(self.importers, self.request.task_id)
 
         xls = remote_task.xls_file.open()
-        wb = xlrd.open_workbook(file_contents=xls.read())
+        wb = open_workbook(xls.read())
         xls.close()
 
         if wb is None:
@@ -2318,6 +2402,7 @@ class RemoteMegaImporter(MegaImporter):
 
         progress('overall', active=True)
         savepoint = transaction.savepoint(optimistic=True)
+        lookups = ImportLookups(self.context)
         for importer_n, importer in enumerate(importers):
             importer_lid = str(importer_n)
             for lid in progress.lines:
@@ -2335,7 +2420,8 @@ class RemoteMegaImporter(MegaImporter):
 
             imp = importer(
                 self.context, self.request,
-                progress_callback=import_progress)
+                progress_callback=import_progress,
+                lookups=lookups)
             imp.import_data(wb)
 
             for error in imp.errors:
@@ -2517,7 +2603,7 @@ class ImportProgressContent(flourish.page.Content, ImportProgressPage):
     pass
 
 
-class DownloadFile(BrowserView):
+class DownloadFile(BrowserView, flourish.widgets.FileDownloadMixin):
 
     attribute = None
     inline = False
@@ -2526,12 +2612,8 @@ class DownloadFile(BrowserView):
     def file_object(self):
         return getattr(self.context, self.attribute, None)
 
-    def setUpResponse(self, data, filename):
-        stored_file = self.file_object
+    def setUpResponse(self, filename):
         response = self.request.response
-        if stored_file.mimeType:
-            response.setHeader('Content-Type', stored_file.mimeType)
-        response.setHeader('Content-Length', len(data))
         disposition = self.inline and 'inline' or 'attachment'
         if filename:
             disposition += '; filename="%s"' % filename
@@ -2541,15 +2623,13 @@ class DownloadFile(BrowserView):
         stored_file = self.file_object
         if stored_file is None:
             return None
+        etag = flourish.widgets.fileETag(stored_file)
+        if self.notModified(etag):
+            return ''
         filename = getattr(stored_file, '__name__', '')
         filename = urllib.quote(filename.encode('UTF-8'))
-        f = stored_file.open()
-        data = f.read()
-        f.close()
-
-        self.setUpResponse(data, filename)
-
-        return data
+        self.setUpResponse(filename)
+        return self.streamFile(stored_file, etag=etag)
 
 
 class DownloadImportXLS(DownloadFile):
@@ -0,0 +1,146 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Columnar sheets for the importers.
+
+Every sheet of an uploaded workbook is decoded once into columns of
+values.  Derived columns (dates, row emptiness) are computed at most
+once per sheet, and cells that fail to decode are remembered in
+`ColumnarSheet.errors`.
+"""
+import datetime
+
+import xlrd
+
+
+class ColumnarSheet(object):
+    """An xlrd sheet decoded into columns.
+
+    Provides the part of the xlrd sheet API the importers use
+    (name, nrows, ncols and cell_value).
+    """
+
+    def __init__(self, sheet, datemode):
+        self.name = sheet.name
+        self.nrows = sheet.nrows
+        self.ncols = sheet.ncols
+        self.datemode = datemode
+        self.columns = [sheet.col_values(col) for col in range(self.ncols)]
+        self.errors = {}
+        self._dates = {}
+        self._first_values = None
+
+    def cell_value(self, rowx, colx):
+        return self.columns[colx][rowx]
+
+    def column(self, colx):
+        if colx >= self.ncols:
+            return []
+        return self.columns[colx]
+
+    def row(self, rowx):
+        return [column[rowx] for column in self.columns]
+
+    def firstValues(self):
+        """Column of the first non empty cell of every row (or None)."""
+        if self._first_values is None:
+            first = [None] * self.nrows
+            for colx in reversed(range(self.ncols)):
+                column = self.columns[colx]
+                for rowx in range(self.nrows):
+                    if column[rowx]:
+                        first[rowx] = colx
+            self._first_values = first
+        return self._first_values
+
+    def isEmptyRow(self, rowx, num_cols=None):
+        """Whether the first num_cols cells of the row are empty."""
+        if not 0 <= rowx < self.nrows:
+            return True
+        colx = self.firstValues()[rowx]
+        return colx is None or (num_cols is not None and colx >= num_cols)
+
+    def dates(self, colx):
+        """The column converted to dates.
+
+        Empty cells and cells that are not dates are None, the latter
+        are also recorded in errors.
+        """
+        dates = self._dates.get(colx)
+        if dates is not None:
+            return dates
+        dates = []
+        for rowx, value in enumerate(self.column(colx)):
+            date = None
+            if value != '':
+                try:
+                    date_tuple = xlrd.xldate_as_tuple(value, self.datemode)
+                    date = datetime.datetime(*date_tuple).date()
+                except Exception, e:
+                    self.errors[rowx, colx] = e
+            dates.append(date)
+        self._dates[colx] = dates
+        return dates
+
+    def date(self, rowx, colx):
+        dates = self.dates(colx)
+        if 0 <= rowx < len(dates):
+            return dates[rowx]
+        return None
+
+
+class ColumnarWorkbook(object):
+    """An xlrd workbook whose sheets are decoded once, when first used."""
+
+    def __init__(self, book):
+        self.book = book
+        self.datemode = book.datemode
+        self._sheet_names = book.sheet_names()
+        self._sheets = {}
+
+    def sheet_names(self):
+        return list(self._sheet_names)
+
+    def sheet_by_name(self, name):
+        sheet = self._sheets.get(name)
+        if sheet is None:
+            if name not in self._sheet_names:
+                raise xlrd.XLRDError('No sheet named <%r>' % name)
+            sheet = ColumnarSheet(self.book.sheet_by_name(name),
+                                  self.datemode)
+            self._sheets[name] = sheet
+        return sheet
+
+    def prepare(self):
+        """Decode all sheets and let go of the xlrd workbook."""
+        for name in self._sheet_names:
+            self.sheet_by_name(name)
+        self.book = None
+
+
+def columnar(wb):
+    if wb is None or isinstance(wb, ColumnarWorkbook):
+        return wb
+    return ColumnarWorkbook(wb)
+
+
+def open_workbook(data):
+    """Read and decode all sheets of an xls file."""
+    wb = ColumnarWorkbook(xlrd.open_workbook(file_contents=data))
+    wb.prepare()
+    return wb
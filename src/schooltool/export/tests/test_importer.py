@@ -0,0 +1,136 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for SchoolTool XLS import helpers.
+"""
+import unittest
+import doctest
+
+
+class ContainerStub(dict):
+
+    def __init__(self, name, *args):
+        dict.__init__(self, *args)
+        self.name = name
+
+    def get(self, key, default=None):
+        print 'Looking up %s in %s' % (key, self.name)
+        return dict.get(self, key, default)
+
+
+class PersonStub(object):
+
+    def __init__(self, username):
+        self.username = username
+
+    def __repr__(self):
+        return '<Person %s>' % self.username
+
+
+class MembersStub(object):
+
+    def __init__(self, members):
+        self.members = list(members)
+
+    def all(self):
+        print 'Loading all members'
+        return list(self.members)
+
+    def add(self, member):
+        print 'Adding %r' % member
+        self.members.append(member)
+
+
+class GroupStub(object):
+
+    def __init__(self, *members):
+        self.members = MembersStub(members)
+
+
+def doctest_ImportLookups():
+    """Tests for ImportLookups.
+
+        >>> from schooltool.export.importer import ImportLookups
+
+        >>> john = PersonStub('john')
+        >>> app = {'persons': ContainerStub('persons', {'john': john})}
+        >>> lookups = ImportLookups(app)
+
+    Found persons are looked up in the container once.
+
+        >>> lookups.person('john')
+        Looking up john in persons
+        <Person john>
+        >>> lookups.person('john')
+        <Person john>
+
+    Misses are not cached, the person may be created by a later
+    importer.
+
+        >>> print lookups.person('pete')
+        Looking up pete in persons
+        None
+        >>> pete = PersonStub('pete')
+        >>> app['persons']['pete'] = pete
+        >>> lookups.person('pete')
+        Looking up pete in persons
+        <Person pete>
+
+    Importers remember the persons they create.
+
+        >>> ann = PersonStub('ann')
+        >>> lookups.rememberPerson(ann)
+        >>> lookups.person('ann')
+        <Person ann>
+
+    """
+
+
+def doctest_ImportLookups_addMember():
+    """Tests for ImportLookups.addMember.
+
+        >>> from schooltool.export.importer import ImportLookups
+        >>> lookups = ImportLookups({})
+
+        >>> john, pete = PersonStub('john'), PersonStub('pete')
+        >>> group = GroupStub(john)
+
+    Members of a group are loaded once and only new members are added.
+
+        >>> lookups.addMember(group, john)
+        Loading all members
+        >>> lookups.addMember(group, pete)
+        Adding <Person pete>
+        >>> lookups.addMember(group, pete)
+        >>> lookups.addMember(group, john)
+
+        >>> group.members.members
+        [<Person john>, <Person pete>]
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_NDIFF)
+    return doctest.DocTestSuite(optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
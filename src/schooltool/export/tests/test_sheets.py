@@ -0,0 +1,137 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for columnar import sheets.
+"""
+import unittest
+import doctest
+import datetime
+from StringIO import StringIO
+
+import xlwt
+
+
+def makeXLS():
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet('Persons')
+    date_style = xlwt.XFStyle()
+    date_style.num_format_str = 'YYYY-MM-DD'
+    ws.write(0, 0, 'Username')
+    ws.write(0, 1, 'Birth date')
+    ws.write(1, 0, 'john')
+    ws.write(1, 1, datetime.date(2000, 1, 2), date_style)
+    ws.write(2, 0, 'pete')
+    ws.write(2, 1, 'tomorrow')
+    ws.write(4, 2, 'late')
+    ws.write(5, 1, 0.5)
+    wb.add_sheet('Empty')
+    data = StringIO()
+    wb.save(data)
+    return data.getvalue()
+
+
+def doctest_open_workbook():
+    """Tests for open_workbook.
+
+    All sheets are decoded when the workbook is opened.
+
+        >>> from schooltool.export.sheets import open_workbook
+        >>> wb = open_workbook(makeXLS())
+        >>> wb.sheet_names()
+        [u'Persons', u'Empty']
+        >>> wb.book is None
+        True
+
+        >>> sheet = wb.sheet_by_name('Persons')
+        >>> sheet is wb.sheet_by_name('Persons')
+        True
+        >>> sheet.nrows, sheet.ncols
+        (6, 3)
+        >>> sheet.cell_value(rowx=1, colx=0)
+        u'john'
+        >>> sheet.row(2)
+        [u'pete', u'tomorrow', u'']
+
+    Out of range cells raise IndexError, like they do in xlrd.
+
+        >>> sheet.cell_value(rowx=1, colx=3)
+        Traceback (most recent call last):
+          ...
+        IndexError: list index out of range
+
+        >>> wb.sheet_by_name('Missing')
+        Traceback (most recent call last):
+          ...
+        XLRDError: No sheet named <'Missing'>
+
+    """
+
+
+def doctest_ColumnarSheet_isEmptyRow():
+    """Tests for ColumnarSheet.isEmptyRow.
+
+        >>> from schooltool.export.sheets import open_workbook
+        >>> sheet = open_workbook(makeXLS()).sheet_by_name('Persons')
+
+        >>> [row for row in range(8) if sheet.isEmptyRow(row)]
+        [3, 6, 7]
+        >>> sheet.isEmptyRow(4, num_cols=2)
+        True
+        >>> sheet.isEmptyRow(4, num_cols=3)
+        False
+
+        >>> sheet = open_workbook(makeXLS()).sheet_by_name('Empty')
+        >>> sheet.isEmptyRow(0)
+        True
+
+    """
+
+
+def doctest_ColumnarSheet_dates():
+    """Tests for ColumnarSheet.dates.
+
+    A column is converted to dates once.  Cells that are not dates are
+    None and the failures are recorded.
+
+        >>> from schooltool.export.sheets import open_workbook
+        >>> sheet = open_workbook(makeXLS()).sheet_by_name('Persons')
+
+        >>> sheet.dates(1)
+        [None, datetime.date(2000, 1, 2), None, None, None, None]
+        >>> sheet.dates(1) is sheet.dates(1)
+        True
+        >>> sorted(sheet.errors)
+        [(0, 1), (2, 1), (5, 1)]
+
+        >>> sheet.date(1, 1)
+        datetime.date(2000, 1, 2)
+        >>> print sheet.date(10, 1), sheet.date(1, 10)
+        None None
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_NDIFF)
+    return doctest.DocTestSuite(optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
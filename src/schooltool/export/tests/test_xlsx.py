@@ -0,0 +1,142 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for the streaming XLSX workbook writer.
+"""
+import unittest
+import doctest
+
+
+def doctest_Workbook():
+    """Tests for Workbook.
+
+    The workbook takes xlwt styles, the ones export views make.
+
+        >>> import datetime, zipfile
+        >>> import xlwt
+        >>> from StringIO import StringIO
+        >>> from schooltool.export.xlsx import Workbook
+
+        >>> bold = xlwt.XFStyle()
+        >>> bold.font.bold = True
+        >>> date_style = xlwt.XFStyle()
+        >>> date_style.num_format_str = 'YYYY-MM-DD'
+
+        >>> stream = StringIO()
+        >>> wb = Workbook(stream)
+        >>> ws = wb.add_sheet('People')
+        >>> ws.write(0, 0, 'Name', bold)
+        >>> ws.write(0, 1, 'Born', bold)
+        >>> ws.write(1, 0, u'J\\u014dn <&>\\x01')
+        >>> ws.write(1, 1, datetime.date(2000, 1, 1), date_style)
+        >>> ws.write(2, 0, 42)
+        >>> ws.write_merge(3, 3, 0, 1, 'Merged', bold)
+
+    Rows far enough above the last written one are already in the
+    stream and can not be changed any more.
+
+        >>> ws.write(40, 0, 'Far')
+        >>> ws.write(2, 1, 'Late')
+        Traceback (most recent call last):
+          ...
+        ValueError: Row 2 of sheet 'People' is already saved
+
+    Adding a sheet finishes the previous one.
+
+        >>> ws2 = wb.add_sheet('Empty')
+        >>> ws.write(41, 0, 'Late')
+        Traceback (most recent call last):
+          ...
+        ValueError: Sheet 'People' is already saved
+
+        >>> wb.save(stream)
+
+        >>> zf = zipfile.ZipFile(StringIO(stream.getvalue()))
+        >>> zf.testzip()
+        >>> sorted(zf.namelist())
+        ['[Content_Types].xml', '_rels/.rels', 'xl/_rels/workbook.xml.rels',
+         'xl/styles.xml', 'xl/workbook.xml',
+         'xl/worksheets/sheet1.xml', 'xl/worksheets/sheet2.xml']
+
+        >>> print zf.read('xl/workbook.xml')
+        <?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        <workbook ...><sheets><sheet name="People" sheetId="1" r:id="rId1"/><sheet name="Empty" sheetId="2" r:id="rId2"/></sheets></workbook>
+
+        >>> sheet = zf.read('xl/worksheets/sheet1.xml')
+        >>> for row in sheet.split('<row ')[1:]:
+        ...     print row.split('</row>')[0]
+        r="1"><c r="A1" s="1" t="inlineStr"><is><t xml:space="preserve">Name</t></is></c><c r="B1" s="1" t="inlineStr"><is><t xml:space="preserve">Born</t></is></c>
+        r="2"><c r="A2" t="inlineStr"><is><t xml:space="preserve">J\xc5\x8dn &lt;&amp;&gt;</t></is></c><c r="B2" s="2"><v>36526.0</v></c>
+        r="3"><c r="A3"><v>42</v></c>
+        r="4"><c r="A4" s="1" t="inlineStr"><is><t xml:space="preserve">Merged</t></is></c><c r="B4" s="1"/>
+        r="41"><c r="A41" t="inlineStr"><is><t xml:space="preserve">Far</t></is></c>
+        >>> print sheet.split('</sheetData>')[1]
+        <mergeCells count="1"><mergeCell ref="A4:B4"/></mergeCells></worksheet>
+
+    Styles are collected in a shared table.
+
+        >>> styles = zf.read('xl/styles.xml')
+        >>> print styles.split('<fonts')[0]
+        <?xml ...?>
+        <styleSheet ...><numFmts count="1"><numFmt numFmtId="164" formatCode="YYYY-MM-DD"/></numFmts>
+        >>> print styles.split('<cellXfs')[1].split('</cellXfs>')[0]
+         count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/><xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+
+    """
+
+
+def doctest_Workbook_spooled():
+    """Without a stream the workbook is spooled to a temporary file.
+
+        >>> import zipfile
+        >>> from StringIO import StringIO
+        >>> from schooltool.export.xlsx import Workbook
+
+        >>> wb = Workbook()
+        >>> wb.add_sheet('Sheet').write(0, 0, 1.5)
+        >>> stream = StringIO()
+        >>> wb.save(stream)
+
+        >>> zf = zipfile.ZipFile(StringIO(stream.getvalue()))
+        >>> print zf.read('xl/worksheets/sheet1.xml')
+        <?xml ...?>
+        <worksheet ...><sheetData><row r="1"><c r="A1"><v>1.5</v></c></row></sheetData></worksheet>
+
+    The same data makes the same file, zip entries have a fixed date.
+
+        >>> zf.getinfo('xl/worksheets/sheet1.xml').date_time
+        (1980, 1, 1, 0, 0, 0)
+        >>> wb = Workbook()
+        >>> wb.add_sheet('Sheet').write(0, 0, 1.5)
+        >>> again = StringIO()
+        >>> wb.save(again)
+        >>> again.getvalue() == stream.getvalue()
+        True
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_NDIFF)
+    return doctest.DocTestSuite(optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
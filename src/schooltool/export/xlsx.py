@@ -0,0 +1,471 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Streaming XLSX workbook writer.
+
+Implements the part of the xlwt Workbook API the exporters use:
+add_sheet, Worksheet.write and write_merge with xlwt styles, and save.
+Rows are written to the zip stream as soon as they can no longer
+change, so only a few rows of the current sheet are kept in memory.
+Sheets are written one after another: adding a sheet finishes the
+previous one.  Strings are stored inline and styles are collected in
+a shared table that is written at the end.
+"""
+import datetime
+import re
+import struct
+import zipfile
+import zlib
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+
+
+XLSX_MIMETYPE = ('application/vnd.openxmlformats-officedocument.'
+                 'spreadsheetml.sheet')
+
+MAX_ROWS = 1048576
+MAX_COLS = 16384
+
+# Rows this far above the last written row are flushed.
+FLUSH_DISTANCE = 16
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = ('http://schemas.openxmlformats.org/officeDocument/2006/'
+          'relationships')
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+REL_DOCUMENT = NS_REL + '/officeDocument'
+REL_WORKSHEET = NS_REL + '/worksheet'
+REL_STYLES = NS_REL + '/styles'
+CT_WORKBOOK = ('application/vnd.openxmlformats-officedocument.'
+               'spreadsheetml.sheet.main+xml')
+CT_WORKSHEET = ('application/vnd.openxmlformats-officedocument.'
+                'spreadsheetml.worksheet+xml')
+CT_STYLES = ('application/vnd.openxmlformats-officedocument.'
+             'spreadsheetml.styles+xml')
+
+# The first colours of the default Excel palette, by xlwt colour index.
+PALETTE = {
+    0: 'FF000000', 1: 'FFFFFFFF', 2: 'FFFF0000', 3: 'FF00FF00',
+    4: 'FF0000FF', 5: 'FFFFFF00', 6: 'FFFF00FF', 7: 'FF00FFFF',
+    8: 'FF000000', 9: 'FFFFFFFF', 10: 'FFFF0000', 11: 'FF00FF00',
+    12: 'FF0000FF', 13: 'FFFFFF00', 14: 'FFFF00FF', 15: 'FF00FFFF',
+    }
+
+BORDER_SIDES = ('left', 'right', 'top', 'bottom')
+
+EPOCH = datetime.datetime(1899, 12, 30)
+
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+_illegal_xml_chars = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def column_name(col):
+    """Return the letters of a zero based column number.
+
+        >>> column_name(0), column_name(25), column_name(26), column_name(702)
+        ('A', 'Z', 'AA', 'AAA')
+
+    """
+    letters = ''
+    col += 1
+    while col:
+        col, rest = divmod(col - 1, 26)
+        letters = chr(ord('A') + rest) + letters
+    return letters
+
+
+def cell_name(row, col):
+    return '%s%d' % (column_name(col), row + 1)
+
+
+def serial_date(value):
+    """Return the Excel serial number of a date or datetime."""
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    delta = value - EPOCH
+    return delta.days + (delta.seconds + delta.microseconds / 1e6) / 86400.0
+
+
+def xml_text(value):
+    if isinstance(value, str):
+        value = value.decode('UTF-8')
+    elif not isinstance(value, unicode):
+        value = unicode(value)
+    return escape(_illegal_xml_chars.sub(u'', value))
+
+
+class ZipEntryWriter(object):
+    """Write a deflated zip entry of unknown size to the zip stream.
+
+    The sizes and checksum follow the data in a data descriptor, so
+    nothing has to be rewritten once the entry is done.
+    """
+
+    def __init__(self, zf, name):
+        self.zf = zf
+        # A fixed date, so that the same data makes the same file.
+        info = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.flag_bits = 0x08
+        info.external_attr = 0600 << 16
+        info.header_offset = zf.fp.tell()
+        zf.fp.write(info.FileHeader())
+        self.info = info
+        self.crc = 0
+        self.size = 0
+        self.compressed_size = 0
+        self.compressor = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode('UTF-8')
+        if not data:
+            return
+        self.crc = zlib.crc32(data, self.crc) & 0xffffffff
+        self.size += len(data)
+        self._write(self.compressor.compress(data))
+
+    def _write(self, data):
+        self.compressed_size += len(data)
+        self.zf.fp.write(data)
+
+    def close(self):
+        self._write(self.compressor.flush())
+        info = self.info
+        info.CRC = self.crc
+        info.file_size = self.size
+        info.compress_size = self.compressed_size
+        self.zf.fp.write(struct.pack('<4sLLL', 'PK\x07\x08', info.CRC,
+                                     info.compress_size, info.file_size))
+        self.zf.filelist.append(info)
+        self.zf.NameToInfo[info.filename] = info
+
+
+class StyleTable(object):
+    """Shared table of cell styles, made of xlwt XFStyle objects."""
+
+    def __init__(self):
+        self._by_style = {}
+        self._keys = {}
+        self.xfs = [(0, 0, 0, 0)]
+        self.fonts = [False]
+        self.fills = [None, 'gray125']
+        self.borders = [()]
+        self.formats = {}
+
+    def _index(self, items, value):
+        if value not in items:
+            items.append(value)
+        return items.index(value)
+
+    def _key(self, style):
+        font = getattr(style, 'font', None)
+        bold = bool(getattr(font, 'bold', False))
+        pattern = getattr(style, 'pattern', None)
+        color = None
+        if pattern is not None and getattr(pattern, 'pattern', 0):
+            color = PALETTE.get(getattr(pattern, 'pattern_fore_colour', None))
+        format_str = getattr(style, 'num_format_str', 'General')
+        borders = getattr(style, 'borders', None)
+        sides = tuple([side for side in BORDER_SIDES
+                       if getattr(borders, side, 0)])
+        return bold, color, format_str, sides
+
+    def index(self, style):
+        """Return the cell format index of an xlwt style."""
+        if style is None:
+            return 0
+        cached = self._by_style.get(id(style))
+        if cached is not None and cached[0] is style:
+            return cached[1]
+        key = self._key(style)
+        xf = self._keys.get(key)
+        if xf is None:
+            bold, color, format_str, sides = key
+            if format_str in (None, 'General'):
+                format_id = 0
+            else:
+                format_id = self.formats.setdefault(
+                    format_str, 164 + len(self.formats))
+            entry = (format_id,
+                     self._index(self.fonts, bold),
+                     self._index(self.fills, color),
+                     self._index(self.borders, sides))
+            xf = self._keys[key] = self._index(self.xfs, entry)
+        # Keep the style, so that its id is not reused.
+        self._by_style[id(style)] = (style, xf)
+        return xf
+
+    def render(self):
+        parts = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n',
+                 '<styleSheet xmlns="%s">' % NS_MAIN]
+        if self.formats:
+            parts.append('<numFmts count="%d">' % len(self.formats))
+            for format_str, format_id in sorted(self.formats.items(),
+                                                key=lambda i: i[1]):
+                parts.append('<numFmt numFmtId="%d" formatCode=%s/>' % (
+                    format_id, quoteattr(format_str)))
+            parts.append('</numFmts>')
+        parts.append('<fonts count="%d">' % len(self.fonts))
+        for bold in self.fonts:
+            parts.append('<font>%s<sz val="10"/><name val="Arial"/></font>'
+                         % (bold and '<b/>' or ''))
+        parts.append('</fonts>')
+        parts.append('<fills count="%d">' % len(self.fills))
+        for n, fill in enumerate(self.fills):
+            if n == 0:
+                parts.append('<fill><patternFill patternType="none"/></fill>')
+            elif n == 1:
+                parts.append(
+                    '<fill><patternFill patternType="gray125"/></fill>')
+            else:
+                parts.append(
+                    '<fill><patternFill patternType="solid">'
+                    '<fgColor rgb="%s"/><bgColor indexed="64"/>'
+                    '</patternFill></fill>' % fill)
+        parts.append('</fills>')
+        parts.append('<borders count="%d">' % len(self.borders))
+        for sides in self.borders:
+            parts.append('<border>')
+            for side in BORDER_SIDES:
+                if side in sides:
+                    parts.append('<%s style="thin"><color auto="1"/></%s>' % (
+                        side, side))
+                else:
+                    parts.append('<%s/>' % side)
+            parts.append('<diagonal/></border>')
+        parts.append('</borders>')
+        parts.append('<cellStyleXfs count="1">'
+                     '<xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+                     '</cellStyleXfs>')
+        parts.append('<cellXfs count="%d">' % len(self.xfs))
+        for format_id, font_id, fill_id, border_id in self.xfs:
+            parts.append(
+                '<xf numFmtId="%d" fontId="%d" fillId="%d" borderId="%d" '
+                'xfId="0"%s%s%s%s/>' % (
+                    format_id, font_id, fill_id, border_id,
+                    format_id and ' applyNumberFormat="1"' or '',
+                    font_id and ' applyFont="1"' or '',
+                    fill_id and ' applyFill="1"' or '',
+                    border_id and ' applyBorder="1"' or ''))
+        parts.append('</cellXfs>')
+        parts.append('<cellStyles count="1">'
+                     '<cellStyle name="Normal" xfId="0" builtinId="0"/>'
+                     '</cellStyles>')
+        parts.append('</styleSheet>')
+        return ''.join(parts)
+
+
+class Worksheet(object):
+    """A sheet whose rows are streamed to the workbook zip entry."""
+
+    def __init__(self, workbook, name, entry):
+        self.workbook = workbook
+        self.name = name
+        self.entry = entry
+        self.rows = {}
+        self.next_row = 0
+        self.merges = []
+        self.finished = False
+        entry.write('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<worksheet xmlns="%s" xmlns:r="%s"><sheetData>' % (
+                        NS_MAIN, NS_REL))
+
+    def write(self, row, col, label='', style=None):
+        if self.finished:
+            raise ValueError('Sheet %r is already saved' % self.name)
+        if row < self.next_row:
+            raise ValueError('Row %d of sheet %r is already saved' % (
+                row, self.name))
+        if row >= MAX_ROWS or col >= MAX_COLS:
+            raise ValueError('Cell (%d, %d) is out of range' % (row, col))
+        self.rows.setdefault(row, {})[col] = (label, style)
+        if row - FLUSH_DISTANCE > self.next_row:
+            self.flush(row - FLUSH_DISTANCE)
+
+    def write_merge(self, r1, r2, c1, c2, label='', style=None):
+        self.write(r1, c1, label, style)
+        for row in range(r1, r2 + 1):
+            for col in range(c1, c2 + 1):
+                if (row, col) != (r1, c1):
+                    self.write(row, col, '', style)
+        self.merges.append('%s:%s' % (cell_name(r1, c1), cell_name(r2, c2)))
+
+    def renderCell(self, row, col, label, style):
+        ref = cell_name(row, col)
+        xf = self.workbook.styles.index(style)
+        s = xf and ' s="%d"' % xf or ''
+        if label is None or label == '':
+            if not xf:
+                return ''
+            return '<c r="%s"%s/>' % (ref, s)
+        if isinstance(label, bool):
+            return '<c r="%s"%s t="b"><v>%d</v></c>' % (ref, s, label)
+        if isinstance(label, (int, long, float, Decimal)):
+            return '<c r="%s"%s><v>%s</v></c>' % (ref, s, repr(label).rstrip('L'))
+        if isinstance(label, (datetime.date, datetime.datetime)):
+            return '<c r="%s"%s><v>%r</v></c>' % (ref, s, serial_date(label))
+        return '<c r="%s"%s t="inlineStr"><is><t xml:space="preserve">%s</t>'\
+               '</is></c>' % (ref, s, xml_text(label))
+
+    def flush(self, upto=None):
+        """Write rows before upto (all rows by default) to the stream."""
+        rows = sorted([row for row in self.rows
+                       if upto is None or row < upto])
+        parts = []
+        for row in rows:
+            cells = self.rows.pop(row)
+            parts.append('<row r="%d">' % (row + 1))
+            for col in sorted(cells):
+                label, style = cells[col]
+                parts.append(self.renderCell(row, col, label, style))
+            parts.append('</row>')
+        self.entry.write(u''.join(parts))
+        if upto is None:
+            if rows:
+                self.next_row = rows[-1] + 1
+        else:
+            self.next_row = max(self.next_row, upto)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.flush()
+        self.entry.write('</sheetData>')
+        if self.merges:
+            self.entry.write('<mergeCells count="%d">%s</mergeCells>' % (
+                len(self.merges),
+                ''.join(['<mergeCell ref="%s"/>' % ref
+                         for ref in self.merges])))
+        self.entry.write('</worksheet>')
+        self.entry.close()
+        self.finished = True
+        self.rows = None
+
+
+class Workbook(object):
+    """A workbook streamed to a file as it is written.
+
+    Without a stream given upfront the workbook is spooled to a
+    temporary file and copied to the stream passed to save.
+    """
+
+    mimetype = XLSX_MIMETYPE
+
+    def __init__(self, stream=None):
+        if stream is None:
+            import tempfile
+            stream = tempfile.TemporaryFile()
+            self._spooled = True
+        else:
+            self._spooled = False
+        self.stream = stream
+        self.zf = zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED)
+        self.styles = StyleTable()
+        self.sheets = []
+        self.saved = False
+
+    def add_sheet(self, name):
+        if self.sheets:
+            self.sheets[-1].finish()
+        if name in [sheet.name for sheet in self.sheets]:
+            raise ValueError('Duplicate sheet name %r' % name)
+        entry = ZipEntryWriter(
+            self.zf, 'xl/worksheets/sheet%d.xml' % (len(self.sheets) + 1))
+        sheet = Worksheet(self, name, entry)
+        self.sheets.append(sheet)
+        return sheet
+
+    def writeEntry(self, name, data):
+        entry = ZipEntryWriter(self.zf, name)
+        entry.write(data)
+        entry.close()
+
+    def renderContentTypes(self):
+        overrides = ['<Override PartName="/xl/worksheets/sheet%d.xml" '
+                     'ContentType="%s"/>' % (n + 1, CT_WORKSHEET)
+                     for n in range(len(self.sheets))]
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Types xmlns="http://schemas.openxmlformats.org/package/'
+                '2006/content-types">'
+                '<Default Extension="rels" ContentType="application/'
+                'vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" ContentType="%s"/>'
+                '<Override PartName="/xl/styles.xml" ContentType="%s"/>'
+                '%s</Types>' % (CT_WORKBOOK, CT_STYLES, ''.join(overrides)))
+
+    def renderRelationships(self):
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="%s">'
+                '<Relationship Id="rId1" Type="%s" Target="xl/workbook.xml"/>'
+                '</Relationships>' % (NS_PKG_REL, REL_DOCUMENT))
+
+    def renderWorkbook(self):
+        sheets = ['<sheet name=%s sheetId="%d" r:id="rId%d"/>' % (
+                      quoteattr(xml_text(sheet.name)), n + 1, n + 1)
+                  for n, sheet in enumerate(self.sheets)]
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<workbook xmlns="%s" xmlns:r="%s"><sheets>%s</sheets>'
+                '</workbook>' % (NS_MAIN, NS_REL, ''.join(sheets)))
+
+    def renderWorkbookRelationships(self):
+        rels = ['<Relationship Id="rId%d" Type="%s" '
+                'Target="worksheets/sheet%d.xml"/>' % (n + 1, REL_WORKSHEET,
+                                                       n + 1)
+                for n in range(len(self.sheets))]
+        rels.append('<Relationship Id="rId%d" Type="%s" '
+                    'Target="styles.xml"/>' % (len(self.sheets) + 1,
+                                               REL_STYLES))
+        return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="%s">%s</Relationships>' % (
+                    NS_PKG_REL, ''.join(rels)))
+
+    def close(self):
+        """Finish the last sheet and write the workbook parts."""
+        if self.saved:
+            return
+        if not self.sheets:
+            raise ValueError('A workbook must contain at least one sheet')
+        self.sheets[-1].finish()
+        self.writeEntry('xl/styles.xml', self.styles.render())
+        self.writeEntry('xl/workbook.xml', self.renderWorkbook())
+        self.writeEntry('xl/_rels/workbook.xml.rels',
+                        self.renderWorkbookRelationships())
+        self.writeEntry('_rels/.rels', self.renderRelationships())
+        self.writeEntry('[Content_Types].xml', self.renderContentTypes())
+        self.zf.close()
+        self.saved = True
+
+    def save(self, stream):
+        self.close()
+        if stream is self.stream:
+            return
+        if not self._spooled:
+            raise ValueError('The workbook was streamed to another file')
+        self.stream.seek(0)
+        while True:
+            chunk = self.stream.read(64 * 1024)
+            if not chunk:
+                break
+            stream.write(chunk)
+        self.stream.close()
@@ -0,0 +1,50 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 45.
+
+Store term schooldays as bitmaps instead of sets of dates.
+"""
+
+from zope.app.generations.utility import getRootFolder
+
+from schooltool.schoolyear.schoolyear import SCHOOLYEAR_CONTAINER_KEY
+
+
+def convertSchooldays(term):
+    term._p_activate()
+    schooldays = term.__dict__.get('_schooldays')
+    if schooldays is None:
+        return
+    term._schooldays_base = term.first
+    term._schooldays_bits = 0
+    for date in schooldays:
+        # Old terms may keep schooldays outside of a moved term range.
+        term._rebase(date)
+        term._schooldays_bits |= 1 << term._offset(date)
+    del term._schooldays
+
+
+def evolve(context):
+    app = getRootFolder(context)
+    syc = app.get(SCHOOLYEAR_CONTAINER_KEY)
+    if syc is None:
+        return
+    for schoolyear in syc.values():
+        for term in schoolyear.values():
+            convertSchooldays(term)
@@ -0,0 +1,62 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 47.
+
+Store role summaries (teacher and student school years) of persons.
+"""
+
+from zope.app.generations.utility import getRootFolder
+from zope.component.hooks import getSite, setSite
+
+from schooltool.course.section import update_role_summary
+from schooltool.generations.steps import EvolveStep, clearCheckpoints
+
+
+class RoleSummariesStep(EvolveStep):
+
+    name = 'schooltool.evolve47.role_summaries'
+    title = 'Person role summaries'
+
+    def __init__(self, connection, app, **kw):
+        super(RoleSummariesStep, self).__init__(connection, **kw)
+        self.persons = app['persons']
+
+    def units(self, after):
+        for name in self.persons.keys(after):
+            if name != after:
+                yield name, self.persons[name]
+
+    def total(self):
+        return len(self.persons)
+
+    def process(self, person):
+        update_role_summary(person)
+
+
+def evolve(context):
+    app = getRootFolder(context)
+    if 'persons' not in app:
+        return
+    old_site = getSite()
+    setSite(app)
+    try:
+        RoleSummariesStep(context.connection, app)()
+        clearCheckpoints(context.connection, 'schooltool.evolve47.')
+    finally:
+        setSite(old_site)
@@ -0,0 +1,63 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 48.
+
+Build message inboxes of recipients.
+"""
+
+from zope.app.generations.utility import getRootFolder
+from zope.component.hooks import getSite, setSite
+
+from schooltool.generations.steps import EvolveStep, clearCheckpoints
+
+
+class MessageInboxesStep(EvolveStep):
+
+    name = 'schooltool.evolve48.message_inboxes'
+    title = 'Message inboxes'
+
+    def __init__(self, connection, messages, **kw):
+        super(MessageInboxesStep, self).__init__(connection, **kw)
+        self.messages = messages
+
+    def units(self, after):
+        for name in self.messages.keys(after):
+            if name != after:
+                yield name, self.messages[name]
+
+    def total(self):
+        return len(self.messages)
+
+    def process(self, message):
+        self.messages.deliver(message)
+
+
+def evolve(context):
+    app = getRootFolder(context)
+    messages = app.get('schooltool.task.messages')
+    if messages is None:
+        return
+    old_site = getSite()
+    setSite(app)
+    try:
+        messages.enableInboxes()
+        MessageInboxesStep(context.connection, messages)()
+        clearCheckpoints(context.connection, 'schooltool.evolve48.')
+    finally:
+        setSite(old_site)
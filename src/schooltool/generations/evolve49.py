@@ -0,0 +1,96 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Upgrade SchoolTool to generation 49.
+
+Move notes, calendar events and application tabs to conflict resolving
+containers.
+"""
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree
+
+from schooltool.app.conflicts import AppendLog, BTreeMap
+from schooltool.generations.scanner import StorageScanner
+from schooltool.generations.steps import OIDStep, clearCheckpoints
+
+
+NOTES_CLASS = 'schooltool.note.note.Notes'
+CALENDAR_CLASSES = (
+    'schooltool.calendar.app.Calendar',
+    'schooltool.timetable.calendar.ScheduleCalendar',
+    )
+TABS_CLASS = 'schooltool.app.app.ApplicationTabs'
+
+
+def collectOIDs(connection):
+    scanner = StorageScanner(connection._storage,
+                             classes=(NOTES_CLASS, TABS_CLASS) +
+                                     CALENDAR_CLASSES)
+    return scanner.scan()
+
+
+class EvolveNotes(OIDStep):
+
+    name = 'schooltool.evolve49.notes'
+    title = 'Notes'
+    classname = NOTES_CLASS
+
+    def process(self, notes):
+        if not isinstance(notes._notes, AppendLog):
+            notes._notes = AppendLog(notes._notes)
+
+
+class EvolveCalendars(OIDStep):
+
+    title = 'Calendar events'
+
+    def __init__(self, connection, scan, classname, **kw):
+        self.classname = classname
+        kw.setdefault('name', 'schooltool.evolve49.events.%s' % classname)
+        super(EvolveCalendars, self).__init__(connection, scan, **kw)
+
+    def process(self, calendar):
+        if not isinstance(calendar.events, BTreeMap):
+            calendar.events = BTreeMap(calendar.events)
+
+
+class EvolveTabs(OIDStep):
+
+    name = 'schooltool.evolve49.tabs'
+    title = 'Application tabs'
+    classname = TABS_CLASS
+
+    def process(self, tabs):
+        tabs._p_activate()
+        # State pickled by PersistentDict.
+        data = tabs.__dict__.pop('data', None)
+        if data is None:
+            return
+        tabs._data = OOBTree()
+        tabs._length = Length()
+        tabs.update(data)
+
+
+def evolve(context):
+    connection = context.connection
+    scan = collectOIDs(connection)
+    EvolveNotes(connection, scan)()
+    for classname in CALENDAR_CLASSES:
+        EvolveCalendars(connection, scan, classname)()
+    EvolveTabs(connection, scan)()
+    clearCheckpoints(connection, 'schooltool.evolve49.')
@@ -65,6 +65,8 @@ from schooltool.course.booking import URISectionBooking
 from schooltool.course.booking import URIResource
 from schooltool.level.level import URILevelCourses
 from schooltool.level.level import URILevel
+from schooltool.generations.scanner import StorageScanner
+from schooltool.generations.steps import OIDStep, clearCheckpoints
 
 
 PERSON_CONTACT_KEY = 'schooltool.contact.basicperson'
@@ -86,41 +88,37 @@ def addLinkCatalog(app):
     factory.setIndexes(catalog)
 
 
+LINK_CLASS = 'schooltool.relationship.relationship.Link'
+LINKSET_CLASS = 'schooltool.relationship.relationship.LinkSet'
+
+
 def collectOIDs(connection):
-    storage = connection._storage
-    next_oid = None
-    link_oids = []
-    linkset_oids = []
-    total = 0
-    while True:
-        oid, tid, data, next_oid = storage.record_iternext(next_oid)
-        total += 1
-        if data.startswith('cschooltool.relationship.relationship\nLink\n'):
-            if oid not in link_oids:
-                link_oids.append(oid)
-        elif data.startswith('cschooltool.relationship.relationship\nLinkSet\n'):
-            if oid not in linkset_oids:
-                linkset_oids.append(oid)
-        if next_oid is None:
-            break
-
-    return link_oids, linkset_oids
-
-
-def evolveLinks(connection, oids):
-    int_ids = getSite()._sm.getUtility(IIntIds)
-
-    states = {}
-    for n, oid in enumerate(oids):
-        try:
-            link = connection.get(oid)
-        except KeyError:
-            continue
+    scanner = StorageScanner(connection._storage,
+                             classes=(LINK_CLASS, LINKSET_CLASS))
+    return scanner.scan()
+
+
+class EvolveLinks(OIDStep):
+
+    name = 'schooltool.generations.linkcatalogs.links'
+    title = 'Relationship links'
+    classname = LINK_CLASS
+    batch_size = 10000
+
+    def __init__(self, *args, **kw):
+        super(EvolveLinks, self).__init__(*args, **kw)
+        self.int_ids = getSite()._sm.getUtility(IIntIds)
+
+    def process(self, link):
+        int_ids = self.int_ids
+        # Shared link states by link hash; kept in the checkpoint so
+        # that back links evolved after a restart are still paired.
+        states = self.state
         links = link.__parent__._links
         if (link.__name__ not in links or
             links[link.__name__] is not link):
             # this is a record of a replaced link, skip.
-            continue
+            return
         key = IKeyReference(link)
         idmap = {
             int_ids: int_ids.register(key)}
@@ -150,23 +148,24 @@ def evolveLinks(connection, oids):
 
         notify(IntIdAddedEvent(link, ObjectAddedEvent(link), idmap))
 
-        if n % 10000 == 9999:
-            transaction.savepoint(optimistic=True)
 
+class EvolveLinkSets(OIDStep):
 
-def evolveLinkSets(connection, oids):
-    int_ids = getSite()._sm.getUtility(IIntIds)
+    name = 'schooltool.generations.linkcatalogs.linksets'
+    title = 'Relationship link sets'
+    classname = LINKSET_CLASS
+    batch_size = 10000
 
-    for oid in oids:
-        try:
-            linkset = connection.get(oid)
-        except KeyError:
-            continue
+    def __init__(self, *args, **kw):
+        super(EvolveLinkSets, self).__init__(*args, **kw)
+        self.int_ids = getSite()._sm.getUtility(IIntIds)
+
+    def process(self, linkset):
         if getattr(linkset, '_lids', None) is None:
             linkset._lids = IFBTree.TreeSet()
         linkset._lids.clear()
         for link in linkset._links.values():
-            linkset._lids.add(int_ids.getId(link))
+            linkset._lids.add(self.int_ids.getId(link))
 
 
 def evolveRelationships(date, target, rel_type, other_role, new_type):
@@ -341,13 +340,11 @@ def evolve(context):
 
     connection = context.connection
 
-    link_oids, linkset_oids = collectOIDs(connection)
-
-    evolveLinks(connection, link_oids)
-    transaction.savepoint(optimistic=True)
-
-    evolveLinkSets(connection, linkset_oids)
-    transaction.savepoint(optimistic=True)
+    # Links are evolved in committed batches, resuming after the last
+    # checkpoint if a previous upgrade was interrupted.
+    scan = collectOIDs(connection)
+    EvolveLinks(connection, scan)()
+    EvolveLinkSets(connection, scan)()
 
     addLinkCatalog(root)
     transaction.savepoint(optimistic=True)
@@ -372,4 +369,6 @@ def ensureEvolved(context):
     if LinkCatalog.key() in catalogs:
         return
     evolve(context)
+    clearCheckpoints(context.connection,
+                     prefix='schooltool.generations.linkcatalogs.')
     transaction.commit()
@@ -0,0 +1,163 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Storage scanner for generations.
+
+Walks all current object records of a storage once, without loading
+the objects, and classifies them by class into sets of OIDs.  OIDs are
+kept as 64 bit integers in LLTreeSets, which is compact and keeps them
+sorted, so evolve steps can process (and resume) them in a stable order.
+"""
+import logging
+import multiprocessing
+import time
+
+from BTrees.LLBTree import LLTreeSet
+from ZODB.utils import get_pickle_metadata, u64, p64
+
+
+log = logging.getLogger('schooltool.generations')
+
+
+def recordClassName(data):
+    """Return the dotted name of the class of a pickled object record.
+
+        >>> recordClassName('cschooltool.relationship.relationship\\n'
+        ...                 'Link\\nq\\x01.}q\\x02.')
+        'schooltool.relationship.relationship.Link'
+
+        >>> print recordClassName('')
+        None
+
+    """
+    if not data:
+        return None
+    modname, classname = get_pickle_metadata(data)
+    if not modname or not classname:
+        return None
+    return str('%s.%s' % (modname, classname))
+
+
+class ScanResult(object):
+    """OIDs of scanned records, grouped by class name."""
+
+    def __init__(self):
+        self.counts = {}
+        self.oidsets = {}
+        self.total = 0
+
+    def add(self, classname, oid):
+        self.counts[classname] = self.counts.get(classname, 0) + 1
+        oids = self.oidsets.get(classname)
+        if oids is not None:
+            oids.insert(u64(oid))
+
+    def track(self, classname):
+        if classname not in self.oidsets:
+            self.oidsets[classname] = LLTreeSet()
+
+    def count(self, classname):
+        return self.counts.get(classname, 0)
+
+    def oids(self, classname, after=None):
+        """Iterate packed OIDs of objects of the class, in OID order.
+
+        If after (a packed OID) is given, start after it.
+        """
+        oidset = self.oidsets.get(classname)
+        if oidset is None:
+            return
+        if after is None:
+            keys = oidset.keys()
+        else:
+            keys = oidset.keys(min=u64(after), excludemin=True)
+        for oid in keys:
+            yield p64(oid)
+
+
+class StorageScanner(object):
+    """Classify storage records by class in one pass.
+
+    Only OIDs of the given classes are collected; all classes are
+    counted.  With classes=None OIDs of all classes are collected.
+    """
+
+    log_every = 100000
+
+    def __init__(self, storage, classes=None):
+        self.storage = storage
+        self.classes = classes
+
+    def iterRecords(self):
+        next_oid = None
+        while True:
+            try:
+                oid, tid, data, next_oid = self.storage.record_iternext(
+                    next_oid)
+            except ValueError:
+                # Empty storage.
+                break
+            yield oid, data
+            if next_oid is None:
+                break
+
+    def scan(self):
+        result = ScanResult()
+        tracked = None
+        if self.classes is not None:
+            tracked = frozenset(self.classes)
+            for classname in tracked:
+                result.track(classname)
+        start = time.time()
+        for oid, data in self.iterRecords():
+            result.total += 1
+            classname = recordClassName(data)
+            if classname is not None:
+                if tracked is None:
+                    result.track(classname)
+                result.add(classname, oid)
+            if result.total % self.log_every == 0:
+                log.info("Scanned %d records (%.0f/s)", result.total,
+                         result.total / max(time.time() - start, 0.001))
+        log.info("Scanned %d records in %.1fs", result.total,
+                 time.time() - start)
+        return result
+
+
+def scanFileStorage(path, classes=None):
+    """Scan a FileStorage (i.e. a copy of the live one) read only."""
+    from ZODB.FileStorage import FileStorage
+    storage = FileStorage(path, read_only=True)
+    try:
+        return StorageScanner(storage, classes).scan()
+    finally:
+        storage.close()
+
+
+def scanInSubprocess(path, classes=None):
+    """Scan a FileStorage in a separate process.
+
+    Useful to classify a copy of the database while this process is
+    busy, or to keep the memory used by the scan out of it.
+    """
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(scanFileStorage, (path, classes))
+    finally:
+        pool.terminate()
+        pool.join()
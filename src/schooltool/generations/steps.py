@@ -0,0 +1,231 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Batched and resumable evolve steps.
+
+A long evolve script can be split into steps (EvolveStep subclasses).
+A step iterates over ordered work units, commits every batch_size
+units and records how far it got in a persistent checkpoint stored in
+the database root.  If the upgrade is interrupted, the generation is
+run again on restart and every step continues after its last
+checkpoint; finished steps are skipped.
+"""
+import logging
+import time
+
+import transaction
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree
+
+
+log = logging.getLogger('schooltool.generations')
+
+CHECKPOINTS_KEY = 'schooltool.generations.checkpoints'
+
+
+class ProgressLog(object):
+    """Log throughput and estimated time left of a long running step."""
+
+    def __init__(self, title, total=None, done=0):
+        self.title = title
+        self.total = total
+        self.start_done = done
+        self.done = done
+        self.start = time.time()
+
+    @property
+    def rate(self):
+        elapsed = max(time.time() - self.start, 0.001)
+        return (self.done - self.start_done) / elapsed
+
+    @property
+    def eta(self):
+        """Seconds left, None if unknown."""
+        rate = self.rate
+        if self.total is None or not rate:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def update(self, done):
+        self.done = done
+        eta = self.eta
+        if eta is None:
+            log.info("%s: %d done (%.0f/s)", self.title, done, self.rate)
+        else:
+            log.info("%s: %d of %d done (%.0f/s, ETA %dm%02ds)",
+                     self.title, done, self.total, self.rate,
+                     eta // 60, eta % 60)
+
+    def finish(self):
+        log.info("%s: %d done in %.1fs", self.title, self.done,
+                 time.time() - self.start)
+
+
+class Checkpoint(Persistent):
+    """Progress of an evolve step."""
+
+    position = None
+    done = 0
+    finished = False
+
+    def __init__(self, name):
+        self.name = name
+        # Step specific state that must survive a restart.
+        self.state = OOBTree()
+
+
+def getCheckpoint(connection, name):
+    root = connection.root()
+    checkpoints = root.get(CHECKPOINTS_KEY)
+    if checkpoints is None:
+        checkpoints = root[CHECKPOINTS_KEY] = OOBTree()
+    checkpoint = checkpoints.get(name)
+    if checkpoint is None:
+        checkpoint = checkpoints[name] = Checkpoint(name)
+    return checkpoint
+
+
+def clearCheckpoints(connection, prefix=''):
+    """Remove checkpoints of steps, i.e. when the generation is done."""
+    checkpoints = connection.root().get(CHECKPOINTS_KEY)
+    if checkpoints is None:
+        return
+    for name in list(checkpoints.keys(min=prefix)):
+        if not name.startswith(prefix):
+            break
+        del checkpoints[name]
+
+
+class EvolveStep(object):
+    """A resumable evolve step.
+
+    Subclasses implement units(after), yielding (position, unit) pairs
+    in increasing position order after the given position, and
+    process(unit).  Positions must be persistable and stable across
+    restarts.  Step state that has to survive a restart goes to
+    self.state.
+    """
+
+    name = None
+    title = None
+    batch_size = 1000
+
+    def __init__(self, connection, name=None, batch_size=None):
+        self.connection = connection
+        if name is not None:
+            self.name = name
+        if batch_size is not None:
+            self.batch_size = batch_size
+        assert self.name, 'Evolve steps need a unique name'
+        self.checkpoint = getCheckpoint(connection, self.name)
+        self.state = self.checkpoint.state
+
+    def units(self, after):
+        raise NotImplementedError
+
+    def total(self):
+        """Total number of units, None if not known."""
+        return None
+
+    def process(self, unit):
+        raise NotImplementedError
+
+    def commit(self):
+        transaction.commit()
+        self.connection.cacheGC()
+
+    def __call__(self):
+        checkpoint = self.checkpoint
+        title = self.title or self.name
+        if checkpoint.finished:
+            log.info("%s: already done, skipping", title)
+            return checkpoint.done
+        if checkpoint.done:
+            log.info("%s: resuming after %d done", title, checkpoint.done)
+        progress = ProgressLog(title, self.total(), done=checkpoint.done)
+        pending = 0
+        for position, unit in self.units(checkpoint.position):
+            self.process(unit)
+            checkpoint.position = position
+            checkpoint.done += 1
+            pending += 1
+            if pending >= self.batch_size:
+                self.commit()
+                pending = 0
+                progress.update(checkpoint.done)
+        checkpoint.finished = True
+        self.commit()
+        progress.done = checkpoint.done
+        progress.finish()
+        return checkpoint.done
+
+
+class OIDStep(EvolveStep):
+    """Resumable step over objects of a class found by a storage scan."""
+
+    classname = None
+
+    def __init__(self, connection, scan, name=None, batch_size=None):
+        super(OIDStep, self).__init__(connection, name=name,
+                                      batch_size=batch_size)
+        self.scan = scan
+
+    def total(self):
+        return self.scan.count(self.classname)
+
+    def units(self, after):
+        for oid in self.scan.oids(self.classname, after=after):
+            try:
+                obj = self.connection.get(oid)
+            except KeyError:
+                continue
+            yield oid, obj
+
+
+def processOIDs(connection, oids, step, batch_size=1000, commit=False,
+                title='objects'):
+    """Load objects by OID and call step(obj) on each of them.
+
+    Every batch_size objects the transaction is committed (or, if
+    commit is not set, a savepoint is made), the connection cache is
+    cleaned up and progress is logged.  Objects that no longer exist
+    are skipped.
+
+    Returns the number of objects processed.
+    """
+    progress = ProgressLog(title)
+    done = 0
+    for oid in oids:
+        try:
+            obj = connection.get(oid)
+        except KeyError:
+            continue
+        step(obj)
+        done += 1
+        if done % batch_size == 0:
+            if commit:
+                transaction.commit()
+            else:
+                transaction.savepoint(optimistic=True)
+            connection.cacheGC()
+            progress.update(done)
+    if commit:
+        transaction.commit()
+    progress.done = done
+    progress.finish()
+    return done
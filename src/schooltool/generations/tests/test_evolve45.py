@@ -0,0 +1,131 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2012 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve45
+"""
+import unittest
+import doctest
+from datetime import date
+
+import transaction
+from persistent.mapping import PersistentMapping
+from ZODB.DB import DB
+from ZODB.MappingStorage import MappingStorage
+from zope.app.publication.zopepublication import ZopePublication
+
+from schooltool.generations.tests import ContextStub
+from schooltool.generations.tests import setUp, tearDown
+from schooltool.schoolyear.schoolyear import SchoolYearContainer, SchoolYear
+from schooltool.term.term import Term
+
+
+class ConnectionContextStub(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+def doctest_evolve45():
+    r"""Test evolution to generation 45.
+
+        >>> context = ContextStub(app)
+        >>> syc = app['schooltool.schoolyear'] = SchoolYearContainer()
+        >>> year = syc['2003'] = SchoolYear('2003', date(2003, 9, 1),
+        ...                                 date(2004, 6, 30))
+
+    Old terms kept schooldays in a set.
+
+        >>> term = Term('Fall', date(2003, 9, 1), date(2003, 12, 31))
+        >>> del term._schooldays_base
+        >>> del term._schooldays_bits
+        >>> term._schooldays = set([date(2003, 9, 1), date(2003, 9, 3),
+        ...                         date(2003, 12, 31)])
+        >>> year['fall'] = term
+
+        >>> from schooltool.generations.evolve45 import evolve
+        >>> evolve(context)
+
+        >>> '_schooldays' in term.__dict__
+        False
+        >>> [d for d in term if term.isSchoolday(d)]
+        [datetime.date(2003, 9, 1), datetime.date(2003, 9, 3),
+         datetime.date(2003, 12, 31)]
+        >>> term.countSchooldays()
+        3
+
+    Evolving again does nothing.
+
+        >>> evolve(context)
+        >>> term.countSchooldays()
+        3
+
+    """
+
+
+def doctest_evolve45_ghosts():
+    r"""Test evolution of terms that were not loaded yet.
+
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> root = connection.root()
+        >>> app = root[ZopePublication.root_name] = PersistentMapping()
+        >>> syc = app['schooltool.schoolyear'] = SchoolYearContainer()
+        >>> year = SchoolYear('2003', date(2003, 9, 1), date(2004, 6, 30))
+        >>> connection.add(year)
+        >>> syc['2003'] = year
+        >>> term = Term('Fall', date(2003, 9, 1), date(2003, 12, 31))
+        >>> del term._schooldays_base
+        >>> del term._schooldays_bits
+        >>> term._schooldays = set([date(2003, 9, 1), date(2003, 9, 3)])
+        >>> connection.add(term)
+        >>> year['fall'] = term
+        >>> transaction.commit()
+
+    Terms are ghosts after the cache is minimized.
+
+        >>> connection.cacheMinimize()
+        >>> term = root[ZopePublication.root_name][
+        ...     'schooltool.schoolyear']['2003']['fall']
+        >>> term._p_changed is None
+        True
+
+        >>> from schooltool.generations.evolve45 import evolve
+        >>> evolve(ConnectionContextStub(connection))
+
+        >>> '_schooldays' in term.__dict__
+        False
+        >>> term.countSchooldays()
+        2
+
+        >>> transaction.abort()
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                                optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,61 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2012 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve46
+"""
+import unittest
+import doctest
+from datetime import date
+
+from schooltool.generations.tests import ContextStub
+from schooltool.generations.tests import setUp, tearDown
+from schooltool.schoolyear.schoolyear import SchoolYearContainer, SchoolYear
+from schooltool.term.term import Term
+
+
+def doctest_evolve46():
+    r"""Test evolution to generation 46.
+
+        >>> context = ContextStub(app)
+        >>> syc = app['schooltool.schoolyear'] = SchoolYearContainer()
+        >>> year = syc['2003'] = SchoolYear('2003', date(2003, 9, 1),
+        ...                                 date(2004, 6, 30))
+        >>> year['fall'] = Term('Fall', date(2003, 9, 1), date(2003, 12, 31))
+
+        >>> print syc._date_index
+        None
+
+        >>> from schooltool.generations.evolve46 import evolve
+        >>> evolve(context)
+
+        >>> syc._date_index.getTermForDate(date(2003, 10, 1))
+        <schooltool.term.term.Term object at ...>
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                                optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,78 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2012 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve47
+"""
+import unittest
+import doctest
+
+from zope.annotation.interfaces import IAnnotations
+from zope.container.btree import BTreeContainer
+
+from schooltool.app.membership import URIMember, URIGroup, URIMembership
+from schooltool.basicperson.person import BasicPerson
+from schooltool.course.section import ROLE_SUMMARY_KEY
+from schooltool.group.group import Group
+from schooltool.relationship.relationship import relate
+from schooltool.generations.steps import CHECKPOINTS_KEY
+from schooltool.generations.tests import ContextStub
+from schooltool.generations.tests import setUp, tearDown
+
+
+def doctest_evolve47():
+    r"""Test evolution to generation 47.
+
+        >>> context = ContextStub(app)
+        >>> persons = app['persons'] = BTreeContainer()
+        >>> persons['john'] = BasicPerson('john', 'John', 'Teacher')
+        >>> persons['pete'] = BasicPerson('pete', 'Pete', 'Guest')
+        >>> groups = app['groups'] = BTreeContainer()
+        >>> groups['teachers'] = Group('Teachers')
+        >>> relate(URIMembership,
+        ...        (persons['john'], URIMember),
+        ...        (groups['teachers'], URIGroup))
+
+        >>> from schooltool.generations.evolve47 import evolve
+        >>> evolve(context)
+
+    Role summaries are stored for all persons.  The teachers group here
+    is not in a school year.
+
+        >>> IAnnotations(persons['john'])[ROLE_SUMMARY_KEY]
+        (frozenset([None]), frozenset([]))
+        >>> IAnnotations(persons['pete'])[ROLE_SUMMARY_KEY]
+        (frozenset([]), frozenset([]))
+
+    The step does not leave its checkpoint behind.
+
+        >>> list(context.connection.root()[CHECKPOINTS_KEY].keys())
+        []
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                                optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,98 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2012 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve48
+"""
+import unittest
+import doctest
+from datetime import datetime
+
+import pytz
+from zope.component import getUtility
+from zope.container.btree import BTreeContainer
+from zope.intid.interfaces import IIntIds
+
+from schooltool.basicperson.person import BasicPerson
+from schooltool.task.tasks import MessageContainer, Message
+from schooltool.task.tasks import markMessagesRead
+from schooltool.generations.steps import CHECKPOINTS_KEY
+from schooltool.generations.tests import ContextStub
+from schooltool.generations.tests import setUp, tearDown
+
+
+def utc(*args):
+    return pytz.UTC.localize(datetime(*args))
+
+
+def doctest_evolve48():
+    r"""Test evolution to generation 48.
+
+        >>> context = ContextStub(app)
+        >>> int_ids = getUtility(IIntIds)
+
+        >>> persons = app['persons'] = BTreeContainer()
+        >>> john = persons['john'] = BasicPerson('john', 'John', 'Doe')
+        >>> john_id = int_ids.getId(john)
+        >>> markMessagesRead(john, utc(2014, 2, 1))
+
+    The message container predates inboxes.
+
+        >>> messages = app['schooltool.task.messages'] = MessageContainer()
+        >>> messages._inboxes = messages._delivered = None
+        >>> for n, month in enumerate([1, 3, 2]):
+        ...     message = Message('Message %d' % n)
+        ...     message.updated_on = utc(2014, month, 1)
+        ...     message.recipient_ids = set([john_id])
+        ...     messages['m%d' % n] = message
+        >>> print messages.getInbox(john_id)
+        None
+
+        >>> from schooltool.generations.evolve48 import evolve
+        >>> evolve(context)
+        >>> list(context.connection.root()[CHECKPOINTS_KEY].keys())
+        []
+
+    The inbox lists message ids newest first and counts messages
+    updated after the last read time.
+
+        >>> inbox = messages.getInbox(john_id)
+        >>> [int_ids.queryObject(id).title for id in inbox]
+        ['Message 1', 'Message 2', 'Message 0']
+        >>> inbox.unread
+        2
+
+        >>> inbox.markRead(utc(2014, 2, 15))
+        >>> inbox.unread
+        1
+        >>> del messages['m1']
+        >>> len(inbox), inbox.unread
+        (2, 0)
+
+    """
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                                optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,120 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2012 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.evolve49
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import transaction
+from persistent.dict import PersistentDict
+from persistent.list import PersistentList
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+
+from schooltool.app.app import ApplicationTabs
+from schooltool.app.conflicts import AppendLog, BTreeMap
+from schooltool.calendar.app import Calendar
+from schooltool.note.note import Notes
+from schooltool.timetable.calendar import ScheduleCalendar
+
+
+class ContextStub(object):
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+def doctest_evolve49():
+    r"""Test evolution to generation 49.
+
+    The scan needs a storage that can iterate over its records.
+
+        >>> context = ContextStub(connection)
+        >>> data = connection.root()
+
+    Notes, calendars and tabs saved before this generation use
+    persistent lists and dicts.
+
+        >>> notes = data['notes'] = Notes()
+        >>> notes._notes = PersistentList(['note 1', 'note 2'])
+
+        >>> calendar = data['calendar'] = Calendar(None)
+        >>> calendar.events = PersistentDict({'e1': 'event 1'})
+        >>> schedule = data['schedule'] = ScheduleCalendar(None)
+        >>> schedule.events = PersistentDict({'e2': 'event 2'})
+
+        >>> tabs = data['tabs'] = ApplicationTabs()
+        >>> del tabs._data, tabs._length
+        >>> tabs.__dict__['data'] = {'manager': 'sections'}
+        >>> transaction.commit()
+
+        >>> from schooltool.generations.evolve49 import evolve
+        >>> evolve(context)
+
+        >>> isinstance(notes._notes, AppendLog), list(notes._notes)
+        (True, ['note 1', 'note 2'])
+
+        >>> isinstance(calendar.events, BTreeMap), calendar.events.items()
+        (True, [('e1', 'event 1')])
+        >>> isinstance(schedule.events, BTreeMap), schedule.events.items()
+        (True, [('e2', 'event 2')])
+
+        >>> 'data' in tabs.__dict__
+        False
+        >>> len(tabs), tabs.get('manager'), tabs.default
+        (1, 'sections', 'calendar')
+
+    Evolving again changes nothing.
+
+        >>> evolve(context)
+        >>> list(notes._notes), len(calendar.events), len(tabs)
+        (['note 1', 'note 2'], 1, 1)
+
+    """
+
+
+def setUp(test):
+    test.tempdir = tempfile.mkdtemp()
+    db = DB(FileStorage(os.path.join(test.tempdir, 'Data.fs')))
+    test.globs.update({
+        'db': db,
+        'connection': db.open(),
+        })
+
+
+def tearDown(test):
+    transaction.abort()
+    test.globs['connection'].close()
+    test.globs['db'].close()
+    shutil.rmtree(test.tempdir)
+
+
+def test_suite():
+    optionflags = (doctest.ELLIPSIS |
+                   doctest.NORMALIZE_WHITESPACE |
+                   doctest.REPORT_ONLY_FIRST_FAILURE)
+    return doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                                optionflags=optionflags)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,214 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.generations.scanner and steps
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import doctest
+
+import transaction
+from persistent import Persistent
+from ZODB.DB import DB
+from ZODB.FileStorage import FileStorage
+
+
+class ItemStub(Persistent):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class OtherStub(Persistent):
+    pass
+
+
+def doctest_StorageScanner():
+    """Tests for StorageScanner.
+
+        >>> from schooltool.generations.scanner import StorageScanner
+
+    The database has a root, a few items and another object.
+
+        >>> root = connection.root()
+        >>> root['items'] = [ItemStub(n) for n in range(5)]
+        >>> root['other'] = OtherStub()
+        >>> transaction.commit()
+
+    Only OIDs of requested classes are collected, all classes are counted.
+
+        >>> item_class = 'schooltool.generations.tests.test_scanner.ItemStub'
+        >>> other_class = 'schooltool.generations.tests.test_scanner.OtherStub'
+        >>> scanner = StorageScanner(storage, classes=[item_class])
+        >>> result = scanner.scan()
+        >>> result.total
+        7
+        >>> result.count(item_class), result.count(other_class)
+        (5, 1)
+
+        >>> oids = list(result.oids(item_class))
+        >>> sorted([connection.get(oid).name for oid in oids])
+        [0, 1, 2, 3, 4]
+        >>> list(result.oids(other_class))
+        []
+
+    OIDs come in storage order.
+
+        >>> oids == sorted(oids)
+        True
+
+    """
+
+
+def doctest_processOIDs():
+    """Tests for processOIDs.
+
+        >>> from schooltool.generations.steps import processOIDs
+
+        >>> root = connection.root()
+        >>> root['items'] = [ItemStub(n) for n in range(5)]
+        >>> transaction.commit()
+        >>> oids = [item._p_oid for item in root['items']]
+        >>> oids.append('\\0' * 7 + '\\xff')
+
+    Objects are processed in batches; missing ones are skipped.
+
+        >>> def step(item):
+        ...     item.name += 10
+        >>> processOIDs(connection, oids, step, batch_size=2, commit=True)
+        5
+
+        >>> transaction.abort()
+        >>> [item.name for item in root['items']]
+        [10, 11, 12, 13, 14]
+
+    """
+
+
+def doctest_EvolveStep():
+    """Tests for EvolveStep.
+
+        >>> from schooltool.generations.steps import EvolveStep
+        >>> from schooltool.generations.steps import getCheckpoint
+        >>> from schooltool.generations.steps import clearCheckpoints
+
+        >>> root = connection.root()
+        >>> root['seen'] = ItemStub([])
+        >>> transaction.commit()
+
+        >>> class Step(EvolveStep):
+        ...     name = 'test.numbers'
+        ...     batch_size = 3
+        ...     fail_at = None
+        ...     def units(self, after):
+        ...         start = 0 if after is None else after + 1
+        ...         for n in range(start, 10):
+        ...             yield n, n
+        ...     def total(self):
+        ...         return 10
+        ...     def process(self, n):
+        ...         if n == self.fail_at:
+        ...             raise RuntimeError('crash at %d' % n)
+        ...         root['seen'].name = root['seen'].name + [n]
+
+    The step commits every three units.  If it fails, the work done
+    since the last commit is lost.
+
+        >>> step = Step(connection)
+        >>> step.fail_at = 7
+        >>> step()
+        Traceback (most recent call last):
+          ...
+        RuntimeError: crash at 7
+        >>> transaction.abort()
+
+        >>> root['seen'].name
+        [0, 1, 2, 3, 4, 5]
+        >>> checkpoint = getCheckpoint(connection, 'test.numbers')
+        >>> checkpoint.position, checkpoint.done, checkpoint.finished
+        (5, 6, False)
+
+    Run again, it resumes from the checkpoint.
+
+        >>> Step(connection)()
+        10
+        >>> root['seen'].name
+        [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+        >>> checkpoint.finished
+        True
+
+    Finished steps are not run again.
+
+        >>> Step(connection)()
+        10
+        >>> root['seen'].name
+        [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+        >>> clearCheckpoints(connection, prefix='test.')
+        >>> getCheckpoint(connection, 'test.numbers').done
+        0
+
+    """
+
+
+def doctest_ProgressLog():
+    """Tests for ProgressLog.
+
+        >>> from schooltool.generations.steps import ProgressLog
+        >>> progress = ProgressLog('Links', total=1000)
+        >>> progress.start -= 10
+        >>> progress.done = 100
+        >>> int(round(progress.rate)), int(round(progress.eta))
+        (10, 90)
+
+        >>> print ProgressLog('Links').eta
+        None
+
+    """
+
+
+def setUp(test):
+    test.tempdir = tempfile.mkdtemp()
+    storage = FileStorage(os.path.join(test.tempdir, 'Data.fs'))
+    db = DB(storage)
+    test.globs.update({
+        'storage': storage,
+        'db': db,
+        'connection': db.open(),
+        })
+
+
+def tearDown(test):
+    transaction.abort()
+    test.globs['connection'].close()
+    test.globs['db'].close()
+    shutil.rmtree(test.tempdir)
+
+
+def test_suite():
+    return unittest.TestSuite([
+        doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                             optionflags=doctest.ELLIPSIS),
+        doctest.DocTestSuite('schooltool.generations.scanner'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -873,6 +873,8 @@ class FlourishRequestGroupIDCardsView(RequestRemoteReportDialog):
 
 class FlourishGroupIDCardsView(FlourishPersonIDCardsViewBase):
 
+    chunkable = True
+
     @property
     def title(self):
         return _('ID Cards for Group: ${group}',
@@ -884,14 +886,11 @@ class FlourishGroupIDCardsView(FlourishPersonIDCardsViewBase):
         return 'id_cards_%s_%s.pdf' % (
             self.context.title,  sy.title)
 
-    def persons(self):
+    def getPersons(self):
         collator = ICollator(self.request.locale)
         factory = getUtility(IPersonFactory)
         sorting_key = lambda x: factory.getSortingKey(x, collator)
-        sorted_persons = sorted(self.context.members, key=sorting_key)
-        result = [self.getPersonData(person)
-                  for person in sorted_persons]
-        return result
+        return sorted(self.context.members, key=sorting_key)
 
 
 def done_link_url_cell_formatter(group):
@@ -118,6 +118,8 @@ def doctest_GroupCalendarViewersCrowd():
         >>> setting = True
         >>> class CustomisationsStub(object):
         ...     implements(IAccessControlCustomisations)
+        ...     def snapshot(self):
+        ...         return self
         ...     def get(self, key):
         ...         print 'Getting %s' % key
         ...         return setting
@@ -18,7 +18,8 @@
 """
 Implementation of notes for IAnnotatable objects.
 
-Notes are stored as a PersistentList of Note objects on IAnnotatable objects.
+Notes are stored as an AppendLog of Note objects on IAnnotatable objects, so
+notes added at the same time by different users do not conflict.
 A Note is a simple object that stores a brief note or comment about an object
 to be entered by a user.
 
@@ -38,10 +39,10 @@ import datetime
 import random
 
 from persistent import Persistent
-from persistent.list import PersistentList
 from zope.annotation.interfaces import IAnnotations
 from zope.interface import implements
 
+from schooltool.app.conflicts import AppendLog
 from schooltool.note import interfaces
 from schooltool.person.interfaces import IPerson
 from schooltool.securitypolicy.crowds import Crowd
@@ -118,7 +119,7 @@ class Notes(Persistent):
     implements(interfaces.INotes)
 
     def __init__(self):
-        self._notes = PersistentList()
+        self._notes = AppendLog()
 
     def __iter__(self):
         return iter(self._notes)
@@ -127,12 +128,12 @@ class Notes(Persistent):
         self._notes.append(note)
 
     def remove(self, unique_id):
-        for note in self._notes:
+        for note in list(self._notes):
             if note.unique_id == unique_id:
                 self._notes.remove(note)
 
     def clear(self):
-        del self._notes[:]
+        self._notes.clear()
 
 
 class NoteCrowd(Crowd):
@@ -381,7 +381,7 @@ class ReportMessageDownloads(object):
         self.files = {}
         for attr in self.file_attrs:
             value = getattr(self.context, attr, None)
-            if value is None:
+            if value is None or getattr(value, 'expired', False):
                 continue
             self.files[value.__name__] = value
 
@@ -408,7 +408,8 @@ class DownloadReportDialog(MessageDialog):
 
     @property
     def report_generated(self):
-        return bool(self.report)
+        report = self.report
+        return bool(report) and not getattr(report, 'expired', False)
 
     @property
     def main_recipient(self):
@@ -457,6 +458,7 @@ class ProgressReportPage(BrowserPage):
     render_debug = False
 
     base_filename = 'export'
+    file_extension = 'xls'
 
     message_title = _('export')
 
@@ -469,9 +471,9 @@ class ProgressReportPage(BrowserPage):
 
     def makeFileName(self, basename):
         if self.render_invariant:
-            return '%s.xls' % basename
+            return '%s.%s' % (basename, self.file_extension)
         timestamp = datetime.datetime.now().strftime('%y-%m-%d-%H-%M')
-        return '%s_%s.xls' % (basename, timestamp)
+        return '%s_%s.%s' % (basename, timestamp, self.file_extension)
 
     @property
     def filename(self):
@@ -23,6 +23,8 @@ Report interfaces
 import zope.schema
 import zope.file.interfaces
 from zope.interface import Attribute, Interface
+from zope.container.interfaces import IContainer, IContained
+from zope.container.constraints import contains
 from zope.location.interfaces import ILocation
 from zope.publisher.interfaces.browser import IBrowserRequest
 from zope.publisher.interfaces.browser import IBrowserPage
@@ -92,6 +94,96 @@ class IReportFile(zope.file.interfaces.IFile):
    pass
 
 
+class IStoredReportFile(IReportFile):
+   """A report file that reads its data from a stored report artifact."""
+
+   artifact = Attribute('The stored report artifact')
+
+   expired = zope.schema.Bool(
+      title=u'Expired',
+      description=u'The artifact was evicted from the store')
+
+   etag = Attribute('Strong HTTP entity tag of the report data')
+
+
+class IReportArtifact(IContained):
+   """A generated report output, addressed by the digest of its content."""
+
+   digest = zope.schema.ASCIILine(
+      title=u'SHA1 digest of the report data')
+
+   file = zope.schema.Object(
+      title=u'Report file',
+      schema=IReportFile,
+      required=False)
+
+   filename = zope.schema.TextLine(
+      title=u'Filename',
+      required=False)
+
+   mimeType = zope.schema.ASCIILine(
+      title=u'Mime type',
+      required=False)
+
+   size = zope.schema.Int(
+      title=u'Size in bytes')
+
+   created_on = zope.schema.Datetime(
+      title=u'Created on')
+
+   accessed_on = zope.schema.Datetime(
+      title=u'Last accessed on')
+
+   hits = zope.schema.Int(
+      title=u'Number of times the artifact was reused')
+
+   request_keys = zope.schema.Set(
+      title=u'Keys of the report requests served by this artifact',
+      value_type=zope.schema.ASCIILine(title=u'Request key'))
+
+
+class IReportArtifactStore(IContainer):
+   """Report outputs keyed by content digest, with retention."""
+
+   contains(IReportArtifact)
+
+   max_age = zope.schema.Timedelta(
+      title=u'Evict artifacts not accessed for this long',
+      required=False)
+
+   max_size = zope.schema.Int(
+      title=u'Evict least recently used artifacts above this total size',
+      required=False)
+
+   request_max_age = zope.schema.Timedelta(
+      title=u'Serve repeated report requests from the store for this long',
+      required=False)
+
+   total_size = zope.schema.Int(
+      title=u'Total size of stored artifacts in bytes')
+
+   def lookup(request_key, now=None):
+      """Return the artifact rendered for the request key or None.
+
+      Artifacts stored for the key longer than request_max_age ago
+      are not returned.
+      """
+
+   def store(report, request_key=None, now=None):
+      """Store a rendered report file, return the artifact.
+
+      If an artifact with identical content is already stored, it is
+      reused and the given report file is discarded.
+      """
+
+   def evict(max_age=None, max_size=None, now=None):
+      """Evict artifacts per retention policy.
+
+      Defaults to the store's max_age and max_size.  Returns a tuple
+      of (number of evicted artifacts, bytes reclaimed).
+      """
+
+
 class IReportDetails(Interface):
 
     report = zope.schema.Object(
@@ -20,13 +20,23 @@ Base classes for report reference and request adapters
 
 """
 
+import time
 import urllib
+from StringIO import StringIO
 
 try:
     from kombu.utils import symbol_by_name
 except ImportError:
     from celery.utils import get_symbol_by_name as symbol_by_name
 
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+import celery
+import celery.states
+
 import zope.i18n.locales
 import zope.component
 import zope.interface
@@ -57,13 +67,22 @@ from schooltool.report.interfaces import IReportMessage
 from schooltool.report.interfaces import IReportProgressMessage
 from schooltool.report.interfaces import IRemoteReportLayer
 from schooltool.report.interfaces import IReportFile
+from schooltool.report.interfaces import IStoredReportFile
+from schooltool.report.interfaces import IReportArtifactStore
+from schooltool.report.storage import makeRequestKey
 from schooltool.schoolyear.interfaces import ISchoolYear
 from schooltool.skin import flourish
 from schooltool.task.tasks import RemoteTask
+from schooltool.task.tasks import DBTask
+from schooltool.task.tasks import NoDatabaseException, TPCNotReady
+from schooltool.task.tasks import TPC_RETRY_SECONDS
 from schooltool.task.tasks import query_messages
 from schooltool.task.tasks import Message
 from schooltool.task.progress import ProgressMessage
+from schooltool.task.progress import TaskProgress
+from schooltool.task.progress import normalized_progress
 from schooltool.task.interfaces import ITaskScheduledNotification
+from schooltool.task.interfaces import ITaskContainer
 from schooltool.task.tasks import TaskCompletedNotification
 from schooltool.task.tasks import TaskScheduledNotification
 from schooltool.task.tasks import TaskFailedMessage
@@ -76,6 +95,48 @@ class ReportFile(zope.file.file.File):
     implements(IReportFile)
 
 
+class StoredReportFile(ReportFile):
+    """Report file that shares data with a stored report artifact."""
+    implements(IStoredReportFile)
+
+    artifact = None
+
+    def __init__(self, artifact):
+        # Skip File.__init__: the data is in the artifact's blob.
+        self.artifact = artifact
+        self.mimeType = artifact.mimeType
+        self.parameters = {}
+        self.__name__ = artifact.filename
+
+    @property
+    def expired(self):
+        return self.artifact is None or self.artifact.file is None
+
+    @property
+    def etag(self):
+        if self.expired:
+            return None
+        return '"%s"' % self.artifact.digest
+
+    @property
+    def size(self):
+        if self.expired:
+            return 0
+        return self.artifact.file.size
+
+    def open(self, mode='r'):
+        if not mode.startswith('r'):
+            raise IOError('Stored report files are read only')
+        if self.expired:
+            raise IOError('Stored report expired')
+        return self.artifact.file.open(mode)
+
+    def openDetached(self):
+        if self.expired:
+            raise IOError('Stored report expired')
+        return self.artifact.file.openDetached()
+
+
 class ReportLinkViewletManager(flourish.viewlet.ViewletManager):
     implements(IReportLinkViewletManager)
 
@@ -379,6 +440,9 @@ class AbstractReportTask(RemoteTask):
 
     context_intid = None
 
+    # Keep generated files in the report artifact store.
+    store_artifacts = True
+
     def __init__(self, report_builder, context, remote_request=None):
         RemoteTask.__init__(self)
         if isinstance(report_builder, basestring):
@@ -493,7 +557,49 @@ class AbstractReportTask(RemoteTask):
         if not report.__name__ or not report.__name__.strip():
             report.__name__ = self.default_filename
 
+    def getArtifactStore(self):
+        if not self.store_artifacts:
+            return None
+        app = ISchoolToolApplication(None)
+        return IReportArtifactStore(app, None)
+
+    def getDataRevision(self, renderer):
+        """Return the revision of the data the report is built from.
+
+        Reports are only served from the artifact store for renderers
+        that provide a `data_revision` attribute or method covering all
+        the data they read.  Such renderers should also set
+        `render_invariant`, so that the same data renders the same file.
+        None, the default, always renders the report.
+        """
+        revision = getattr(renderer, 'data_revision', None)
+        if callable(revision):
+            revision = revision()
+        return revision
+
+    def getArtifactKey(self, renderer, *args, **kw):
+        revision = self.getDataRevision(renderer)
+        if revision is None:
+            return None
+        params = sorted(self.request_params.items())
+        return makeRequestKey(
+            self.signature,
+            self.factory_name or self.view_name,
+            self.context_intid,
+            self.creator_username,
+            self.request_params.locale_id,
+            params, args, sorted(kw.items()),
+            revision)
+
     def renderToFile(self, renderer, *args, **kw):
+        store = self.getArtifactStore()
+        request_key = None
+        if store is not None:
+            request_key = self.getArtifactKey(renderer, *args, **kw)
+        if request_key is not None:
+            artifact = store.lookup(request_key)
+            if artifact is not None:
+                return StoredReportFile(artifact)
         report = ReportFile()
         stream = report.open('w')
         try:
@@ -503,7 +609,13 @@ class AbstractReportTask(RemoteTask):
         finally:
             stream.close()
         self.updateReport(renderer, report)
-        return report
+        if store is None:
+            return report
+        artifact = store.store(report, request_key=request_key)
+        stored = StoredReportFile(artifact)
+        stored.__name__ = report.__name__
+        stored.mimeType = report.mimeType
+        return stored
 
     @property
     def factory(self):
@@ -530,17 +642,145 @@ class AbstractReportTask(RemoteTask):
         self.context_intid = intid
 
 
+def concatenatePDFs(pdfs, stream):
+    merger = PyPDF2.PdfFileMerger()
+    for data in pdfs:
+        merger.append(StringIO(data))
+    # PdfFileMerger needs a seekable stream
+    buf = StringIO()
+    merger.write(buf)
+    stream.write(buf.getvalue())
+
+
+class ReportChunkDBTask(DBTask):
+    """Render a chunk of a report task, return the PDF data."""
+
+    parent_task_id = None
+
+    @property
+    def remote_task(self):
+        app = self.schooltool_app
+        if app is None:
+            raise AttributeError(
+                'remote_task: SchoolTool app only available within ZODB transaction')
+        tasks = ITaskContainer(app)
+        return tasks.get(self.parent_task_id)
+
+    def __call__(self, parent_task_id, chunk):
+        self.parent_task_id = parent_task_id
+        try:
+            return self.runTransaction('renderRemoteChunk', False, self, chunk)
+        except (NoDatabaseException, TPCNotReady), exc:
+            n_retry = getattr(self.request, 'retries', 0)
+            countdown = TPC_RETRY_SECONDS[min(n_retry, len(TPC_RETRY_SECONDS)-1)]
+            raise self.retry(exc=exc, countdown=countdown,
+                             max_retries=self.max_tpc_retries)
+        finally:
+            self.parent_task_id = None
+            self.closeTransaction()
+
+
 class ReportTask(AbstractReportTask):
 
     default_filename = 'report.pdf'
     default_mimetype = 'application/pdf'
 
-    def renderReport(self, renderer, stream, *args, **kw):
+    chunk_celery_task = ReportChunkDBTask
+    chunk_poll_seconds = 1
+    # Chunks no worker picked up within the grace period are rendered
+    # by this task.
+    chunk_grace_seconds = 30
+    # Chunks not finished by the deadline are rendered by this task
+    # too, their worker may have died.
+    chunk_timeout_seconds = 15 * 60
+
+    def renderPDF(self, renderer):
         renderer.update()
         rml = renderer.render()
         filename = renderer.filename
         pdf = rml2pdf.parseString(rml, filename=filename or None)
-        stream.write(pdf.getvalue())
+        return pdf.getvalue()
+
+    @property
+    def report_workers(self):
+        return getattr(celery.current_app.conf,
+                       'SCHOOLTOOL_REPORT_WORKERS', 1)
+
+    def getReportChunks(self, renderer):
+        # This task takes a report worker, chunks are only rendered in
+        # parallel if there are others.
+        if self.report_workers < 2:
+            return None
+        getChunks = getattr(renderer, 'getReportChunks', None)
+        if getChunks is None or PyPDF2 is None:
+            return None
+        return getChunks()
+
+    def renderReport(self, renderer, stream, *args, **kw):
+        chunks = self.getReportChunks(renderer)
+        if chunks is not None and len(chunks) > 1:
+            self.renderChunks(chunks, stream)
+        else:
+            stream.write(self.renderPDF(renderer))
+
+    def renderChunk(self, chunk):
+        renderer = self.getRenderer()
+        renderer.report_chunk = chunk
+        return self.renderPDF(renderer)
+
+    def renderRemoteChunk(self, celery_task, chunk):
+        self.beginRequest()
+        try:
+            return self.renderChunk(chunk)
+        finally:
+            self.endRequest()
+
+    def renderChunks(self, chunks, stream):
+        """Render chunks in parallel subtasks and concatenate them.
+
+        Chunks that no worker has picked up within the grace period, that
+        failed, or that are not finished by the deadline are rendered by
+        this task, so the report is finished even if all report workers
+        are busy or a worker died.
+        """
+        progress = TaskProgress(self.task_id)
+        progress.title = _('Rendering report')
+        total = len(chunks)
+        progress.force('chunks', title=_('Rendering'), progress=0.0)
+        results = [
+            self.chunk_celery_task.apply_async(
+                args=(self.task_id, chunk),
+                routing_key=self.routing_key)
+            for chunk in chunks]
+        dispatched = time.time()
+        grace = dispatched + self.chunk_grace_seconds
+        deadline = dispatched + self.chunk_timeout_seconds
+        pdfs = {}
+        while len(pdfs) < total:
+            now = time.time()
+            for n, result in enumerate(results):
+                if n in pdfs:
+                    continue
+                state = result.state
+                if state == celery.states.SUCCESS:
+                    pdfs[n] = result.result
+                    break
+                elif state in celery.states.PROPAGATE_STATES:
+                    pdfs[n] = self.renderChunk(chunks[n])
+                    break
+                elif ((state == celery.states.PENDING and now >= grace) or
+                      now >= deadline):
+                    result.revoke()
+                    pdfs[n] = self.renderChunk(chunks[n])
+                    break
+            else:
+                time.sleep(self.chunk_poll_seconds)
+                continue
+            progress.force('chunks', title=_('Rendering'),
+                           progress=normalized_progress(len(pdfs), total))
+        progress.force('chunks', title=_('Merging'), progress=None)
+        concatenatePDFs([pdfs[n] for n in range(total)], stream)
+        progress.finish('chunks')
 
 
 class OldReportTask(ReportTask):
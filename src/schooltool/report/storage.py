@@ -0,0 +1,260 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Report artifact store.
+
+Generated reports are stored once per distinct content, keyed by the
+SHA1 digest of the data.  Report files are zope.file blobs, so with
+a blob-dir configured the data lives on the filesystem, outside Data.fs.
+
+Old artifacts are evicted by a periodic task, not by the report tasks.
+"""
+
+import datetime
+import hashlib
+import logging
+
+import pytz
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree
+from BTrees.Length import Length
+from zope.interface import implements, implementer
+from zope.component import adapter
+from zope.container.btree import BTreeContainer
+from zope.container.contained import Contained
+
+from schooltool.app.app import StartUpBase
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.report.interfaces import IReportArtifact
+from schooltool.report.interfaces import IReportArtifactStore
+from schooltool.task.tasks import PeriodicDBTask
+
+
+log = logging.getLogger('schooltool.report.storage')
+
+ARTIFACT_STORE_KEY = 'schooltool.report.artifacts'
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def utcnow():
+    return pytz.UTC.localize(datetime.datetime.utcnow())
+
+
+def computeDigest(report):
+    """Compute the SHA1 digest of report file data."""
+    digest = hashlib.sha1()
+    stream = report.open('r')
+    try:
+        while True:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    finally:
+        stream.close()
+    return digest.hexdigest()
+
+
+def makeRequestKey(*parts):
+    """Hash report request parts into a store request key.
+
+    Parts are converted with repr, so they should be simple values:
+    strings, numbers, tuples, sorted lists of pairs.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, unicode):
+            part = part.encode('UTF-8')
+        digest.update(repr(part))
+        digest.update('\0')
+    return digest.hexdigest()
+
+
+class ReportArtifact(Persistent, Contained):
+    implements(IReportArtifact)
+
+    digest = None
+    file = None
+    filename = None
+    mimeType = None
+    size = 0
+    created_on = None
+    accessed_on = None
+    hits = 0
+
+    def __init__(self, digest, report, now=None):
+        Persistent.__init__(self)
+        Contained.__init__(self)
+        self.digest = digest
+        self.file = report
+        self.filename = report.__name__
+        self.mimeType = report.mimeType
+        self.size = report.size
+        self.created_on = self.accessed_on = now or utcnow()
+        self.request_keys = set()
+
+
+class ReportArtifactStore(BTreeContainer):
+    """Report artifacts keyed by content digest.
+
+    Besides the artifacts, the store keeps:
+
+    - a mapping of report request keys to (digest, stored on) pairs,
+      so that repeated requests can be served without rendering for
+      request_max_age,
+    - an index of (accessed_on, digest) pairs for cheap eviction of the
+      least recently used artifacts,
+    - a running total of stored bytes.
+    """
+    implements(IReportArtifactStore)
+
+    max_age = datetime.timedelta(days=30)
+    max_size = None
+    request_max_age = datetime.timedelta(minutes=10)
+
+    def __init__(self):
+        super(ReportArtifactStore, self).__init__()
+        self._requests = OOBTree()
+        self._by_access = OOBTree()
+        self._total_size = Length()
+
+    @property
+    def total_size(self):
+        return self._total_size()
+
+    def _requestDigest(self, request_key):
+        entry = self._requests.get(request_key)
+        if entry is None:
+            return None, None
+        return entry
+
+    def lookup(self, request_key, now=None):
+        digest, stored_on = self._requestDigest(request_key)
+        if digest is None:
+            return None
+        if now is None:
+            now = utcnow()
+        if (self.request_max_age is not None and
+            stored_on < now - self.request_max_age):
+            # The data outside the report context may have changed.
+            return None
+        artifact = self.get(digest)
+        if artifact is None:
+            del self._requests[request_key]
+            return None
+        artifact.hits += 1
+        self._touch(artifact, now)
+        return artifact
+
+    def store(self, report, request_key=None, now=None):
+        if now is None:
+            now = utcnow()
+        digest = computeDigest(report)
+        artifact = self.get(digest)
+        if artifact is None:
+            artifact = ReportArtifact(digest, report, now=now)
+            self[digest] = artifact
+            self._by_access[artifact.accessed_on, digest] = None
+            self._total_size.change(artifact.size)
+        else:
+            self._touch(artifact, now)
+        if request_key is not None:
+            old_digest, stored_on = self._requestDigest(request_key)
+            if old_digest is not None and old_digest in self:
+                self[old_digest].request_keys.discard(request_key)
+                self[old_digest]._p_changed = True
+            self._requests[request_key] = (digest, now)
+            artifact.request_keys.add(request_key)
+            artifact._p_changed = True
+        return artifact
+
+    def _touch(self, artifact, now):
+        key = (artifact.accessed_on, artifact.digest)
+        if key in self._by_access:
+            del self._by_access[key]
+        artifact.accessed_on = now
+        self._by_access[artifact.accessed_on, artifact.digest] = None
+
+    def __delitem__(self, digest):
+        artifact = self[digest]
+        key = (artifact.accessed_on, digest)
+        if key in self._by_access:
+            del self._by_access[key]
+        for request_key in artifact.request_keys:
+            if self._requestDigest(request_key)[0] == digest:
+                del self._requests[request_key]
+        self._total_size.change(-artifact.size)
+        super(ReportArtifactStore, self).__delitem__(digest)
+        # Stored report files that still point to the artifact
+        # will see it as expired; the blob is released on pack.
+        artifact.file = None
+
+    def evict(self, max_age=None, max_size=None, now=None):
+        if max_age is None:
+            max_age = self.max_age
+        if max_size is None:
+            max_size = self.max_size
+        if now is None:
+            now = utcnow()
+        evicted = 0
+        reclaimed = 0
+        while len(self._by_access):
+            accessed_on, digest = self._by_access.minKey()
+            too_old = (max_age is not None and
+                       accessed_on < now - max_age)
+            too_big = (max_size is not None and
+                       self.total_size > max_size)
+            if not (too_old or too_big):
+                break
+            reclaimed += self[digest].size
+            evicted += 1
+            del self[digest]
+        return evicted, reclaimed
+
+
+@adapter(ISchoolToolApplication)
+@implementer(IReportArtifactStore)
+def getReportArtifactStoreForApp(app):
+    return app[ARTIFACT_STORE_KEY]
+
+
+class ReportArtifactStoreStartUp(StartUpBase):
+
+    def __call__(self):
+        if ARTIFACT_STORE_KEY not in self.app:
+            self.app[ARTIFACT_STORE_KEY] = ReportArtifactStore()
+
+
+class EvictReportArtifactsTask(PeriodicDBTask):
+    """Hourly eviction of old report artifacts."""
+
+    name = 'schooltool.report.storage.evict_artifacts'
+    run_every = datetime.timedelta(hours=1)
+    routing_key = 'zodb.report'
+
+    def execute(self, celery_task):
+        app = ISchoolToolApplication(None)
+        store = IReportArtifactStore(app, None)
+        if store is None:
+            return None
+        evicted, reclaimed = store.evict()
+        summary = '%d report artifacts (%d bytes) evicted' % (
+            evicted, reclaimed)
+        log.info(summary)
+        return summary
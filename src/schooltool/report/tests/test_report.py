@@ -21,14 +21,318 @@ Unit tests for report functionality.
 """
 import unittest
 import doctest
+import datetime
+from StringIO import StringIO
 
+import pytz
+from ZODB.utils import p64
 from zope.app.testing import setup
 
 from schooltool.report import report
 
 
-def doctest_Something(self):
-    """Tests for something.
+utc = pytz.UTC
+
+
+class FileStub(object):
+
+    mimeType = 'application/pdf'
+
+    def __init__(self, name, data):
+        self.__name__ = name
+        self.data = data
+        self.size = len(data)
+
+    def open(self, mode='r'):
+        return StringIO(self.data)
+
+
+def doctest_ReportArtifactStore():
+    """Tests for ReportArtifactStore.
+
+        >>> from schooltool.report.storage import ReportArtifactStore
+        >>> store = ReportArtifactStore()
+
+    Reports are stored by content digest.  Storing identical data again
+    returns the artifact that is already there.
+
+        >>> now = datetime.datetime(2014, 5, 1, 12, 0, tzinfo=utc)
+        >>> long_ago = now - datetime.timedelta(days=40)
+        >>> roster = store.store(FileStub('roster.pdf', 'roster data'),
+        ...                      request_key='roster-request', now=long_ago)
+        >>> roster.digest
+        '649d4a80574c16f82887fa38fe95595126022622'
+        >>> roster.filename, roster.size
+        ('roster.pdf', 11)
+
+        >>> again = store.store(FileStub('roster-2.pdf', 'roster data'),
+        ...                     now=long_ago)
+        >>> again is roster
+        True
+        >>> len(store), store.total_size
+        (1, 11)
+
+    Requests can be looked up by key for a while after they were stored.
+    The report may be built from data outside its context, so older
+    requests are rendered again.
+
+        >>> soon = long_ago + datetime.timedelta(minutes=5)
+        >>> store.lookup('roster-request', now=soon) is roster
+        True
+        >>> roster.hits, roster.accessed_on == soon
+        (1, True)
+        >>> print store.lookup('unknown-request', now=soon)
+        None
+        >>> print store.lookup('roster-request', now=now)
+        None
+
+    Old artifacts are evicted by age.
+
+        >>> cards = store.store(FileStub('cards.pdf', 'id cards data'),
+        ...                     now=now)
+        >>> len(store), store.total_size
+        (2, 24)
+
+        >>> store.evict(now=now)
+        (1, 11)
+        >>> list(store.values()) == [cards]
+        True
+
+    Evicted artifacts drop their files, and their request keys.
+
+        >>> print roster.file
+        None
+        >>> print store.lookup('roster-request', now=soon)
+        None
+
+    Least recently used artifacts are evicted by total size.
+
+        >>> labels = store.store(FileStub('labels.pdf', 'mailing labels'))
+        >>> store.total_size
+        27
+        >>> store.evict(max_size=20)
+        (1, 13)
+        >>> list(store.values()) == [labels]
+        True
+
+    """
+
+
+def doctest_StoredReportFile():
+    """Tests for StoredReportFile.
+
+        >>> from schooltool.report.storage import ReportArtifactStore
+        >>> store = ReportArtifactStore()
+        >>> artifact = store.store(FileStub('roster.pdf', 'roster data'))
+
+        >>> stored = report.StoredReportFile(artifact)
+        >>> stored.__name__, stored.mimeType, stored.size, stored.expired
+        ('roster.pdf', 'application/pdf', 11, False)
+        >>> stored.open().read()
+        'roster data'
+
+        >>> stored.open('w')
+        Traceback (most recent call last):
+        ...
+        IOError: Stored report files are read only
+
+        >>> del store[artifact.digest]
+        >>> stored.size, stored.expired
+        (0, True)
+
+    """
+
+
+class RendererStub(object):
+
+    mimetype = 'application/pdf'
+    filename = 'roster.pdf'
+
+    def __init__(self, data, data_revision=None):
+        self.data = data
+        self.data_revision = data_revision
+
+    def __call__(self):
+        print 'Rendering', self.data
+        return self.data
+
+
+def doctest_AbstractReportTask_renderToFile():
+    """Tests for AbstractReportTask.renderToFile.
+
+        >>> from schooltool.report.storage import ReportArtifactStore
+        >>> store = ReportArtifactStore()
+
+        >>> class ReportTaskForTest(report.AbstractReportTask):
+        ...     signature = 'roster'
+        ...     view_name = 'roster.pdf'
+        ...     context_intid = 42
+        ...     creator_username = 'teacher'
+        ...     request_params = report.RemoteRequestParams()
+        ...     def getArtifactStore(self):
+        ...         return store
+        >>> task = ReportTaskForTest.__new__(ReportTaskForTest)
+
+    By default reports are always rendered, the task cannot tell what
+    data the renderer reads.
+
+        >>> print task.getArtifactKey(RendererStub('roster data'))
+        None
+        >>> first = task.renderToFile(RendererStub('roster data'))
+        Rendering roster data
+        >>> first = task.renderToFile(RendererStub('roster data'))
+        Rendering roster data
+
+    Renderers that tell their data revision are served from the store
+    while the revision stays the same.
+
+        >>> first = task.renderToFile(RendererStub('roster data', p64(1)))
+        Rendering roster data
+        >>> second = task.renderToFile(RendererStub('roster data', p64(1)))
+        >>> first.artifact is second.artifact
+        True
+        >>> second.open().read()
+        'roster data'
+
+        >>> third = task.renderToFile(
+        ...     RendererStub('new roster data', lambda: p64(2)))
+        Rendering new roster data
+        >>> third.open().read()
+        'new roster data'
+
+    """
+
+
+class AsyncResultStub(object):
+    """Async result that goes through the given states as it is polled."""
+
+    def __init__(self, chunk, states):
+        self.chunk = chunk
+        self.states = list(states)
+
+    @property
+    def state(self):
+        if len(self.states) > 1:
+            return self.states.pop(0)
+        return self.states[0]
+
+    @property
+    def result(self):
+        return 'remote %s' % ' '.join(self.chunk)
+
+    def revoke(self):
+        print 'revoke', self.chunk
+
+
+class ChunkCeleryTaskStub(object):
+
+    states = {}
+
+    @classmethod
+    def apply_async(cls, args=(), routing_key=None):
+        parent_task_id, chunk = args
+        print 'dispatch', chunk, 'to', routing_key
+        states = cls.states.get(tuple(chunk), ['PENDING'])
+        return AsyncResultStub(chunk, states)
+
+
+class TimeStub(object):
+    """Clock that only moves when sleeping."""
+
+    def __init__(self):
+        self.now = 0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def doctest_ReportTask_getReportChunks():
+    """Tests for ReportTask.getReportChunks.
+
+        >>> class ChunkedRendererStub(object):
+        ...     def getReportChunks(self):
+        ...         return [['a', 'b'], ['c']]
+
+        >>> class ReportTaskForTest(report.ReportTask):
+        ...     report_workers = 1
+        >>> task = ReportTaskForTest.__new__(ReportTaskForTest)
+
+    The task itself takes the only report worker, so the report is
+    rendered in one piece.
+
+        >>> print task.getReportChunks(ChunkedRendererStub())
+        None
+
+    With more report workers, chunks are rendered in parallel.
+
+        >>> task.report_workers = 2
+        >>> task.getReportChunks(ChunkedRendererStub())
+        [['a', 'b'], ['c']]
+        >>> print task.getReportChunks(object())
+        None
+
+    """
+
+
+def doctest_ReportTask_renderChunks():
+    """Tests for ReportTask.renderChunks.
+
+        >>> class ReportTaskForTest(report.ReportTask):
+        ...     task_id = None
+        ...     chunk_celery_task = ChunkCeleryTaskStub
+        ...     chunk_poll_seconds = 1
+        ...     chunk_grace_seconds = 10
+        ...     chunk_timeout_seconds = 60
+        ...     def renderChunk(self, chunk):
+        ...         print 'render', chunk, 'at', clock.now
+        ...         return 'local %s' % ' '.join(chunk)
+
+        >>> old_concatenatePDFs = report.concatenatePDFs
+        >>> report.concatenatePDFs = lambda pdfs, stream: stream.extend(pdfs)
+        >>> old_time = report.time
+        >>> report.time = clock = TimeStub()
+
+    Chunks are dispatched to the report workers and finished chunks are
+    collected.  Failed chunks are rendered again by the task itself.
+    Chunks that were not picked up by a worker within the grace period
+    are revoked and rendered by the task.  So are chunks not finished by
+    the deadline, i.e. when their worker died.
+
+        >>> ChunkCeleryTaskStub.states = {
+        ...     ('c', 'd'): ['SUCCESS'],
+        ...     ('e', ): ['STARTED', 'STARTED', 'STARTED', 'SUCCESS'],
+        ...     ('f', ): ['STARTED', 'FAILURE'],
+        ...     ('g', ): ['STARTED'],
+        ...     ('h', ): ['PENDING', 'PENDING', 'STARTED', 'SUCCESS'],
+        ...     }
+        >>> task = ReportTaskForTest.__new__(ReportTaskForTest)
+        >>> pdfs = []
+        >>> task.renderChunks(
+        ...     [['a', 'b'], ['c', 'd'], ['e'], ['f'], ['g'], ['h']], pdfs)
+        dispatch ['a', 'b'] to zodb.report
+        dispatch ['c', 'd'] to zodb.report
+        dispatch ['e'] to zodb.report
+        dispatch ['f'] to zodb.report
+        dispatch ['g'] to zodb.report
+        dispatch ['h'] to zodb.report
+        render ['f'] at 1
+        revoke ['a', 'b']
+        render ['a', 'b'] at 10
+        revoke ['g']
+        render ['g'] at 60
+
+    PDFs are concatenated in chunk order.
+
+        >>> pdfs
+        ['local a b', 'remote c d', 'remote e', 'local f', 'local g',
+         'remote h']
+
+        >>> report.concatenatePDFs = old_concatenatePDFs
+        >>> report.time = old_time
+
     """
 
 
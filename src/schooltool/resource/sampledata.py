@@ -32,11 +32,14 @@ class SampleResources(object):
     name = 'resources'
     dependencies = ()
 
+    rooms = 64
+    projectors = 24
+
     def generate(self, app, seed=None):
-        for i in range(64):
+        for i in range(self.rooms):
             room = app['resources']['room%02d' % i] = Location(title='Room %02d' % i)
             room.type = "Classroom"
-        for i in range(24):
+        for i in range(self.projectors):
             resource = Resource(title='Projector %02d' % i)
             projector = app['resources']['projector%02d' % i] = resource
             projector.type = "Projector"
@@ -40,7 +40,8 @@ from schooltool.sampledata.interfaces import ISampleDataPlugin
 from schooltool.sampledata.interfaces import CyclicDependencyError
 
 
-def generate(app, seed=None, dry_run=False, pluginNames=[]):
+def generate(app, seed=None, dry_run=False, pluginNames=[],
+             profile=None, commit=False):
     """Generate sample data provided by all plugins.
 
     Runs the generate functions of all plugins in an order such that
@@ -49,6 +50,10 @@ def generate(app, seed=None, dry_run=False, pluginNames=[]):
     In essence, this function performs a topological sort in a
     directed acyclic graph.
 
+    If a profile (see schooltool.sampledata.profiles) is given, plugins
+    are scaled by it.  If commit is set, the transaction is committed
+    after each plugin, otherwise a savepoint is made.
+
     Raises a CyclicDependencyError if the dependency graph has a cycle.
 
     Returns a dict with names of plugins run as keys and CPU times as
@@ -86,12 +91,17 @@ def generate(app, seed=None, dry_run=False, pluginNames=[]):
             plugin = plugins[name]
             for dep in plugin.dependencies:
                 visit(dep)
+            if profile is not None:
+                plugin = profile.configure(plugin)
             start = time.clock()
             if not dry_run:
                 plugin.generate(app, seed)
-                # Some plugins can generate a lot of data, so we are
-                # using savepoints to save on memory consuption.
-                transaction.savepoint(optimistic=True)
+                if commit:
+                    transaction.commit()
+                else:
+                    # Some plugins can generate a lot of data, so we are
+                    # using savepoints to save on memory consuption.
+                    transaction.savepoint(optimistic=True)
 
             times[name] = time.clock() - start
             status[name] = closed
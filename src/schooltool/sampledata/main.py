@@ -0,0 +1,126 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Command line sample data generation.
+
+Usage: schooltool-sampledata -c schooltool.conf [--profile name]
+                             [--seed seed] [plugin ...]
+
+Generates sample data into the database configured in schooltool.conf,
+which should be a fresh one.  Without plugin names all plugins are run.
+"""
+import sys
+import time
+
+import transaction
+from zope.app.publication.zopepublication import ZopePublication
+from zope.component import getUtilitiesFor
+from zope.component.hooks import setSite
+
+from schooltool.app.main import SchoolToolCommand
+from schooltool.sampledata.generator import generate
+from schooltool.sampledata.interfaces import ISampleDataPlugin
+from schooltool.sampledata.profiles import getProfile, profiles
+
+
+class SampleDataOptions(SchoolToolCommand.Options):
+    profile = None
+    seed = 'SchoolTool'
+    plugins = ()
+
+
+class SampleDataGenerator(SchoolToolCommand):
+
+    Options = SampleDataOptions
+
+    short_options = 'c:p:s:h'
+    long_options = ['config=', 'profile=', 'seed=', 'help']
+
+    def usage(self, progname):
+        lines = [
+            "Usage: %s -c schooltool.conf [options] [plugin ...]" % progname,
+            "Options:",
+            "  -c, --config xxx       use this configuration file",
+            "  -p, --profile xxx      sample data size profile",
+            "  -s, --seed xxx         random seed",
+            "  -h, --help             show this help message",
+            "Profiles:",
+            ]
+        for name in sorted(profiles):
+            lines.append("  %-22s %s" % (name, profiles[name].title))
+        return "\n".join(lines)
+
+    def handleOption(self, options, opt, value, progname):
+        if opt in ('-p', '--profile'):
+            try:
+                options.profile = getProfile(value)
+            except ValueError, e:
+                print >> sys.stderr, "%s: %s" % (progname, e)
+                sys.exit(1)
+        if opt in ('-s', '--seed'):
+            options.seed = value
+
+    def handleArguments(self, options, args):
+        options.plugins = args
+
+    def load_options(self, argv):
+        options = SchoolToolCommand.load_options(self, argv)
+        # Sample data plugins are only registered in developer mode.
+        options.config.devmode = True
+        return options
+
+    def generateSampleData(self, db, options):
+        connection = db.open()
+        root = connection.root()
+        app = root[ZopePublication.root_name]
+        setSite(app)
+        try:
+            if 'student000' in app['persons']:
+                print >> sys.stderr, (
+                    "The database already contains sample data.")
+                return None
+            names = options.plugins
+            if not names:
+                names = sorted([name for name, plugin in
+                                getUtilitiesFor(ISampleDataPlugin)])
+            return generate(app, options.seed, pluginNames=names,
+                            profile=options.profile, commit=True)
+        finally:
+            transaction.abort()
+            setSite(None)
+            connection.close()
+
+    def main(self, argv=sys.argv):
+        options = self.load_options(argv)
+        db = self.setup(options)
+        start = time.time()
+        times = self.generateSampleData(db, options)
+        db.close()
+        if times is None:
+            sys.exit(1)
+        for name, seconds in sorted(times.items()):
+            print "%-20s %8.2fs" % (name, seconds)
+        print "%-20s %8.2fs" % ("total (wall)", time.time() - start)
+
+
+def main():
+    SampleDataGenerator().main()
+
+
+if __name__ == '__main__':
+    main()
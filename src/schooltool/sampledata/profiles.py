@@ -0,0 +1,98 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Sample data size profiles.
+
+A profile scales sample data plugins by overriding their attributes
+(number of persons, courses, sections, event probability...), so that
+the same plugins can generate anything from a small school to a
+district sized database.
+"""
+import copy
+
+
+class SampleDataProfile(object):
+    """A named set of plugin attribute overrides."""
+
+    def __init__(self, name, title, settings):
+        self.name = name
+        self.title = title
+        self.settings = settings
+
+    def configure(self, plugin):
+        """Return the plugin scaled to this profile.
+
+        Plugins are shared utilities, so a configured copy is returned
+        instead of modifying the plugin itself.
+        """
+        overrides = self.settings.get(plugin.name)
+        if not overrides:
+            return plugin
+        plugin = copy.copy(plugin)
+        for attr, value in overrides.items():
+            setattr(plugin, attr, value)
+        return plugin
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+
+profiles = {}
+
+
+def registerProfile(name, title, **settings):
+    profiles[name] = SampleDataProfile(name, title, settings)
+
+
+def getProfile(name):
+    try:
+        return profiles[name]
+    except KeyError:
+        raise ValueError('Unknown sample data profile: %r (known: %s)' % (
+                name, ', '.join(sorted(profiles))))
+
+
+registerProfile(
+    'small', u'Small school',
+    students={'power': 300},
+    teachers={'power': 20},
+    courses={'power': 12},
+    sections={'sections_per_course': 2, 'section_size': 25},
+    personal_events={'probability': 2},
+    resources={'rooms': 20, 'projectors': 5},
+    )
+
+registerProfile(
+    'school-2k', u'School with 2000 students',
+    students={'power': 2000},
+    teachers={'power': 100},
+    courses={'power': 40},
+    sections={'sections_per_course': 6, 'section_size': 25},
+    personal_events={'probability': 2},
+    resources={'rooms': 100, 'projectors': 30},
+    )
+
+registerProfile(
+    'district-20k', u'District with 20000 students',
+    students={'power': 20000},
+    teachers={'power': 1000},
+    courses={'power': 200},
+    sections={'sections_per_course': 12, 'section_size': 25},
+    personal_events={'probability': 1},
+    resources={'rooms': 1000, 'projectors': 300},
+    )
@@ -120,6 +120,56 @@ def doctest_generate():
     """
 
 
+def doctest_generate_profile():
+    """Sample data profiles scale plugins.
+
+        >>> p1 = DummyPlugin("p1", ())
+        >>> p1.power = 10
+        >>> provideUtility(p1, ISampleDataPlugin, 'p1')
+
+        >>> from schooltool.sampledata.profiles import SampleDataProfile
+        >>> profile = SampleDataProfile('big', u'Big', {'p1': {'power': 1000}})
+
+        >>> class ScaledPlugin(DummyPlugin):
+        ...     def generate(self, app, seed=None):
+        ...         self.log.append((self.name, self.power))
+        >>> p2 = ScaledPlugin("p2", ("p1", ))
+        >>> p2.power = 10
+        >>> provideUtility(p2, ISampleDataPlugin, 'p2')
+
+        >>> DummyPlugin.log = []
+        >>> import schooltool.sampledata.generator
+        >>> result = schooltool.sampledata.generator.generate(
+        ...     'app', pluginNames=['p2'], profile=profile)
+        >>> DummyPlugin.log
+        [('p1', 'app', None), ('p2', 10)]
+
+        >>> profile.settings['p2'] = {'power': 500}
+        >>> DummyPlugin.log = []
+        >>> result = schooltool.sampledata.generator.generate(
+        ...     'app', pluginNames=['p2'], profile=profile)
+        >>> DummyPlugin.log
+        [('p1', 'app', None), ('p2', 500)]
+
+    The registered plugins are not modified.
+
+        >>> p2.power
+        10
+
+    Unknown profiles are reported.
+
+        >>> from schooltool.sampledata.profiles import getProfile
+        >>> getProfile('school-2k').settings['students']
+        {'power': 2000}
+        >>> getProfile('huge')
+        Traceback (most recent call last):
+          ...
+        ValueError: Unknown sample data profile: 'huge'
+            (known: district-20k, school-2k, small)
+
+    """
+
+
 def test_suite():
     return unittest.TestSuite([
         doctest.DocTestSuite(setUp=setup.placelessSetUp,
@@ -0,0 +1,126 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Date interval index of school years and terms.
+"""
+from persistent import Persistent
+from BTrees.OOBTree import OOBTree
+
+from schooltool.common import getRequestFromInteraction
+
+
+DATE_CACHE_KEY = 'schooltool.term.dates'
+
+
+class DateIndex(Persistent):
+    """School years and terms keyed by their first date.
+
+    Neither school years nor terms of a school year overlap, so the
+    interval containing a date, if any, is the one with the greatest
+    first date not after it.
+    """
+
+    def __init__(self):
+        self.schoolyears = OOBTree()
+        self.terms = OOBTree()
+
+    def rebuild(self, syc, exclude=()):
+        """Index school years in the container and their terms.
+
+        Objects in exclude (i.e. ones being removed) are left out,
+        along with their terms.
+        """
+        excluded = set([id(obj) for obj in exclude])
+        self.schoolyears.clear()
+        self.terms.clear()
+        for schoolyear in syc.values():
+            if id(schoolyear) in excluded:
+                continue
+            self.schoolyears[schoolyear.first] = schoolyear
+            for term in schoolyear.values():
+                if id(term) not in excluded:
+                    self.terms[term.first] = term
+
+    def _before(self, tree, date):
+        try:
+            return tree[tree.maxKey(date)]
+        except ValueError:
+            return None
+
+    def _after(self, tree, date):
+        try:
+            return tree[tree.minKey(date)]
+        except ValueError:
+            return None
+
+    def _containing(self, tree, date):
+        obj = self._before(tree, date)
+        if obj is not None and date <= obj.last:
+            return obj
+        return None
+
+    def getSchoolYearForDate(self, date):
+        return self._containing(self.schoolyears, date)
+
+    def getLastSchoolYearForDate(self, date):
+        """The school year containing the date or the last one before it.
+
+        If all school years start after the date, the first one is
+        returned.
+        """
+        schoolyear = self._before(self.schoolyears, date)
+        if schoolyear is None:
+            schoolyear = self._after(self.schoolyears, date)
+        return schoolyear
+
+    def getTermForDate(self, date):
+        return self._containing(self.terms, date)
+
+    def getNextTermForDate(self, date):
+        """The term containing the date or the closest one after it.
+
+        Only terms of the last school year for the date are considered;
+        if none of them is on or after the date, the last one is returned.
+        """
+        schoolyear = self.getLastSchoolYearForDate(date)
+        if schoolyear is None:
+            return None
+        term = self.getTermForDate(date)
+        if term is not None:
+            return term
+        term = self._after(self.terms, date)
+        if term is not None and term.__parent__ is schoolyear:
+            return term
+        term = self._before(self.terms, date)
+        if term is not None and term.__parent__ is schoolyear:
+            return term
+        return None
+
+
+def getRequestDateCache():
+    """Cache of today and the current term for the current request."""
+    request = getRequestFromInteraction()
+    if request is None:
+        return None
+    return request.annotations.setdefault(DATE_CACHE_KEY, {})
+
+
+def clearRequestDateCache():
+    request = getRequestFromInteraction()
+    if request is not None:
+        request.annotations.pop(DATE_CACHE_KEY, None)
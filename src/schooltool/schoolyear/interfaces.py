@@ -18,7 +18,7 @@
 """
 School year implementation
 """
-from zope.interface import Interface
+from zope.interface import Interface, Attribute
 from zope.schema import Date, TextLine
 from zope.location.interfaces import ILocation
 from zope.container.interfaces import IWriteContainer
@@ -60,6 +60,12 @@ class ISchoolYearContainer(IContainer, ILocation):
     def getActiveSchoolYear():
         """Return the active schoolyear."""
 
+    date_index = Attribute(
+        """Date index of school years and their terms (DateIndex).""")
+
+    def updateDateIndex(exclude=()):
+        """Rebuild the date index, leaving out objects in exclude."""
+
 
 class ISubscriber(Interface):
     """An event handler implements this"""
@@ -28,6 +28,7 @@ from zope.component import adapts
 from zope.interface import implementer
 from zope.interface import implements
 from zope.container.btree import BTreeContainer
+from zope.lifecycleevent.interfaces import IObjectMovedEvent
 
 from schooltool.common import DateRange
 from schooltool.common import IDateRange
@@ -35,7 +36,10 @@ from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.app.app import InitBase
 from schooltool.term.interfaces import IDateManager
 from schooltool.term.interfaces import ITermContainer
+from schooltool.schoolyear.dateindex import DateIndex
+from schooltool.schoolyear.dateindex import clearRequestDateCache
 from schooltool.schoolyear.subscriber import EventAdapterSubscriber
+from schooltool.schoolyear.subscriber import ObjectEventAdapterSubscriber
 from schooltool.schoolyear.interfaces import TermOverflowError
 from schooltool.schoolyear.interfaces import TermOverlapError
 from schooltool.schoolyear.interfaces import SchoolYearOverlapError
@@ -66,6 +70,7 @@ class SchoolYearContainer(BTreeContainer):
     implements(ISchoolYearContainer)
 
     _active_id = None
+    _date_index = None
 
     def _set_active_id(self, new_id):
         if new_id is not None and new_id not in self:
@@ -114,28 +119,26 @@ class SchoolYearContainer(BTreeContainer):
                 year_id = next.__name__
         self._set_active_id(year_id)
 
+    @property
+    def date_index(self):
+        if self._date_index is None:
+            # Not stored yet, build a throwaway one.
+            index = DateIndex()
+            index.rebuild(self)
+            return index
+        return self._date_index
+
+    def updateDateIndex(self, exclude=()):
+        if self._date_index is None:
+            self._date_index = DateIndex()
+        self._date_index.rebuild(self, exclude=exclude)
+
     def getLastSchoolYearForDate(self, date):
-        before, after = [], []
-        for year in self.sorted_schoolyears:
-            if date in IDateRange(year):
-                return year
-            if date > year.last:
-                before.append((year.last, year))
-            if date < year.first:
-                after.append((year.first, year))
-        if before:
-            return max(before)[1]
-        if after:
-            return min(after)[1]
-        return None
+        return self.date_index.getLastSchoolYearForDate(date)
 
     def getSchoolYearForToday(self):
         dtm = queryUtility(IDateManager)
-        today = dtm.today
-        for year in self.sorted_schoolyears:
-            if today in IDateRange(year):
-                return year
-        return None
+        return self.date_index.getSchoolYearForDate(dtm.today)
 
     def getNextSchoolYear(self):
         if self.getActiveSchoolYear() is None:
@@ -294,6 +297,30 @@ class SchoolYearTermOverflowValidationSubscriber(EventAdapterSubscriber):
         validateScholYearForOverflow(dr, sy)
 
 
+def updateDateIndex(syc, exclude=()):
+    if ISchoolYearContainer.providedBy(syc):
+        syc.updateDateIndex(exclude=exclude)
+        clearRequestDateCache()
+
+
+class UpdateDateIndexOnSchoolYearMove(ObjectEventAdapterSubscriber):
+    adapts(IObjectMovedEvent, ISchoolYear)
+
+    def __call__(self):
+        if self.event.oldParent is not None:
+            updateDateIndex(self.event.oldParent, exclude=[self.object])
+        if self.event.newParent is not None:
+            updateDateIndex(self.event.newParent)
+
+
+class UpdateDateIndexOnSchoolYearChange(EventAdapterSubscriber):
+    adapts(SchoolYearAfterChangeEvent)
+    implements(ISubscriber)
+
+    def __call__(self):
+        updateDateIndex(self.event.schoolyear.__parent__)
+
+
 @adapter(datetime.date)
 @implementer(ITermContainer)
 def getTermContainerForDate(date):
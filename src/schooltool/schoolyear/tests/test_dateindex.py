@@ -0,0 +1,103 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for the school year and term date index
+"""
+import unittest
+import doctest
+from datetime import date
+
+from schooltool.term.term import Term
+from schooltool.schoolyear.schoolyear import SchoolYear
+
+
+def doctest_DateIndex():
+    """Tests for DateIndex.
+
+        >>> from schooltool.schoolyear.dateindex import DateIndex
+
+        >>> syc = {}
+        >>> year1 = syc['2005'] = SchoolYear('2005', date(2005, 9, 1),
+        ...                                  date(2006, 6, 30))
+        >>> year2 = syc['2006'] = SchoolYear('2006', date(2006, 9, 1),
+        ...                                  date(2007, 6, 30))
+        >>> fall = year1['fall'] = Term('Fall', date(2005, 9, 1),
+        ...                             date(2005, 12, 20))
+        >>> spring = year1['spring'] = Term('Spring', date(2006, 1, 10),
+        ...                                 date(2006, 5, 31))
+        >>> fall2 = year2['fall'] = Term('Fall', date(2006, 9, 5),
+        ...                              date(2006, 12, 20))
+
+        >>> index = DateIndex()
+        >>> index.rebuild(syc)
+
+        >>> def title(obj):
+        ...     print obj is not None and obj.title or None
+
+    Lookups of the school year or the term containing a date.
+
+        >>> title(index.getSchoolYearForDate(date(2006, 7, 1)))
+        None
+        >>> title(index.getSchoolYearForDate(date(2006, 9, 1)))
+        2006
+        >>> title(index.getTermForDate(date(2005, 12, 20)))
+        Fall
+        >>> title(index.getTermForDate(date(2005, 12, 21)))
+        None
+
+    Outside of school years, the last one before the date is used, or
+    the first one if there are none before.
+
+        >>> title(index.getLastSchoolYearForDate(date(2006, 8, 1)))
+        2005
+        >>> title(index.getLastSchoolYearForDate(date(2001, 1, 1)))
+        2005
+        >>> title(index.getLastSchoolYearForDate(date(2020, 1, 1)))
+        2006
+
+    Next term lookups stay within that school year.
+
+        >>> title(index.getNextTermForDate(date(2005, 12, 25)))
+        Spring
+        >>> title(index.getNextTermForDate(date(2006, 6, 15)))
+        Spring
+        >>> title(index.getNextTermForDate(date(2006, 9, 2)))
+        Fall
+        >>> index.getNextTermForDate(date(2006, 9, 2)) is fall2
+        True
+
+    Removed objects can be left out.
+
+        >>> index.rebuild(syc, exclude=[year2, spring])
+        >>> title(index.getNextTermForDate(date(2006, 9, 2)))
+        Fall
+        >>> index.getNextTermForDate(date(2006, 9, 2)) is fall
+        True
+
+        >>> print DateIndex().getNextTermForDate(date(2006, 9, 2))
+        None
+
+    """
+
+
+def test_suite():
+    return doctest.DocTestSuite(optionflags=doctest.ELLIPSIS)
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
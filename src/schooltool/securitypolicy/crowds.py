@@ -20,6 +20,7 @@ SchoolTool security policy crowds.
 """
 
 from zope.interface import implements
+from zope.security.management import queryInteraction
 from zope.security.proxy import removeSecurityProxy
 from zope.component import queryAdapter, queryMultiAdapter, queryUtility
 from zope.component import getGlobalSiteManager
@@ -187,9 +188,29 @@ class ConfigurableCrowd(Crowd):
         app = ISchoolToolApplication(None)
         return IAccessControlCustomisations(app)
 
+    def getSnapshot(self):
+        """Return the snapshot of settings.
+
+        Customisations are looked up once per interaction, their snapshot
+        is cached until they change.
+        """
+        interaction = queryInteraction()
+        participations = getattr(interaction, 'participations', None)
+        if not participations:
+            return self.settings.snapshot()
+        participation = participations[0]
+        settings = getattr(participation, '_st_access_settings', None)
+        if settings is None:
+            settings = self.settings
+            try:
+                participation._st_access_settings = settings
+            except AttributeError:
+                pass
+        return settings.snapshot()
+
     def contains(self, principal):
         """Return the value of the related setting (True or False)."""
-        return self.settings.get(self.setting_key)
+        return self.getSnapshot().get(self.setting_key)
 
 
 class EverybodyCrowd(Crowd):
@@ -18,16 +18,35 @@
 """
 Customisation for SchoolTool security policy.
 """
-
 from zope.interface import implements
 from zope.annotation.interfaces import IAnnotations
 from zope.component import subscribers
 from persistent import Persistent
 from persistent.dict import PersistentDict
+from schooltool.common.snapshot import SerialCache
 from schooltool.securitypolicy.interfaces import IAccessControlCustomisations
 from schooltool.securitypolicy.interfaces import IAccessControlSetting
 
 
+class SettingsSnapshot(object):
+    """Read only values of all access control settings."""
+
+    def __init__(self, values):
+        self._values = dict(values)
+
+    def get(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            raise KeyError("there is no AccessControlSetting"
+                           " associated with this key.")
+
+
+# Snapshots of stored customisations.
+_snapshots = SerialCache()
+clearSnapshots = _snapshots.clear
+
+
 class AccessControlCustomisations(Persistent):
     implements(IAccessControlCustomisations)
 
@@ -42,12 +61,29 @@ class AccessControlCustomisations(Persistent):
             raise KeyError("there is no AccessControlSetting"
                            " associated with this key.")
 
+    def buildSnapshot(self):
+        values = dict([(setting.key, setting.default) for setting in self])
+        for key, value in self._settings.items():
+            if key in values:
+                values[key] = value
+        return SettingsSnapshot(values)
+
+    def snapshot(self):
+        """Return a snapshot of the setting values.
+
+        Snapshots of committed customisations are cached by their
+        serial, so they are rebuilt only when a setting is changed.
+        """
+        return _snapshots.get(self, self.buildSnapshot)
+
     def get(self, key):
-        return self._settings.get(key, self.getSetting(key).default)
+        return self.snapshot().get(key)
 
     def set(self, key, value):
         if self.getSetting(key):
             self._settings[key] = value
+            # Bump our own serial so that cached snapshots get stale.
+            self._p_changed = True
 
     def __iter__(self):
         settings = subscribers([None], IAccessControlSetting)
@@ -72,6 +72,9 @@ class IAccessControlCustomisations(Interface):
     def set(key, value):
         """Set the value of a setting stored under the key."""
 
+    def snapshot():
+        """Return read only values of all settings, with a get(key) method."""
+
     def __iter__():
         """Iterate through all customisation settings."""
 
@@ -25,6 +25,8 @@ from zope.component import queryAdapter
 from zope.traversing.api import getParent
 from schooltool.securitypolicy.crowds import ICrowd
 from schooltool.securitypolicy.metaconfigure import getCrowdsUtility
+from schooltool.securitypolicy.profiler import getProfile, getProfiles
+from schooltool.securitypolicy.profiler import timer
 
 
 class SchoolToolSecurityPolicy(ParanoidSecurityPolicy):
@@ -113,18 +115,32 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
 
     def checkPermission(self, permission, obj):
         """Return True if principal has permission on object."""
+        profiles = getProfiles(self.participations)
+        if profiles:
+            start = timer()
 
         perm = self.checkCache(permission, obj)
-        if perm is not None:
-            return perm
-
-        perm = self.checkPermissionCrowds(permission, obj)
-        if perm is not None:
-            return perm
-
-        perm = self.checkByAdaptation(permission, obj)
+        cached = perm is not None
+        if not cached:
+            perm = self.checkPermissionCrowds(permission, obj)
+            if perm is None:
+                perm = self.checkByAdaptation(permission, obj)
+
+        if profiles:
+            seconds = timer() - start
+            for profile in profiles:
+                profile.addCheck(permission, seconds, cached)
         return perm
 
+    def crowdContains(self, crowd, participation):
+        profile = getProfile(participation)
+        if profile is None:
+            return crowd.contains(participation.principal)
+        start = timer()
+        result = crowd.contains(participation.principal)
+        profile.addCrowd(crowd, timer() - start)
+        return result
+
     def checkByAdaptation(self, permission, obj):
         crowd = queryAdapter(obj, ICrowd, name=permission, default=None)
         # If there is no crowd that has the given permission on this
@@ -137,8 +153,11 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
         if crowd is None: # no crowds found
             raise AssertionError('no crowd found for', obj, permission)
 
+        for profile in getProfiles(self.participations):
+            profile.addDepth(len(objects) - 1)
+
         for participation in self.participations:
-            if crowd.contains(participation.principal):
+            if self.crowdContains(crowd, participation):
                 for o in objects:
                     self.cache(participation, permission, o, True)
                 return True
@@ -157,7 +176,7 @@ class CachingSecurityPolicy(ParanoidSecurityPolicy):
         for participation in self.participations:
             for factory in factories:
                 crowd = factory(obj)
-                if crowd.contains(participation.principal):
+                if self.crowdContains(crowd, participation):
                     self.cache(participation, permission, obj, True)
                     return True
             self.cache(participation, permission, obj, False)
@@ -0,0 +1,159 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Security check profiler.
+
+When enabled, security checks of a sample of requests are counted and
+timed per permission, per crowd class and per parent walk depth of
+checks by adaptation.  The profile of each sampled request is logged
+when the request ends; in developer mode it is also shown on pages.
+"""
+import logging
+import random
+import time
+
+from zope.component import adapter
+from zope.publisher.interfaces import IEndRequestEvent
+
+
+log = logging.getLogger('schooltool.securitypolicy.profile')
+
+# Fraction of requests to profile, 0 disables the profiler.
+sample_rate = 0.0
+
+PROFILE_ATTR = '_st_security_profile'
+
+
+def setSampleRate(rate):
+    global sample_rate
+    sample_rate = max(0.0, min(float(rate or 0), 1.0))
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.time += seconds
+
+
+class SecurityProfile(object):
+    """Security checks of a request."""
+
+    def __init__(self):
+        self.checks = 0
+        self.hits = 0
+        self.misses = 0
+        self.time = 0.0
+        self.permissions = {}
+        self.crowds = {}
+        self.depths = {}
+
+    def addCheck(self, permission, seconds, cached):
+        self.checks += 1
+        if cached:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.time += seconds
+        self.permissions.setdefault(permission, Counter()).add(seconds)
+
+    def addCrowd(self, crowd, seconds):
+        name = crowd.__class__.__name__
+        self.crowds.setdefault(name, Counter()).add(seconds)
+
+    def addDepth(self, depth):
+        self.depths[depth] = self.depths.get(depth, 0) + 1
+
+    def top(self, counters, n=None):
+        """(name, Counter) pairs, most time consuming first."""
+        items = sorted(counters.items(),
+                       key=lambda item: -item[1].time)
+        if n is not None:
+            items = items[:n]
+        return items
+
+    def format(self, n=5):
+        """Summary of the profile in one line.
+
+            >>> profile = SecurityProfile()
+            >>> profile.addCheck('schooltool.view', 0.004, cached=False)
+            >>> profile.addCheck('schooltool.view', 0.001, cached=True)
+            >>> profile.addCheck('schooltool.edit', 0.002, cached=False)
+            >>> class LeaderCrowd(object):
+            ...     pass
+            >>> profile.addCrowd(LeaderCrowd(), 0.003)
+            >>> profile.addDepth(2)
+            >>> print profile.format() # doctest: +NORMALIZE_WHITESPACE
+            checks=3 hits=1 misses=2 time=7.0ms
+            permissions: schooltool.view=2/5.0ms schooltool.edit=1/2.0ms
+            crowds: LeaderCrowd=1/3.0ms depths: 2=1
+
+        """
+        def counters(items):
+            return ' '.join(['%s=%d/%.1fms' % (name, c.count, c.time * 1000)
+                             for name, c in items])
+        return ('checks=%d hits=%d misses=%d time=%.1fms'
+                ' permissions: %s crowds: %s depths: %s' % (
+                    self.checks, self.hits, self.misses, self.time * 1000,
+                    counters(self.top(self.permissions, n)),
+                    counters(self.top(self.crowds, n)),
+                    ' '.join(['%d=%d' % item
+                              for item in sorted(self.depths.items())])))
+
+
+def getProfile(participation):
+    """Profile of the participation, None if it is not profiled.
+
+    Whether a participation is profiled is decided on its first check.
+    """
+    if not sample_rate:
+        return None
+    profile = getattr(participation, PROFILE_ATTR, None)
+    if profile is None:
+        if random.random() < sample_rate:
+            profile = SecurityProfile()
+        else:
+            profile = False
+        try:
+            setattr(participation, PROFILE_ATTR, profile)
+        except AttributeError:
+            return None
+    return profile or None
+
+
+def getProfiles(participations):
+    if not sample_rate:
+        return ()
+    return filter(None, [getProfile(p) for p in participations])
+
+
+timer = time.time
+
+
+@adapter(IEndRequestEvent)
+def logRequestProfile(event):
+    request = event.request
+    profile = getattr(request, PROFILE_ATTR, None)
+    if not profile:
+        return
+    url = getattr(request, 'getURL', lambda: '')()
+    log.info("%s %s", url, profile.format())
@@ -125,6 +125,8 @@ def doctest_ConfigurableCrowd():
         >>> setup.placelessSetUp()
         >>> class CustomisationsStub(object):
         ...     implements(IAccessControlCustomisations)
+        ...     def snapshot(self):
+        ...         return self
         ...     def get(self, key):
         ...         print 'Getting %s' % key
         ...         return True
@@ -133,6 +135,7 @@ def doctest_ConfigurableCrowd():
         ...     implements(ISchoolToolApplication)
         ...     def __conform__(self, iface):
         ...         if iface == IAccessControlCustomisations:
+        ...             print 'Looking up customisations'
         ...             return CustomisationsStub()
 
         >>> from zope.component import provideAdapter
@@ -147,9 +150,26 @@ def doctest_ConfigurableCrowd():
         >>> crowd = ConfigurableCrowd(object())
         >>> crowd.setting_key = 'key'
         >>> crowd.contains(object())
+        Looking up customisations
         Getting key
         True
 
+    Within an interaction customisations are looked up once.
+
+        >>> from zope.publisher.browser import TestRequest
+        >>> from zope.security.management import newInteraction
+        >>> from zope.security.management import endInteraction
+        >>> endInteraction()
+        >>> newInteraction(TestRequest())
+        >>> crowd.contains(object())
+        Looking up customisations
+        Getting key
+        True
+        >>> ConfigurableCrowd(object()).contains(object())
+        Getting None
+        True
+        >>> endInteraction()
+
     Clean up:
 
         >>> setup.placelessTearDown()
@@ -22,6 +22,15 @@ Tests for customisation of SchoolTool security policy.
 import unittest
 import doctest
 
+from zope.component.testing import setUp, tearDown
+
+from schooltool.securitypolicy.customisation import clearSnapshots
+
+
+def tearDownSnapshots(test):
+    clearSnapshots()
+    tearDown(test)
+
 
 def doctest_AccessControlCustomisations():
     r"""Tests for AccessControlCustomisations.
@@ -96,6 +105,70 @@ def doctest_AccessControlCustomisations():
     """
 
 
+def doctest_AccessControlCustomisations_snapshot():
+    r"""Tests for AccessControlCustomisations.snapshot.
+
+        >>> from zope.component import provideSubscriptionAdapter
+        >>> from schooltool.securitypolicy.interfaces import IAccessControlSetting
+        >>> class SettingStub(object):
+        ...     def __init__(self, key, default=False):
+        ...         self.default = default
+        ...         self.key = key
+        >>> provideSubscriptionAdapter(lambda c: SettingStub('key1', True),
+        ...                            adapts=[None],
+        ...                            provides=IAccessControlSetting)
+
+        >>> from schooltool.securitypolicy.customisation import AccessControlCustomisations
+        >>> customisations = AccessControlCustomisations()
+
+    Customisations that are not stored in the database get a fresh
+    snapshot every time.
+
+        >>> snapshot = customisations.snapshot()
+        >>> snapshot.get('key1')
+        True
+        >>> customisations.snapshot() is snapshot
+        False
+
+    Once committed, the snapshot is shared until a setting is changed.
+
+        >>> import transaction
+        >>> from ZODB.DB import DB
+        >>> from ZODB.MappingStorage import MappingStorage
+        >>> db = DB(MappingStorage())
+        >>> connection = db.open()
+        >>> connection.root()['customisations'] = customisations
+        >>> transaction.commit()
+
+        >>> snapshot = customisations.snapshot()
+        >>> customisations.snapshot() is snapshot
+        True
+
+        >>> other = db.open()
+        >>> other.root()['customisations'].snapshot() is snapshot
+        True
+
+        >>> customisations.set('key1', False)
+        >>> customisations.get('key1')
+        False
+        >>> transaction.commit()
+
+        >>> new_snapshot = customisations.snapshot()
+        >>> new_snapshot is snapshot
+        False
+        >>> new_snapshot.get('key1')
+        False
+        >>> customisations.snapshot() is new_snapshot
+        True
+
+        >>> transaction.abort()
+        >>> other.close()
+        >>> connection.close()
+        >>> db.close()
+
+    """
+
+
 def doctest_getAccessControlCustomisations():
     """Tests for getAccessControlCustomisations.
 
@@ -132,5 +205,6 @@ def doctest_getAccessControlCustomisations():
 
 def test_suite():
     return unittest.TestSuite([
-            doctest.DocTestSuite(optionflags=doctest.ELLIPSIS |
+            doctest.DocTestSuite(setUp=setUp, tearDown=tearDownSnapshots,
+                                 optionflags=doctest.ELLIPSIS |
                                              doctest.NORMALIZE_WHITESPACE)])
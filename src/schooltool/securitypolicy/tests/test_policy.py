@@ -197,6 +197,57 @@ def test_SchoolToolSecurityPolicy_checkCrowds():
     """
 
 
+def test_CachingSecurityPolicy_profile():
+    """Tests for security check profiling of CachingSecurityPolicy.
+
+        >>> from schooltool.securitypolicy.crowds import CrowdsUtility
+        >>> from schooltool.securitypolicy.interfaces import ICrowdsUtility
+        >>> provideUtility(CrowdsUtility(), ICrowdsUtility)
+
+        >>> class ObjCrowd(Crowd):
+        ...     adapts(IObj)
+        ...     def contains(self, principal):
+        ...         return True
+        >>> provideAdapter(ObjCrowd, (IObj,), ICrowd, 'perm')
+
+        >>> obj = Obj()
+        >>> child = AnotherObj()
+        >>> child.__parent__ = obj
+
+        >>> from schooltool.securitypolicy import policy, profiler
+        >>> participation = ParticipationStub()
+        >>> sp = policy.CachingSecurityPolicy(participation)
+
+    The profiler is off by default.
+
+        >>> sp.checkPermission('perm', child)
+        True
+        >>> print profiler.getProfile(participation)
+        None
+
+    Once enabled, checks of sampled participations are recorded.
+
+        >>> profiler.setSampleRate(1)
+        >>> sp.checkPermission('perm', child)
+        True
+        >>> sp.checkPermission('perm', obj)
+        True
+
+        >>> profile = profiler.getProfile(participation)
+        >>> profile.checks, profile.hits, profile.misses
+        (2, 0, 2)
+        >>> profile.permissions['perm'].count
+        2
+        >>> profile.crowds['ObjCrowd'].count
+        2
+        >>> sorted(profile.depths.items())
+        [(0, 1), (1, 1)]
+
+        >>> profiler.setSampleRate(0)
+
+    """
+
+
 def setUp(test=None):
     setup.placelessSetUp()
 
@@ -208,4 +259,5 @@ def test_suite():
     return unittest.TestSuite([
             doctest.DocTestSuite(optionflags=doctest.ELLIPSIS,
                                  setUp=setUp, tearDown=tearDown),
+            doctest.DocTestSuite('schooltool.securitypolicy.profiler'),
            ])
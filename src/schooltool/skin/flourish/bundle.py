@@ -0,0 +1,434 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Bundled resource libraries.
+
+Consecutive static resource libraries included in a page are
+concatenated and minified into one JavaScript and one CSS bundle each.
+Bundles are named by a hash of their content, so they can be served
+with far-future cache headers, and are kept gzipped as well.  Bundles
+are built on first use and kept in memory for the life of the process.
+Bundle URLs name the libraries of the bundle, so a process that has not
+built a bundle yet (i.e. after a restart) builds it when it is requested.
+
+Libraries that select their files per request (IResourceLibrary
+adapters) and libraries listed in `unbundled` are included file by
+file, as zc.resourcelibrary does.
+"""
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import time
+from StringIO import StringIO
+from email.utils import formatdate
+
+import zc.resourcelibrary
+import zc.resourcelibrary.publication
+from zope.browserresource.file import setCacheControl
+from zope.browserresource.resource import Resource
+from zope.component import queryAdapter
+from zope.component.hooks import getSite
+from zope.interface import implements, Interface
+from zope.publisher.browser import BrowserView
+from zope.publisher.interfaces import NotFound
+from zope.publisher.interfaces.browser import IBrowserPublisher
+from zope.publisher.interfaces.http import MethodNotAllowed
+
+from schooltool.skin.flourish.resource import IResourceLibrary
+
+try:
+    from rjsmin import jsmin
+except ImportError:
+    jsmin = None
+
+
+BUNDLES_RESOURCE = 'schooltool.bundles'
+
+# One year, bundle names change with their content.
+CACHE_TIMEOUT = 365 * 24 * 60 * 60
+
+CONTENT_TYPES = {
+    '.js': 'text/javascript',
+    '.css': 'text/css',
+    }
+
+# Libraries that must be loaded from their own location, i.e. because
+# they find the rest of their files relative to the script URL.
+unbundled = set(['ckeditor', 'fckeditor'])
+
+# Bundle name -> Bundle
+bundles = {}
+
+# Tuple of library names -> list of bundle names, or None if the
+# libraries can not be bundled.
+_library_bundles = {}
+
+# Library tuples that were bundled because a bundle of them was requested,
+# not because a page included them.  Their number is limited, so that
+# made up URLs do not fill the memory with bundles.
+_requested_libraries = set()
+MAX_REQUESTED_LIBRARY_SETS = 100
+
+
+class Bundle(object):
+
+    def __init__(self, data, extension):
+        self.data = data
+        self.digest = hashlib.sha1(data).hexdigest()[:16]
+        self.__name__ = self.digest + extension
+        self.content_type = CONTENT_TYPES[extension]
+        buf = StringIO()
+        gz = gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0)
+        gz.write(data)
+        gz.close()
+        self.gzipped = buf.getvalue()
+        self.lmt = time.time()
+        self.lmh = formatdate(self.lmt, usegmt=True)
+
+
+_css_token_re = re.compile(
+    r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)''', re.DOTALL)
+_css_blank_re = re.compile(r'\s+')
+_css_space_re = re.compile(r'\s*([{};,])\s*')
+_css_charset_re = re.compile(r'@charset\s+[^;]+;')
+_css_url_re = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minifyCSS(css):
+    """Strip comments and redundant white space from a style sheet.
+
+        >>> print minifyCSS('''
+        ...     /* Links */
+        ...     a:hover,  a.active {
+        ...         color: red;
+        ...         font-weight: bold;
+        ...     }
+        ... ''')
+        a:hover,a.active{color: red;font-weight: bold}
+
+    String literals are left alone.
+
+        >>> print minifyCSS('''
+        ...     q:before { content: "  /* { */  " ; }
+        ...     p { font-family: 'A  B', serif; }
+        ... ''')
+        q:before{content: "  /* { */  "}p{font-family: 'A  B',serif}
+
+    """
+    # Even items are CSS, odd ones string literals.
+    parts = ['']
+    for n, token in enumerate(_css_token_re.split(css)):
+        if not n % 2:
+            parts[-1] += token
+        elif token.startswith('/*'):
+            parts[-1] += ' '
+        else:
+            parts.extend([token, ''])
+    for n in range(0, len(parts), 2):
+        text = _css_blank_re.sub(' ', parts[n])
+        text = _css_space_re.sub(r'\1', text)
+        parts[n] = text.replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+def minifyJS(script):
+    if jsmin is None:
+        return script
+    return jsmin(script)
+
+
+def rewriteCSSURLs(css, library, file_name):
+    """Make relative URLs of a library style sheet work from a bundle.
+
+    Bundles are served two levels below resource libraries, so
+    relative URLs are rewritten to point into the library.
+
+        >>> print rewriteCSSURLs(
+        ...     'a {background: url("images/a.png")}\\n'
+        ...     'b {background: url(../b.png)}\\n'
+        ...     'c {background: url(/c.png)}\\n'
+        ...     'd {background: url(data:image/png;base64,AAA=)}',
+        ...     'lib', 'css/style.css')
+        a {background: url("../../lib/css/images/a.png")}
+        b {background: url("../../lib/b.png")}
+        c {background: url(/c.png)}
+        d {background: url(data:image/png;base64,AAA=)}
+
+    """
+    base = posixpath.join('..', '..', library, posixpath.dirname(file_name))
+
+    def rewrite(match):
+        url = match.group(2).strip()
+        if (url.startswith('/') or url.startswith('#') or
+            url.startswith('data:') or '://' in url):
+            return match.group(0)
+        return 'url("%s")' % posixpath.normpath(posixpath.join(base, url))
+
+    return _css_url_re.sub(rewrite, css)
+
+
+def getLibraryDirectory(request, name):
+    """Directory with the files of a static resource library, if any."""
+    resource = queryAdapter(request, Interface, name=name)
+    directory = getattr(resource, 'context', None)
+    return getattr(directory, 'path', None)
+
+
+def isBundled(request, name):
+    if name in unbundled:
+        return False
+    if queryAdapter(request, IResourceLibrary, name=name) is not None:
+        # Dynamic flourish library.
+        return False
+    return getLibraryDirectory(request, name) is not None
+
+
+def readLibraries(request, libraries):
+    """Read files of libraries, return {extension: [data]}.
+
+    Returns None if any of the libraries can not be bundled.
+    """
+    parts = dict([(extension, []) for extension in CONTENT_TYPES])
+    for library in libraries:
+        path = getLibraryDirectory(request, library)
+        if path is None:
+            return None
+        for file_name in zc.resourcelibrary.getIncluded(library):
+            extension = os.path.splitext(file_name)[1]
+            if extension not in parts:
+                return None
+            try:
+                with open(os.path.join(path, file_name), 'rb') as f:
+                    data = f.read()
+            except IOError:
+                return None
+            if extension == '.css':
+                if '@import' in data:
+                    # Imports are only allowed at the start of a style sheet.
+                    return None
+                data = _css_charset_re.sub('', data)
+                data = rewriteCSSURLs(data, library, file_name)
+                data = minifyCSS(data)
+            else:
+                data = minifyJS(data)
+            parts[extension].append(data)
+    return parts
+
+
+def buildBundles(request, libraries):
+    """Build bundles of the libraries, None if they can't be bundled."""
+    parts = readLibraries(request, libraries)
+    if parts is None:
+        return None
+    result = []
+    for extension, separator in (('.css', '\n'), ('.js', ';\n')):
+        if parts[extension]:
+            result.append(
+                Bundle(separator.join(parts[extension]), extension))
+    return result
+
+
+def registerBundles(libraries, built):
+    names = None
+    if built is not None:
+        names = [bundles.setdefault(bundle.__name__, bundle).__name__
+                 for bundle in built]
+    _library_bundles[libraries] = names
+    return names
+
+
+def getBundles(request, libraries):
+    """Names of bundles of the libraries, None if they can't be bundled."""
+    libraries = tuple(libraries)
+    if libraries in _library_bundles:
+        return _library_bundles[libraries]
+    return registerBundles(libraries, buildBundles(request, libraries))
+
+
+def findBundle(request, libraries, name):
+    """Return the named bundle of the libraries, None if there is none.
+
+    Only bundles that getBundles names for the libraries are found.
+    Libraries this process has not bundled yet, i.e. after a restart,
+    are bundled once, and the result is kept even if the name does not
+    match.
+    """
+    libraries = tuple(libraries)
+    if libraries not in _library_bundles:
+        if (not libraries or len(set(libraries)) < len(libraries) or
+            len(_requested_libraries) >= MAX_REQUESTED_LIBRARY_SETS):
+            return None
+        for library in libraries:
+            if not isBundled(request, library):
+                return None
+        _requested_libraries.add(libraries)
+    names = getBundles(request, libraries)
+    if not names or name not in names:
+        return None
+    return bundles[name]
+
+
+def clearBundles():
+    bundles.clear()
+    _library_bundles.clear()
+    _requested_libraries.clear()
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:
+    pass
+else:
+    addCleanUp(clearBundles)
+    del addCleanUp
+
+
+class Response(zc.resourcelibrary.publication.Response):
+    """Response that includes static resource libraries as bundles."""
+
+    def _generateBundleIncludes(self, libraries):
+        names = getBundles(self._request, libraries)
+        if names is None:
+            return self._generateIncludes(libraries, bundle=False)
+        resource = queryAdapter(self._request, Interface,
+                                name=BUNDLES_RESOURCE)
+        base = '%s/%s' % (resource(), ','.join(libraries))
+        html = []
+        for name in names:
+            url = '%s/%s' % (base, name)
+            if name.endswith('.js'):
+                html.append('<script src="%s" ' % url)
+                html.append('    type="text/javascript">')
+                html.append('</script>')
+            else:
+                html.append('<link rel="stylesheet" type="text/css" '
+                            'media="all" href="%s" />' % url)
+        return '\n    '.join(html)
+
+    def _generateIncludes(self, libraries, bundle=True):
+        parent = super(Response, self)._generateIncludes
+        if not bundle or getSite() is None:
+            return parent(libraries)
+        html = []
+        run = []
+        for library in libraries:
+            if isBundled(self._request, library):
+                run.append(library)
+                continue
+            if run:
+                html.append(self._generateBundleIncludes(run))
+                run = []
+            html.append(parent([library]))
+        if run:
+            html.append(self._generateBundleIncludes(run))
+        return '\n    '.join(filter(None, html))
+
+
+class Request(zc.resourcelibrary.publication.Request):
+    """Browser request that bundles resource libraries."""
+
+    def _createResponse(self):
+        response = Response()
+        self.resource_libraries = response.resource_libraries = []
+        return response
+
+
+class BundleFile(BrowserView):
+    implements(IBrowserPublisher)
+
+    def publishTraverse(self, request, name):
+        raise NotFound(self, name, request)
+
+    def browserDefault(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            raise MethodNotAllowed(self.context, request)
+        return getattr(self, request.method), ()
+
+    def acceptsGzip(self):
+        accepted = self.request.getHeader('Accept-Encoding', '')
+        return 'gzip' in [encoding.split(';')[0].strip()
+                          for encoding in accepted.split(',')]
+
+    def setUpResponse(self):
+        bundle = self.context
+        response = self.request.response
+        response.setHeader('Content-Type', bundle.content_type)
+        response.setHeader('Last-Modified', bundle.lmh)
+        response.setHeader('ETag', '"%s"' % bundle.digest)
+        response.setHeader('Vary', 'Accept-Encoding')
+        setCacheControl(response, CACHE_TIMEOUT)
+
+    def notModified(self):
+        header = self.request.getHeader('If-None-Match')
+        if not header:
+            return False
+        tags = [tag.strip() for tag in header.split(',')]
+        # Weak comparison, as If-None-Match asks for.
+        tags = [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+        return '*' in tags or '"%s"' % self.context.digest in tags
+
+    def GET(self):
+        bundle = self.context
+        response = self.request.response
+        self.setUpResponse()
+        if self.notModified():
+            response.setStatus(304)
+            return ''
+        if self.acceptsGzip():
+            response.setHeader('Content-Encoding', 'gzip')
+            data = bundle.gzipped
+        else:
+            data = bundle.data
+        return data
+
+    def HEAD(self):
+        self.setUpResponse()
+        return ''
+
+
+class BundleResource(Resource):
+    """The @@/schooltool.bundles resource.
+
+    Bundles are published as @@/schooltool.bundles/<libraries>/<name>,
+    where libraries is a comma separated list of library names.
+    """
+    implements(IBrowserPublisher)
+
+    __name__ = BUNDLES_RESOURCE
+
+    libraries = None
+
+    def publishTraverse(self, request, name):
+        if self.libraries is None:
+            resource = BundleResource(request)
+            resource.libraries = tuple(filter(None, name.split(',')))
+            resource.__parent__ = self
+            resource.__name__ = name
+            return resource
+        bundle = findBundle(request, self.libraries, name)
+        if bundle is None:
+            raise NotFound(self, name, request)
+        view = BundleFile(bundle, request)
+        view.__parent__ = self
+        view.__name__ = name
+        return view
+
+    def browserDefault(self, request):
+        raise NotFound(self, '', request)
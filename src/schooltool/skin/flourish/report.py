@@ -145,6 +145,42 @@ class PDFPage(page.PageBase):
         return data
 
 
+class ChunkedReportMixin(object):
+    """Bulk report that can be rendered in chunks.
+
+    The report task splits the keys returned by getChunkKeys into
+    chunks of chunk_size, renders each chunk separately with
+    report_chunk set to the chunk keys, and concatenates the PDFs.
+    Reports that do not set chunkable, or whose getChunkKeys returns
+    None, are rendered in one piece.
+    """
+
+    chunkable = False
+    chunk_size = 200
+    report_chunk = None
+
+    def getChunkKeys(self):
+        """Return an ordered list of keys of all items in the report."""
+        raise NotImplementedError('do this in subclass')
+
+    def getReportChunks(self):
+        if not self.chunkable:
+            return None
+        keys = self.getChunkKeys()
+        if keys is None:
+            return None
+        keys = list(keys)
+        size = self.chunk_size
+        if not size:
+            return [keys]
+        return [keys[n:n+size] for n in range(0, len(keys), size)]
+
+    def inChunk(self, key):
+        if self.report_chunk is None:
+            return True
+        return key in self.report_chunk
+
+
 class IPlainPDFPage(interfaces.IPDFPage):
 
     message_title = zope.schema.TextLine(
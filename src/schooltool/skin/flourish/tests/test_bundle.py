@@ -0,0 +1,242 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for resource library bundles.
+"""
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+import doctest
+from StringIO import StringIO
+
+from zope.app.testing import setup
+from zope.component import provideAdapter
+from zope.interface import Interface
+from zope.publisher.browser import TestRequest
+from zope.publisher.interfaces.browser import IBrowserRequest
+from zc.resourcelibrary.resourcelibrary import LibraryInfo, library_info
+
+
+class DirectoryStub(object):
+
+    def __init__(self, path):
+        self.path = path
+
+
+class DirectoryResourceStub(object):
+
+    def __init__(self, path):
+        self.context = DirectoryStub(path)
+
+
+def addLibrary(tempdir, name, files):
+    path = os.path.join(tempdir, name)
+    os.mkdir(path)
+    for file_name, data in files.items():
+        with open(os.path.join(path, file_name), 'w') as f:
+            f.write(data)
+    library_info[name] = LibraryInfo()
+    library_info[name].included.extend(sorted(files))
+    provideAdapter(lambda request: DirectoryResourceStub(path),
+                   (IBrowserRequest, ), Interface, name=name)
+
+
+def doctest_getBundles():
+    """Tests for getBundles.
+
+        >>> from schooltool.skin.flourish.bundle import getBundles, bundles
+
+        >>> addLibrary(tempdir, 'base', {
+        ...     'base.js': 'var base = 1;',
+        ...     'base.css': 'body { background: url(bg.png); }'})
+        >>> addLibrary(tempdir, 'page', {
+        ...     'page.js': 'var page = base + 1;'})
+
+    Files of the libraries are combined into one bundle per type.
+
+        >>> request = TestRequest()
+        >>> names = getBundles(request, ['base', 'page'])
+        >>> names
+        ['....css', '....js']
+
+        >>> print bundles[names[0]].data
+        body{background: url("../../base/bg.png")}
+        >>> print bundles[names[1]].data
+        var base = 1;;
+        var page = base + 1;
+
+        >>> bundles[names[1]].content_type
+        'text/javascript'
+        >>> gzip.GzipFile(
+        ...     fileobj=StringIO(bundles[names[1]].gzipped)).read() == (
+        ...     bundles[names[1]].data)
+        True
+
+    Libraries without a directory are not bundled.
+
+        >>> print getBundles(request, ['base', 'missing'])
+        None
+
+    """
+
+
+def doctest_BundleFile():
+    """Tests for BundleFile.
+
+        >>> from schooltool.skin.flourish.bundle import Bundle, BundleFile
+
+        >>> bundle = Bundle('alert(1);', '.js')
+        >>> request = TestRequest()
+        >>> BundleFile(bundle, request).GET()
+        'alert(1);'
+        >>> request.response.getHeader('Cache-Control')
+        'public,max-age=31536000'
+        >>> request.response.getHeader('ETag') == '"%s"' % bundle.digest
+        True
+
+    Clients that accept gzip get the compressed variant.
+
+        >>> request = TestRequest(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        >>> BundleFile(bundle, request).GET() == bundle.gzipped
+        True
+        >>> request.response.getHeader('Content-Encoding')
+        'gzip'
+
+    Clients that have the bundle get a 304.
+
+        >>> def get(if_none_match):
+        ...     request = TestRequest(HTTP_IF_NONE_MATCH=if_none_match)
+        ...     data = BundleFile(bundle, request).GET()
+        ...     return request.response.getStatus() == 304, len(data)
+        >>> etag = '"%s"' % bundle.digest
+        >>> get(etag)
+        (True, 0)
+        >>> get('"other", W/%s' % etag)
+        (True, 0)
+        >>> get('*')
+        (True, 0)
+
+    ETags are compared whole.
+
+        >>> get('"x%s"' % bundle.digest)
+        (False, 9)
+        >>> get(bundle.digest)
+        (False, 9)
+
+    Other methods are not allowed.
+
+        >>> request = TestRequest()
+        >>> request.method = 'POST'
+        >>> BundleFile(bundle, request).browserDefault(request)
+        Traceback (most recent call last):
+          ...
+        MethodNotAllowed: ...
+
+    """
+
+
+def doctest_BundleResource():
+    """Tests for BundleResource.
+
+        >>> from schooltool.skin.flourish.bundle import BundleResource
+        >>> from schooltool.skin.flourish.bundle import getBundles
+        >>> from schooltool.skin.flourish.bundle import clearBundles
+
+        >>> addLibrary(tempdir, 'base', {'base.js': 'var base = 1;'})
+        >>> addLibrary(tempdir, 'page', {'page.js': 'var page = 2;'})
+
+        >>> request = TestRequest()
+        >>> [name] = getBundles(request, ['base', 'page'])
+
+    Bundles are traversed through the names of their libraries.
+
+        >>> resource = BundleResource(request)
+        >>> libraries = resource.publishTraverse(request, 'base,page')
+        >>> libraries.libraries
+        ('base', 'page')
+        >>> view = libraries.publishTraverse(request, name)
+        >>> print view.GET()
+        var base = 1;;
+        var page = 2;
+
+    A process that did not build the bundle, i.e. after a restart,
+    builds it from the libraries.
+
+        >>> clearBundles()
+        >>> view = libraries.publishTraverse(request, name)
+        >>> print view.GET()
+        var base = 1;;
+        var page = 2;
+
+    Bundles whose libraries changed since are gone.
+
+        >>> clearBundles()
+        >>> libraries = resource.publishTraverse(request, 'page,base')
+        >>> libraries.publishTraverse(request, name)
+        Traceback (most recent call last):
+          ...
+        NotFound: Object: ..., name: '....js'
+
+        >>> libraries = resource.publishTraverse(request, 'base,missing')
+        >>> libraries.publishTraverse(request, name)
+        Traceback (most recent call last):
+          ...
+        NotFound: Object: ..., name: '....js'
+
+    Libraries are bundled once, also when the name does not match.
+
+        >>> from schooltool.skin.flourish import bundle
+        >>> bundle._library_bundles
+        {('page', 'base'): ['....js']}
+
+    The number of library sets bundled on request is limited.
+
+        >>> bundle.MAX_REQUESTED_LIBRARY_SETS = 1
+        >>> libraries = resource.publishTraverse(request, 'base,page')
+        >>> libraries.publishTraverse(request, name)
+        Traceback (most recent call last):
+          ...
+        NotFound: Object: ..., name: '....js'
+        >>> bundle.MAX_REQUESTED_LIBRARY_SETS = 100
+
+    """
+
+
+def setUp(test):
+    setup.placelessSetUp()
+    test.globs['tempdir'] = tempfile.mkdtemp()
+
+
+def tearDown(test):
+    shutil.rmtree(test.globs['tempdir'])
+    setup.placelessTearDown()
+
+
+def test_suite():
+    optionflags = doctest.ELLIPSIS | doctest.NORMALIZE_WHITESPACE
+    return unittest.TestSuite([
+        doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                             optionflags=optionflags),
+        doctest.DocTestSuite('schooltool.skin.flourish.bundle'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
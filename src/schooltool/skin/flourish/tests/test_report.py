@@ -22,6 +22,7 @@ import unittest
 from textwrap import dedent
 
 from schooltool.skin.flourish.report import buildHTMLParagraphs
+from schooltool.skin.flourish.report import ChunkedReportMixin
 from schooltool.testing.util import NiceDiffsMixin
 
 
@@ -79,5 +80,40 @@ class TestBuildHTMLParagraphs(NiceDiffsMixin, unittest.TestCase):
                          ['&lt;ul&gt;&lt;li&gt;One&lt;/li&gt;&lt;li&gt;Two&lt;/li&gt;&lt;/ul&gt;'])
 
 
+class ChunkedReportStub(ChunkedReportMixin):
+
+    chunkable = True
+    chunk_size = 3
+
+    def getChunkKeys(self):
+        return ['a', 'b', 'c', 'd', 'e', 'f', 'g']
+
+
+class TestChunkedReportMixin(unittest.TestCase):
+
+    def test_getReportChunks(self):
+        report = ChunkedReportStub()
+        self.assertEqual(report.getReportChunks(),
+                         [['a', 'b', 'c'], ['d', 'e', 'f'], ['g']])
+        report.chunk_size = None
+        self.assertEqual(report.getReportChunks(),
+                         [['a', 'b', 'c', 'd', 'e', 'f', 'g']])
+        report.chunkable = False
+        self.assertEqual(report.getReportChunks(), None)
+
+    def test_getReportChunks_not_chunked(self):
+        report = ChunkedReportStub()
+        report.getChunkKeys = lambda: None
+        self.assertEqual(report.getReportChunks(), None)
+
+    def test_inChunk(self):
+        report = ChunkedReportStub()
+        self.assertTrue(report.inChunk('a'))
+        self.assertTrue(report.inChunk('g'))
+        report.report_chunk = ['d', 'e', 'f']
+        self.assertFalse(report.inChunk('a'))
+        self.assertTrue(report.inChunk('e'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,136 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tests for flourish file downloads.
+"""
+import unittest
+import doctest
+from StringIO import StringIO
+
+from zope.publisher.browser import TestRequest
+
+from persistent import Persistent
+
+from schooltool.skin.flourish.widgets import DownloadFile, fileETag
+
+
+class FileStub(object):
+
+    __name__ = 'report.pdf'
+    mimeType = 'application/pdf'
+    etag = '"abc"'
+
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+
+    def openDetached(self):
+        return StringIO(self.data)
+
+
+class TestFileETag(unittest.TestCase):
+
+    def test_persistent(self):
+        stored_file = Persistent()
+        self.assertEqual(fileETag(stored_file), None)
+        stored_file._p_oid = '\0' * 7 + '\1'
+        stored_file._p_serial = '\0' * 7 + '\5'
+        self.assertEqual(fileETag(stored_file),
+                         '"0000000000000001-0000000000000005"')
+
+    def test_own_etag(self):
+        self.assertEqual(fileETag(FileStub('')), '"abc"')
+
+
+class TestDownloadFile(unittest.TestCase):
+
+    data = ''.join([chr(ord('a') + n % 26) for n in range(1000)])
+
+    def download(self, **headers):
+        request = TestRequest(environ=headers)
+        view = DownloadFile(FileStub(self.data), request)
+        result = view()
+        if not isinstance(result, str):
+            result = ''.join(result)
+        return request.response, result
+
+    def test_full(self):
+        response, body = self.download()
+        self.assertEqual(response.getHeader('Content-Range'), None)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response.getHeader('Content-Length'), '1000')
+        self.assertEqual(response.getHeader('Accept-Ranges'), 'bytes')
+        self.assertEqual(response.getHeader('ETag'), '"abc"')
+
+    def test_not_modified(self):
+        response, body = self.download(HTTP_IF_NONE_MATCH='"xyz", "abc"')
+        self.assertEqual(response.getStatus(), 304)
+        self.assertEqual(body, '')
+
+    def test_single_range(self):
+        response, body = self.download(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.getStatus(), 206)
+        self.assertEqual(body, self.data[10:20])
+        self.assertEqual(response.getHeader('Content-Range'),
+                         'bytes 10-19/1000')
+        self.assertEqual(response.getHeader('Content-Length'), '10')
+
+    def test_multiple_ranges(self):
+        response, body = self.download(HTTP_RANGE='bytes=0-1,-3')
+        self.assertEqual(response.getStatus(), 206)
+        content_type = response.getHeader('Content-Type')
+        self.assertTrue(
+            content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('=')[1]
+        self.assertEqual(body, (
+            '--%(b)s\r\n'
+            'Content-Type: application/pdf\r\n'
+            'Content-Range: bytes 0-1/1000\r\n'
+            '\r\n'
+            'ab\r\n'
+            '--%(b)s\r\n'
+            'Content-Type: application/pdf\r\n'
+            'Content-Range: bytes 997-999/1000\r\n'
+            '\r\n'
+            'jkl\r\n'
+            '--%(b)s--\r\n') % {'b': boundary})
+        self.assertEqual(response.getHeader('Content-Length'),
+                         str(len(body)))
+
+    def test_unsatisfiable_range(self):
+        response, body = self.download(HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.getStatus(), 416)
+        self.assertEqual(response.getHeader('Content-Range'), 'bytes */1000')
+
+    def test_if_range_mismatch(self):
+        response, body = self.download(HTTP_RANGE='bytes=10-19',
+                                       HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.getHeader('Content-Range'), None)
+        self.assertEqual(body, self.data)
+
+
+def test_suite():
+    suite = unittest.TestSuite()
+    suite.addTest(doctest.DocTestSuite('schooltool.skin.flourish.widgets'))
+    suite.addTest(unittest.makeSuite(TestFileETag))
+    suite.addTest(unittest.makeSuite(TestDownloadFile))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
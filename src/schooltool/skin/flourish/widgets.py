@@ -19,9 +19,11 @@
 SchoolTool flourish widgets.
 """
 import time, datetime
+import binascii
 import re
 import os
 import sys
+import uuid
 from cStringIO import StringIO
 
 try:
@@ -31,6 +33,7 @@ except ImportError:
 
 import zope.formlib.widgets
 import zope.datetime
+from ZODB.interfaces import BlobError
 from zope.component import getUtility, adapter, adapts, queryMultiAdapter
 from zope.dublincore.interfaces import IZopeDublinCore
 from zope.interface import implementer, Interface, implements
@@ -39,7 +42,9 @@ from zope.traversing.browser.absoluteurl import absoluteURL
 from zope.publisher.interfaces import NotFound
 from zope.publisher.browser import BrowserPage
 from zope.publisher.browser import BrowserView
+from zope.publisher.interfaces.http import IResult
 from zope.schema.interfaces import IField
+from zope.security.proxy import removeSecurityProxy
 
 import z3c.form.interfaces
 from z3c.form.browser.file import FileWidget
@@ -58,6 +63,7 @@ from schooltool.skin.flourish.resource import ResourceLibrary
 from schooltool.skin.flourish.interfaces import IFlourishLayer
 from schooltool.skin.flourish.helpers import quoteFilename
 from schooltool.common.fields import IImage, ImageFile
+from schooltool.common.renditions import getRendition
 from schooltool.common import format_message
 from schooltool.common import SchoolToolMessage as _
 
@@ -186,12 +192,32 @@ PromptRequiredDemoField = ComputedWidgetAttribute(is_required_demo_field)
 
 class FileDataURI(BrowserView):
 
+    rendition = None
+
     def __call__(self):
-        stream = self.context.open()
+        image = self.context
+        if self.rendition is not None:
+            image = getRendition(image, self.rendition)
+        image = removeSecurityProxy(image)
+        # Encoded data is cached on the file until it changes.
+        serial = getattr(image, '_p_serial', None)
+        cached = getattr(image, '_v_data_uri', None)
+        if (serial is not None and cached is not None and
+            cached[0] == serial):
+            return cached[1]
+        stream = image.open()
         payload = stream.read().encode('base64').replace('\n','')
         stream.close()
-        mime = self.context.mimeType
-        return 'data:'+mime+';base64,'+payload
+        mime = image.mimeType
+        result = 'data:'+mime+';base64,'+payload
+        if serial is not None:
+            image._v_data_uri = (serial, result)
+        return result
+
+
+class CardImageDataURI(FileDataURI):
+
+    rendition = 'card'
 
 
 class IImageWidget(Interface):
@@ -295,13 +321,233 @@ class ImageDataConverter(FileUploadDataConverter):
         return tuple(map(int, new_size))
 
 
-class ImageView(BrowserPage):
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def fileETag(stored_file):
+    """Return a strong ETag for a committed file, None otherwise.
+
+    Files that know a digest of their data may provide their own `etag`.
+    """
+    stored_file = removeSecurityProxy(stored_file)
+    etag = getattr(stored_file, 'etag', None)
+    if etag is not None:
+        return etag
+    oid = getattr(stored_file, '_p_oid', None)
+    serial = getattr(stored_file, '_p_serial', None)
+    if oid is None or serial is None:
+        return None
+    return '"%s-%s"' % (binascii.hexlify(oid), binascii.hexlify(serial))
+
+
+def parseByteRanges(header, size):
+    """Parse the value of a Range header.
+
+    Returns a sorted list of (start, stop) pairs, overlapping ranges
+    coalesced, stop not included.  Returns None if the header is not a
+    valid byte range set (the whole file should be sent) and an empty
+    list if none of the ranges can be satisfied.
+
+        >>> parseByteRanges('bytes=0-99', 1000)
+        [(0, 100)]
+        >>> parseByteRanges('bytes=-100, 950-', 1000)
+        [(900, 1000)]
+        >>> parseByteRanges('bytes=0-9,20-29,5-14', 1000)
+        [(0, 15), (20, 30)]
+        >>> parseByteRanges('bytes=1000-', 1000)
+        []
+        >>> print parseByteRanges('bytes=10-5', 1000)
+        None
+        >>> print parseByteRanges('items=0-5', 1000)
+        None
+
+    """
+    if not header:
+        return None
+    unit, sep, specs = header.partition('=')
+    if not sep or unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, sep, last = spec.partition('-')
+        first, last = first.strip(), last.strip()
+        if (not sep or
+            (first and not first.isdigit()) or
+            (last and not last.isdigit()) or
+            not (first or last)):
+            return None
+        if not first:
+            length = int(last)
+            if length > 0:
+                ranges.append((max(size - length, 0), size))
+            continue
+        start = int(first)
+        if last:
+            if int(last) < start:
+                return None
+            stop = min(int(last) + 1, size)
+        else:
+            stop = size
+        if start < size:
+            ranges.append((start, stop))
+    ranges.sort()
+    result = []
+    for start, stop in ranges:
+        if result and start <= result[-1][1]:
+            result[-1] = (result[-1][0], max(result[-1][1], stop))
+        else:
+            result.append((start, stop))
+    return result
+
+
+def openFileStream(stored_file):
+    """Open file data for reading after the transaction is over."""
+    try:
+        return stored_file.openDetached()
+    except BlobError:
+        # The blob was created in this transaction (i.e. a new image
+        # rendition) and is not in the blob directory yet.
+        stream = stored_file.open()
+        data = stream.read()
+        stream.close()
+        return StringIO(data)
+
+
+class FileRangeResult(object):
+    """Streamed response body with byte ranges of a file."""
+    implements(IResult)
+
+    def __init__(self, stream, ranges, size, content_type,
+                 chunk_size=STREAM_CHUNK_SIZE):
+        self.stream = stream
+        self.ranges = ranges
+        self.size = size
+        self.content_type = content_type
+        self.chunk_size = chunk_size
+        self.boundary = None
+        if len(ranges) > 1:
+            self.boundary = uuid.uuid4().hex
+
+    def partHeader(self, start, stop):
+        return ('--%s\r\n'
+                'Content-Type: %s\r\n'
+                'Content-Range: bytes %d-%d/%d\r\n'
+                '\r\n') % (self.boundary, self.content_type,
+                            start, stop - 1, self.size)
+
+    @property
+    def trailer(self):
+        return '--%s--\r\n' % self.boundary
+
+    @property
+    def content_length(self):
+        length = sum([stop - start for start, stop in self.ranges])
+        if self.boundary is not None:
+            for start, stop in self.ranges:
+                length += len(self.partHeader(start, stop)) + 2
+            length += len(self.trailer)
+        return length
+
+    def readRange(self, start, stop):
+        self.stream.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            data = self.stream.read(min(self.chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+    def __iter__(self):
+        try:
+            if self.boundary is None:
+                start, stop = self.ranges[0]
+                for data in self.readRange(start, stop):
+                    yield data
+                return
+            for start, stop in self.ranges:
+                yield self.partHeader(start, stop)
+                for data in self.readRange(start, stop):
+                    yield data
+                yield '\r\n'
+            yield self.trailer
+        finally:
+            self.stream.close()
+
+
+class FileDownloadMixin(object):
+    """Conditional and ranged delivery of stored files."""
+
+    chunk_size = STREAM_CHUNK_SIZE
+
+    def notModified(self, etag):
+        """Set the ETag header; return True if the client copy is fresh."""
+        if etag is None:
+            return False
+        response = self.request.response
+        response.setHeader('ETag', etag)
+        header = self.request.getHeader('If-None-Match', None)
+        if header is None:
+            return False
+        tags = [tag.strip() for tag in header.split(',')]
+        if etag in tags or '*' in tags:
+            response.setStatus(304)
+            return True
+        return False
+
+    def requestedRanges(self, size, etag):
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        if_range = self.request.getHeader('If-Range', None)
+        if if_range is not None and if_range.strip() != etag:
+            return None
+        return parseByteRanges(self.request.getHeader('Range', None), size)
+
+    def streamFile(self, stored_file, etag=None):
+        response = self.request.response
+        size = stored_file.size
+        mime = stored_file.mimeType or 'application/octet-stream'
+        response.setHeader('Accept-Ranges', 'bytes')
+        ranges = self.requestedRanges(size, etag)
+        if ranges is None or ranges == [(0, size)]:
+            response.setHeader('Content-Type', mime)
+            response.setHeader('Content-Length', size)
+            return openFileStream(stored_file)
+        if not ranges:
+            response.setStatus(416)
+            response.setHeader('Content-Range', 'bytes */%d' % size)
+            response.setHeader('Content-Length', 0)
+            return ''
+        result = FileRangeResult(openFileStream(stored_file), ranges, size,
+                                 mime, chunk_size=self.chunk_size)
+        response.setStatus(206)
+        if result.boundary is None:
+            start, stop = ranges[0]
+            response.setHeader('Content-Type', mime)
+            response.setHeader(
+                'Content-Range', 'bytes %d-%d/%d' % (start, stop - 1, size))
+        else:
+            response.setHeader(
+                'Content-Type',
+                'multipart/byteranges; boundary=%s' % result.boundary)
+        response.setHeader('Content-Length', result.content_length)
+        return result
+
+
+class ImageView(BrowserPage, FileDownloadMixin):
 
     attribute = None
 
+    @property
+    def rendition(self):
+        return self.request.get('rendition')
+
     def renderImage(self, image):
-        self.request.response.setHeader('Content-Type', image.mimeType)
-        self.request.response.setHeader('Content-Length', image.size)
+        if self.notModified(fileETag(image)):
+            return ''
         try:
             modified = IZopeDublinCore(self.context).modified
         except TypeError:
@@ -312,7 +558,7 @@ class ImageView(BrowserPage):
             if header is not None:
                 header = header.split(';')[0]
                 try:
-                    mod_since=long(time(header))
+                    mod_since=long(zope.datetime.time(header))
                 except:
                     mod_since=None
                 if mod_since is not None:
@@ -321,8 +567,7 @@ class ImageView(BrowserPage):
                         return ''
             self.request.response.setHeader(
                 'Last-Modified', zope.datetime.rfc1123_date(lmt))
-        result = image.openDetached()
-        return result
+        return self.streamFile(image, etag=fileETag(image))
 
     @property
     def image(self):
@@ -339,31 +584,30 @@ class ImageView(BrowserPage):
         image = self.image
         if image is None:
             return ''
+        if self.rendition:
+            image = getRendition(image, self.rendition)
 
         result = self.renderImage(image)
         return result
 
 
-class DownloadFile(BrowserView):
+class DownloadFile(BrowserView, FileDownloadMixin):
 
     inline = False
 
     def __call__(self):
+        if getattr(self.context, 'expired', False):
+            raise NotFound(self.context, self.context.__name__, self.request)
         response = self.request.response
-        mime = self.context.mimeType
-        if mime:
-            response.setHeader('Content-Type', mime)
-        response.setHeader('Content-Length', self.context.size)
-        if self.inline:
-            # We don't really accept ranges, but Acrobat Reader will not show the
-            # report in the browser page if this header is not provided.
-            response.setHeader('Accept-Ranges', 'bytes')
+        etag = fileETag(self.context)
+        if self.notModified(etag):
+            return ''
         disposition = self.inline and 'inline' or 'attachment'
         filename = self.context.__name__
         quoted_filename = quoteFilename(filename)
         if quoted_filename:
             disposition += '; filename="%s"' % quoted_filename
         response.setHeader('Content-Disposition', disposition)
-        return self.context.openDetached()
+        return self.streamFile(self.context, etag=etag)
 
 
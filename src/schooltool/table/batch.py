@@ -22,6 +22,7 @@ from zope.interface import implements
 from zope.browserpage.viewpagetemplatefile import ViewPageTemplateFile
 
 from schooltool.table.interfaces import IBatch
+from schooltool.table.interfaces import IIndexedItems
 
 
 class Batch(object):
@@ -41,7 +42,12 @@ class Batch(object):
         self.request = self.formatter.request
         self.context = self.formatter
 
-        item_list = list(self.context._items)
+        items = self.context._items
+        if IIndexedItems.providedBy(items):
+            # Lazy items know their length, don't build all of them.
+            item_list = items
+        else:
+            item_list = list(items)
         self.full_size = len(item_list)
         self.extra_url = self.context.extra_url()
         self.base_url = self.request.URL
@@ -151,7 +157,10 @@ class TokenBatch(object):
     """Another batching mechanism for Tables"""
 
     def __init__(self, items, start=0, size=0):
-        self.items = list(items)
+        if IIndexedItems.providedBy(items):
+            self.items = items
+        else:
+            self.items = list(items)
         self.full_size = len(self.items)
         if start >= self.full_size:
             start = max(0, self.full_size-size)
@@ -17,6 +17,9 @@
 #
 """Catalog indexing extensions for tabling."""
 
+import itertools
+
+import BTrees
 from persistent import Persistent
 
 from zope.interface import implements, implementsOnly
@@ -33,6 +36,7 @@ from zc.catalog.interfaces import IExtentCatalog
 
 from schooltool.table.interfaces import IIndexedTableFormatter
 from schooltool.table.interfaces import IIndexedColumn
+from schooltool.table.interfaces import IIndexedItems
 from schooltool.table.table import FilterWidget
 from schooltool.table.table import SchoolToolTableFormatter
 from schooltool.table.table import url_cell_formatter
@@ -92,6 +96,249 @@ class ConvertingSetIndex(ConvertingSetIndexMixin, SetIndex, Contained):
     implements(IConvertingSetIndex)
 
 
+class IndexedItems(object):
+    """Lazy items of an indexed table.
+
+    Holds document ids only: either a set (ordered by id) or a list in
+    display order.  Filtering is done with BTree set operations and
+    index dicts are built only for the items iterated over, i.e. for the
+    visible batch.
+
+    An order that already follows an index can be passed along with
+    sorted_on, an (index name, reverse) pair; sorting on it is a no-op.
+    """
+    implements(IIndexedItems)
+
+    sorted_on = None
+
+    def __init__(self, catalog, ids=None, order=None, family=None,
+                 sorted_on=None):
+        self.catalog = catalog
+        if family is None:
+            extent = getattr(catalog, 'extent', None)
+            family = getattr(extent, 'family', BTrees.family32)
+        self.family = family
+        if order is not None:
+            self._set = None
+            self.order = order
+            self.sorted_on = sorted_on
+        else:
+            if ids is None:
+                ids = self._catalogIds()
+            self._set = self._asSet(ids)
+            self.order = None
+
+    def _catalogIds(self):
+        catalog = self.catalog
+        if IExtentCatalog.providedBy(catalog):
+            return getattr(catalog.extent, 'set', catalog.extent)
+        index = catalog.values()[0]
+        return index.documents_to_values.keys()
+
+    def _asSet(self, ids):
+        if IIndexedItems.providedBy(ids):
+            return ids.idSet()
+        if isinstance(ids, (self.family.IF.TreeSet, self.family.IF.Set)):
+            return ids
+        return self.family.IF.TreeSet([id for id in ids if id is not None])
+
+    def idSet(self):
+        if self._set is None:
+            self._set = self.family.IF.TreeSet(self.order)
+        return self._set
+
+    def ids(self):
+        if self.order is not None:
+            return iter(self.order)
+        return iter(self._set)
+
+    def count(self):
+        if self.order is not None:
+            return len(self.order)
+        return len(self._set)
+
+    __len__ = count
+
+    def _item(self, id):
+        return {'id': id, 'catalog': self.catalog}
+
+    def __iter__(self):
+        for id in self.ids():
+            yield self._item(id)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise TypeError('Stepped slices are not supported')
+            start, stop, step = key.indices(self.count())
+            order = list(itertools.islice(self.ids(), start, max(start, stop)))
+            return IndexedItems(self.catalog, order=order, family=self.family)
+        if key < 0:
+            key += self.count()
+        if key < 0:
+            raise IndexError('list index out of range')
+        if self.order is not None:
+            return self._item(self.order[key])
+        for id in itertools.islice(self.ids(), key, None):
+            return self._item(id)
+        raise IndexError('list index out of range')
+
+    def slice(self, start, size):
+        return self[start:start+size]
+
+    def _filtered(self, ids, operation):
+        other = self._asSet(ids)
+        if self.order is None:
+            result = operation(self._set, other)
+            return IndexedItems(self.catalog, result, family=self.family)
+        keep = operation is self.family.IF.intersection
+        order = [id for id in self.order if (id in other) == keep]
+        return IndexedItems(self.catalog, order=order, family=self.family)
+
+    def intersection(self, ids):
+        return self._filtered(ids, self.family.IF.intersection)
+
+    def difference(self, ids):
+        return self._filtered(ids, self.family.IF.difference)
+
+    def _unindexed(self, index):
+        """Return ids of the items that have no value in the index."""
+        IO = self.family.IO
+        return IO.difference(IO.TreeSet(self._set), index.documents_to_values)
+
+    def _walkIndex(self, index, reverse, key=None):
+        """Yield ids in the order of index values.
+
+        Walks index values, intersecting their documents with the items,
+        instead of sorting documents, and stops once all items are
+        found.  Documents without a value come first, as None would.
+        With a sort key only the distinct index values are sorted.
+        """
+        ids = self._set
+        total = len(ids)
+        values_to_documents = index.values_to_documents
+        intersection = self.family.IF.intersection
+        found = 0
+        if not reverse:
+            for id in self._unindexed(index):
+                found += 1
+                yield id
+        if key is not None:
+            values = sorted(values_to_documents.keys(), key=key,
+                            reverse=reverse)
+        elif reverse:
+            values = reversedKeys(values_to_documents)
+        else:
+            values = values_to_documents.keys()
+        for value in values:
+            if found >= total:
+                return
+            documents = intersection(values_to_documents[value], ids)
+            found += len(documents)
+            for id in documents:
+                yield id
+        if found < total:
+            for id in self._unindexed(index):
+                yield id
+
+    def sort(self, index_name, reverse=False, key=None):
+        if key is None and self.sorted_on == (index_name, reverse):
+            return self
+        index = self.catalog[index_name]
+        if (self.order is None and
+            isinstance(index, ValueIndex) and
+            self.count() * 4 >= index.documentCount()):
+            order = LazyOrder(self._walkIndex(index, reverse, key),
+                              self.count())
+            return IndexedItems(self.catalog, order=order, family=self.family)
+        values = index.documents_to_values
+        if key is None:
+            sort_key = values.get
+        else:
+            sort_key = lambda id: key(values.get(id))
+        order = sorted(self.ids(), key=sort_key, reverse=reverse)
+        return IndexedItems(self.catalog, order=order, family=self.family)
+
+
+def reversedKeys(tree):
+    """Yield keys of a BTree mapping, largest first.
+
+    BTrees only iterate forwards, so this walks the tree state from the
+    end instead; only the buckets that are read get loaded.
+    """
+    state = tree.__getstate__()
+    if state is None:
+        return
+    if len(state) == 1:
+        # A tree of a single bucket keeps its items inline.
+        buckets = [state[0][0][0]]
+    else:
+        buckets = reversed(state[0][::2])
+    for bucket in buckets:
+        if isinstance(bucket, tree.__class__):
+            for key in reversedKeys(bucket):
+                yield key
+            continue
+        if not isinstance(bucket, tuple):
+            bucket = bucket.__getstate__()[0]
+        for n in range(len(bucket) - 2, -1, -2):
+            yield bucket[n]
+
+
+class LazyOrder(object):
+    """A list of ids of known length, read from an iterator on demand."""
+
+    def __init__(self, iterator, length):
+        self._iterator = iterator
+        self._length = length
+        self._cache = []
+
+    def __len__(self):
+        return self._length
+
+    def _fill(self, stop=None):
+        cache = self._cache
+        if self._iterator is None:
+            return
+        while stop is None or len(cache) < stop:
+            try:
+                cache.append(self._iterator.next())
+            except StopIteration:
+                self._iterator = None
+                self._length = len(cache)
+                return
+
+    def __iter__(self):
+        n = 0
+        while True:
+            self._fill(n + 1)
+            if n >= len(self._cache):
+                return
+            yield self._cache[n]
+            n += 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self._fill(key.stop)
+            return self._cache[key]
+        self._fill(key + 1 if key >= 0 else None)
+        return self._cache[key]
+
+    def __contains__(self, id):
+        for other in self:
+            if other == id:
+                return True
+        return False
+
+
+def intersectItems(items, ids):
+    """Return items whose document ids are in ids."""
+    if IIndexedItems.providedBy(items):
+        return items.intersection(ids)
+    return [item for item in items
+            if item['id'] in ids]
+
+
 class IndexedFilterWidget(FilterWidget):
 
     search_index = 'title'
@@ -104,6 +351,14 @@ class IndexedFilterWidget(FilterWidget):
         index = self.catalog[self.search_index]
         if 'SEARCH' in self.request and 'CLEAR_SEARCH' not in self.request:
             searchstr = self.request['SEARCH'].lower()
+            if (IIndexedItems.providedBy(items) and
+                isinstance(index, ValueIndex)):
+                matching = [
+                    docs
+                    for title, docs in index.values_to_documents.items()
+                    if searchstr in title.lower()]
+                return items.intersection(
+                    items.family.IF.multiunion(matching))
             results = []
             for item in items:
                 title = index.documents_to_values[item['id']]
@@ -131,23 +386,16 @@ class IndexedTableFormatter(SchoolToolTableFormatter):
         return ICatalog(self.source)
 
     def items(self):
-        """Return a list of index dicts for all the items in the context container"""
-        catalog = self.catalog
-        if IExtentCatalog.providedBy(catalog):
-            ids = list(catalog.extent)
-        else:
-            index = catalog.values()[0]
-            ids = index.documents_to_values.keys()
-
-        items = [{'id': id, 'catalog': catalog}
-                 for id in ids]
-        return items
+        """Return lazy index dicts for all the items in the context container"""
+        return IndexedItems(self.catalog)
 
     def ommit(self, items, ommited_items):
         if not ommited_items:
             return items
         ommited_items = self.indexItems(ommited_items)
         ommited_ids = set([item['id'] for item in ommited_items])
+        if IIndexedItems.providedBy(items):
+            return items.difference(ommited_ids)
         return [item for item in items
                 if item['id'] not in ommited_ids]
 
@@ -163,12 +411,7 @@ class IndexedTableFormatter(SchoolToolTableFormatter):
         return results
 
     def makeItems(self, intids):
-        catalog = self.catalog
-        results = [
-            {'id': iid,
-             'catalog': catalog}
-            for iid in intids]
-        return results
+        return IndexedItems(self.catalog, intids)
 
     def getItem(self, indexed):
         int_ids = getUtility(IIntIds)
@@ -37,6 +37,7 @@ import zc.table.column
 from schooltool.common import stupid_form_key, getResourceURL
 from schooltool.table.interfaces import ICheckboxColumn
 from schooltool.table.interfaces import IIndexedColumn
+from schooltool.table.interfaces import IIndexedItems
 
 
 class CheckboxColumn(zc.table.column.Column):
@@ -301,8 +302,11 @@ class IndexedGetterColumn(zc.table.column.GetterColumn):
     def _sort(self, items, formatter, start, stop, sorters, multiplier):
         if self.subsort and sorters:
             items = sorters[0](items, formatter, start, stop, sorters[1:])
-        else:
-            items = list(items) # don't mutate original
+        if IIndexedItems.providedBy(items):
+            # Sort ids by index values, without building index dicts.
+            return items.sort(self.index, reverse=multiplier < 0,
+                              key=self.valueSortKey(formatter))
+        items = list(items) # don't mutate original
         getSortKey = self.getSortKey
 
         # Patch the SortableColum._sort to use both cmp and key for sorting.
@@ -322,16 +326,24 @@ class IndexedGetterColumn(zc.table.column.GetterColumn):
         index = item['catalog'][self.index]
         return index.documents_to_values[id]
 
+    def valueSortKey(self, formatter):
+        """Return a function that makes sort keys of index values."""
+        return None
+
 
 class IndexedLocaleAwareGetterColumn(IndexedGetterColumn):
 
     _cached_collator = None
 
-    def getSortKey(self, item, formatter):
+    def valueSortKey(self, formatter):
         if not self._cached_collator:
             self._cached_collator = ICollator(formatter.request.locale)
+        collator = self._cached_collator
+        return lambda s: s and collator.key(s)
+
+    def getSortKey(self, item, formatter):
         s = super(IndexedLocaleAwareGetterColumn, self).getSortKey(item, formatter)
-        return s and self._cached_collator.key(s)
+        return self.valueSortKey(formatter)(s)
 
 
 def makeIndexedColumn(mixins, column, *args, **kw):
@@ -74,6 +74,52 @@ class IIndexedTableFormatter(ITableFormatter):
         """Return a list of indexed items"""
 
 
+class IIndexedItems(Interface):
+    """A lazy, ordered set of catalog documents shown in a table.
+
+    Iterating gives index dicts (see IIndexedColumn), which are only
+    built for the items actually iterated over.
+    """
+
+    catalog = Attribute("The catalog of the documents.")
+
+    family = Attribute("The BTrees family of document id sets.")
+
+    def ids():
+        """Iterate document ids, in order."""
+
+    def idSet():
+        """Return document ids as an IF set."""
+
+    def count():
+        """Return the number of items."""
+
+    def __len__():
+        """Return the number of items."""
+
+    def __iter__():
+        """Iterate index dicts of items, in order."""
+
+    def __getitem__(key):
+        """Return an index dict, or lazy items if key is a slice."""
+
+    def slice(start, size):
+        """Return lazy items of a batch."""
+
+    def intersection(ids):
+        """Return lazy items that also are in the set of document ids."""
+
+    def difference(ids):
+        """Return lazy items that are not in the set of document ids."""
+
+    def sort(index_name, reverse=False, key=None):
+        """Return lazy items sorted by values of the given index.
+
+        The sort is stable.  The key function, if given, is applied to
+        index values.
+        """
+
+
 class IIndexedColumn(Interface):
     """A column that operates on index dicts instead of objects.
 
@@ -41,6 +41,7 @@ from schooltool.common import stupid_form_key
 from schooltool.skin import flourish
 from schooltool.table.batch import Batch
 from schooltool.table.interfaces import IFilterWidget
+from schooltool.table.interfaces import IIndexedItems
 from schooltool.table.interfaces import ITableFormatter
 
 # BBB: imports
@@ -398,7 +399,10 @@ class SchoolToolTableFormatter(object):
         self._items = filter(self.ommit(items, ommit))
 
         if batch_size == 0:
-            batch_size = len(list(self._items))
+            if IIndexedItems.providedBy(self._items):
+                batch_size = len(self._items)
+            else:
+                batch_size = len(list(self._items))
 
         self.batch_size = batch_size
         self._sort_on = sort_on or self.sortOn() or ()
@@ -278,11 +278,11 @@ def doctest_IndexedTableFormatter_items():
         >>> catalog = []
         >>> catalog = ExtentCatalogStub([])
         >>> formatter = IndexedTableFormatter(ContainerStub(catalog), None)
-        >>> formatter.items()
+        >>> list(formatter.items())
         []
 
         >>> catalog.extent[:] = [1, 2, 3]
-        >>> formatter.items()
+        >>> list(formatter.items())
         [{'catalog': <ExtentCatalog>,
           'id': 1},
          {'catalog': <ExtentCatalog>,
@@ -296,7 +296,7 @@ def doctest_IndexedTableFormatter_items():
         >>> index = IndexStub()
         >>> formatter = IndexedTableFormatter(
         ...     ContainerStub(CatalogStub(index)), None)
-        >>> formatter.items()
+        >>> list(formatter.items())
         []
 
     Let's index some objects:
@@ -307,7 +307,7 @@ def doctest_IndexedTableFormatter_items():
 
     Now we should get a list of index dicts:
 
-        >>> pprint(formatter.items())
+        >>> pprint(list(formatter.items()))
         [{'catalog': <Catalog>,
           'id': 1},
          {'catalog': <Catalog>,
@@ -318,6 +318,182 @@ def doctest_IndexedTableFormatter_items():
     """
 
 
+def doctest_IndexedItems():
+    """Tests for IndexedItems.
+
+        >>> from zc.catalog.index import ValueIndex
+        >>> from zc.catalog.extentcatalog import Catalog, Extent
+        >>> from schooltool.table.catalog import IndexedItems
+        >>> from schooltool.table.interfaces import IIndexedItems
+
+        >>> catalog = Catalog(Extent())
+        >>> catalog['title'] = ValueIndex()
+        >>> titles = {1: 'c', 2: 'a', 3: 'b', 4: 'a', 5: None, 6: 'd'}
+        >>> for id, title in sorted(titles.items()):
+        ...     catalog.extent.add(id, None)
+        ...     catalog['title'].index_doc(id, title)
+
+    Items hold ids of catalog documents, index dicts are built while
+    iterating.
+
+        >>> items = IndexedItems(catalog)
+        >>> IIndexedItems.providedBy(items)
+        True
+        >>> len(items), list(items.ids())
+        (6, [1, 2, 3, 4, 5, 6])
+        >>> items[1]['id'], items[-1]['id']
+        (2, 6)
+        >>> items[1]['catalog'] is catalog
+        True
+
+    Filtering and slicing give new lazy items.
+
+        >>> filtered = items.difference([3]).intersection(set([1, 2, 3, 4, 5]))
+        >>> list(filtered.ids())
+        [1, 2, 4, 5]
+        >>> list(filtered[1:3].ids()), list(filtered.slice(3, 10).ids())
+        ([2, 4], [5])
+
+    Sorting walks the index; documents without a value come first and
+    equal values keep their order.
+
+        >>> list(items.sort('title').ids())
+        [5, 2, 4, 3, 1, 6]
+        >>> list(items.sort('title', reverse=True).ids())
+        [6, 1, 3, 2, 4, 5]
+
+    Only as much of the index is read as the batch needs.
+
+        >>> ordered = items.sort('title')
+        >>> list(ordered[:2].ids())
+        [5, 2]
+        >>> len(ordered.order._cache)
+        2
+        >>> len(ordered)
+        6
+
+    The walk intersects documents of every value with the items and
+    stops once all of them are found.
+
+        >>> class ValuesSpy(dict):
+        ...     def __getitem__(self, value):
+        ...         print 'reading', value
+        ...         return dict.__getitem__(self, value)
+        ...     def keys(self):
+        ...         return sorted(dict.keys(self))
+        >>> class IndexStub(object):
+        ...     values_to_documents = ValuesSpy(
+        ...         catalog['title'].values_to_documents.items())
+        ...     documents_to_values = catalog['title'].documents_to_values
+        >>> list(items.intersection([2, 3, 4])._walkIndex(IndexStub, False))
+        reading a
+        reading b
+        [2, 4, 3]
+
+    Sort keys, like collation of titles, only sort the distinct values;
+    documents are still read from the index lazily.
+
+        >>> by_key = items.sort('title', key=lambda s: s and -ord(s))
+        >>> list(by_key[:2].ids()), len(by_key.order._cache)
+        ([5, 6], 2)
+        >>> list(by_key.ids())
+        [5, 6, 1, 3, 2, 4]
+        >>> list(items.sort('title', reverse=True,
+        ...                 key=lambda s: s and -ord(s)).ids())
+        [2, 4, 3, 1, 6, 5]
+
+    Sorted items are filtered and sorted again keeping their order.
+
+        >>> list(ordered.intersection([1, 2, 6]).ids())
+        [2, 1, 6]
+        >>> list(filtered.sort('title', key=lambda s: s and -ord(s)).ids())
+        [5, 1, 2, 4]
+
+    Items given in an order known to follow an index are not sorted again.
+
+        >>> newest = IndexedItems(catalog, order=[6, 1, 3],
+        ...                       sorted_on=('title', True))
+        >>> newest.sort('title', reverse=True) is newest
+        True
+        >>> list(newest.sort('title').ids())
+        [3, 1, 6]
+
+    """
+
+
+def doctest_reversedKeys():
+    """Tests for reversedKeys.
+
+        >>> from BTrees.OOBTree import OOBTree
+        >>> from schooltool.table.catalog import reversedKeys
+
+        >>> list(reversedKeys(OOBTree()))
+        []
+        >>> list(reversedKeys(OOBTree({'a': 1, 'b': 2})))
+        ['b', 'a']
+
+    Large trees are walked through their buckets from the end.
+
+        >>> tree = OOBTree()
+        >>> for n in range(50000):
+        ...     tree['%05d' % n] = n
+        >>> keys = list(reversedKeys(tree))
+        >>> keys == list(reversed(tree.keys()))
+        True
+
+    """
+
+
+def doctest_IndexedGetterColumn_sort_IndexedItems():
+    """Sorting of IndexedItems with IndexedGetterColumn.
+
+        >>> from zc.catalog.index import ValueIndex
+        >>> from zc.catalog.extentcatalog import Catalog, Extent
+        >>> from schooltool.table.catalog import IndexedItems
+        >>> from schooltool.table.column import IndexedGetterColumn
+
+        >>> catalog = Catalog(Extent())
+        >>> catalog['title'] = ValueIndex()
+        >>> catalog['group'] = ValueIndex()
+        >>> for id, title, group in [(1, 'b', 2), (2, 'a', 1), (3, 'c', 1)]:
+        ...     catalog.extent.add(id, None)
+        ...     catalog['title'].index_doc(id, title)
+        ...     catalog['group'].index_doc(id, group)
+
+        >>> title = IndexedGetterColumn(
+        ...     index='title', getter=lambda i, f: i.title, subsort=True)
+        >>> group = IndexedGetterColumn(
+        ...     index='group', getter=lambda i, f: i.group)
+
+    The column returns lazy items sorted by the index.
+
+        >>> def sort(column, items, sorters=(), multiplier=1):
+        ...     return column._sort(items, None, 0, None, list(sorters),
+        ...                         multiplier)
+
+        >>> items = IndexedItems(catalog)
+        >>> [item['id'] for item in sort(title, items)]
+        [2, 1, 3]
+        >>> [item['id'] for item in sort(title, items, multiplier=-1)]
+        [3, 1, 2]
+
+    Subsorting is stable.
+
+        >>> by_group = lambda items, f, start, stop, sorters: sort(group, items)
+        >>> [item['id'] for item in sort(title, items, [by_group], -1)]
+        [3, 1, 2]
+        >>> [item['id'] for item in sort(group, items, [by_group])]
+        [2, 3, 1]
+
+    Lists of index dicts are still sorted as before.
+
+        >>> sort(title, list(items))
+        [{'catalog': ..., 'id': 2}, {'catalog': ..., 'id': 1},
+         {'catalog': ..., 'id': 3}]
+
+    """
+
+
 def doctest_IndexedTableFormatter_indexItems():
     """Tests for IndexedTableFormatter.indexItems.
 
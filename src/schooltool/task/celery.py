@@ -45,6 +45,7 @@ SCHOOLTOOL_CONFIG_NAMESPACES = {
     "SCHOOLTOOL": {
         "CONFIG": celery.app.defaults.Option('schooltool.conf', type="string"),
         "RETRY_DB_CONFLICTS": celery.app.defaults.Option(3, type="int"),
+        "REPORT_WORKERS": celery.app.defaults.Option(1, type="int"),
         }
     }
 celery.app.defaults.NAMESPACES.update(SCHOOLTOOL_CONFIG_NAMESPACES)
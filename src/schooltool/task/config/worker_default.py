@@ -54,7 +54,8 @@ BROKER_URL = "redis://%s:%d/%d" % (
 
 CELERY_ENABLE_UTC = True
 
-CELERY_IMPORTS = ("schooltool.task.tasks", )
+CELERY_IMPORTS = ("schooltool.task.tasks", "schooltool.task.retention",
+                  "schooltool.report.report", "schooltool.report.storage")
 
 #CELERYBEAT_OPTS="--schedule=/home/justas/src/schooltool/flourish_celery/instance/var/celerybeat-schedule"
 #CELERYBEAT_SCHEDULE = {}
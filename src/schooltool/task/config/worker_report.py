@@ -1,4 +1,9 @@
 from schooltool.task.config.worker_default import *
 
+import os
+
 CELERYD_POOL = 'processes'
-CELERYD_CONCURRENCY = 1 # use a single worker
+# Use a single worker by default.  Bulk PDF reports render their chunks
+# in parallel when more report workers are available.
+SCHOOLTOOL_REPORT_WORKERS = int(os.environ.get('SCHOOLTOOL_REPORT_WORKERS', 1))
+CELERYD_CONCURRENCY = SCHOOLTOOL_REPORT_WORKERS
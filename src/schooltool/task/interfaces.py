@@ -74,6 +74,10 @@ class IRemoteTask(ITask, IContained):
 class ITaskContainer(IContainer):
     contains(IRemoteTask)
 
+    retention = zope.schema.Timedelta(
+        title=u'Purge finished tasks scheduled this long ago',
+        required=False)
+
 
 class IMessageBase(Interface):
 
@@ -127,9 +131,45 @@ class IProgressMessage(IMessage):
     """Message that has a displayable progress."""
 
 
+class IMessageInbox(Interface):
+    """Int ids of messages sent to a recipient, newest first."""
+
+    unread = Attribute("Number of messages updated since last read.")
+
+    def add(message_id, updated_on):
+        """Add or move a message."""
+
+    def remove(message_id):
+        """Remove a message, if it is in the inbox."""
+
+    def markRead(dt):
+        """Mark messages updated before dt read."""
+
+    def __len__():
+        """Number of messages."""
+
+    def __iter__():
+        """Iterate message int ids, newest first."""
+
+
 class IMessageContainer(IContainer):
     contains(IMessage)
 
+    retention = zope.schema.Timedelta(
+        title=u'Purge read messages not updated for this long',
+        required=False)
+
+    has_inboxes = Attribute("Whether recipient inboxes are maintained.")
+
+    def getInbox(recipient_id):
+        """Return the IMessageInbox of a recipient, None if no inboxes."""
+
+    def deliver(message):
+        """Update inboxes of recipients of a contained message."""
+
+    def markInboxRead(recipient_id, dt):
+        """Mark messages of the recipient updated before dt read."""
+
 
 class ITaskNotification(Interface):
 
@@ -0,0 +1,223 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Retention of finished tasks and read messages.
+
+Task and message containers keep their retention period in the
+`retention` attribute (None keeps everything).  Old entries are found
+through the task and message catalogs and deleted in chunks; catalog
+entries go away with the intid unregistration of deleted objects.
+
+Tasks are purged once finished.  Tasks whose result was lost stay
+pending forever, so they are purged anyway when they are
+abandon_factor times older than the retention period.
+"""
+from __future__ import absolute_import
+
+import datetime
+import logging
+
+import pytz
+import transaction
+from zope.component import getUtility
+from zope.intid.interfaces import IIntIds
+
+from schooltool.app.interfaces import ISchoolToolApplication
+from schooltool.task.interfaces import ITaskContainer, IMessageContainer
+from schooltool.task.tasks import PeriodicDBTask
+from schooltool.task.tasks import RemoteTaskCatalog, MessageCatalog
+from schooltool.task.tasks import getLastMessagesReadTime
+
+
+log = logging.getLogger('schooltool.task.retention')
+
+
+def utcnow():
+    return pytz.UTC.localize(datetime.datetime.utcnow())
+
+
+class PurgeResult(object):
+    """Counts of purged objects and released report data."""
+
+    def __init__(self):
+        self.tasks = 0
+        self.messages = 0
+        self.files = 0
+        self.bytes = 0
+
+    def summary(self):
+        return ('%d tasks, %d messages purged, '
+                '%d report files (%d bytes) released' % (
+                self.tasks, self.messages, self.files, self.bytes))
+
+
+class RetentionPurge(object):
+    """Purge finished tasks and read messages past their retention.
+
+    Every chunk_size deletions the transaction is committed (if commit
+    is set) or a savepoint is made, and the connection cache is cleaned.
+    At most limit objects are deleted in one run, the rest is left for
+    the next one.
+    """
+
+    chunk_size = 100
+    limit = None
+    abandon_factor = 3
+
+    def __init__(self, app, now=None, chunk_size=None, limit=None,
+                 commit=False):
+        self.app = app
+        self.now = now if now is not None else utcnow()
+        self.commit = commit
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+        if limit is not None:
+            self.limit = limit
+        self.int_ids = getUtility(IIntIds)
+        self.result = PurgeResult()
+        self.released = set()
+        self.pending = 0
+
+    @property
+    def exhausted(self):
+        if self.limit is None:
+            return False
+        return self.result.tasks + self.result.messages >= self.limit
+
+    def step(self):
+        self.pending += 1
+        if self.pending < self.chunk_size:
+            return
+        self.pending = 0
+        if self.commit:
+            transaction.commit()
+        else:
+            transaction.savepoint(optimistic=True)
+        jar = getattr(self.app, '_p_jar', None)
+        if jar is not None:
+            jar.cacheGC()
+
+    def candidates(self, catalog, index_name, retention):
+        """Objects with index values older than retention, oldest first."""
+        if retention is None:
+            return
+        cutoff = self.now - retention
+        index = catalog[index_name]
+        for value in list(index.values(max=cutoff)):
+            docids = index.values_to_documents.get(value)
+            if docids is None:
+                continue
+            for docid in list(docids):
+                obj = self.int_ids.queryObject(docid)
+                if obj is not None:
+                    yield obj
+
+    def releaseFiles(self, obj):
+        """Count report files only the deleted object refers to.
+
+        The blobs are reclaimed when the database is packed.  Files that
+        share an artifact of the report artifact store are evicted by
+        the store itself.
+        """
+        report = getattr(obj, 'report', None)
+        if report is None or getattr(report, 'artifact', None) is not None:
+            return
+        key = getattr(report, '_p_oid', None) or id(report)
+        if key in self.released:
+            return
+        self.released.add(key)
+        self.result.files += 1
+        self.result.bytes += getattr(report, 'size', 0) or 0
+
+    def delete(self, container, obj):
+        name = obj.__name__
+        if name is None or container.get(name) is not obj:
+            return False
+        self.releaseFiles(obj)
+        del container[name]
+        self.step()
+        return True
+
+    def isRead(self, message):
+        """Whether all recipients still around have read the message."""
+        for recipient_id in message.recipient_ids or ():
+            recipient = self.int_ids.queryObject(recipient_id)
+            if recipient is None:
+                continue
+            read_on = getLastMessagesReadTime(recipient)
+            if read_on is None or read_on <= message.updated_on:
+                return False
+        return True
+
+    def isExpired(self, message):
+        return (message.expires_on is not None and
+                message.expires_on < self.now)
+
+    def isAbandoned(self, task, retention):
+        """Whether the task is far past retention, finished or not."""
+        if task.scheduled is None:
+            return False
+        return task.scheduled < self.now - retention * self.abandon_factor
+
+    def purgeTasks(self):
+        tasks = ITaskContainer(self.app)
+        catalog = RemoteTaskCatalog.get()
+        retention = getattr(tasks, 'retention', None)
+        candidates = self.candidates(catalog, 'scheduled', retention)
+        for task in candidates:
+            if self.exhausted:
+                break
+            if not (self.isAbandoned(task, retention) or task.finished):
+                continue
+            if self.delete(tasks, task):
+                self.result.tasks += 1
+
+    def purgeMessages(self):
+        messages = IMessageContainer(self.app)
+        catalog = MessageCatalog.get()
+        candidates = self.candidates(
+            catalog, 'updated_on', getattr(messages, 'retention', None))
+        for message in candidates:
+            if self.exhausted:
+                break
+            if not (self.isExpired(message) or self.isRead(message)):
+                continue
+            if self.delete(messages, message):
+                self.result.messages += 1
+
+    def __call__(self):
+        self.purgeTasks()
+        self.purgeMessages()
+        log.info(self.result.summary())
+        return self.result
+
+
+class PurgeExpiredTask(PeriodicDBTask):
+    """Daily purge of finished tasks and read messages."""
+
+    name = 'schooltool.task.retention.purge_expired'
+    run_every = datetime.timedelta(days=1)
+    routing_key = 'zodb.report'
+
+    # Large backlogs are purged over several runs.
+    purge_limit = 10000
+
+    def execute(self, celery_task):
+        app = ISchoolToolApplication(None)
+        purge = RetentionPurge(app, limit=self.purge_limit, commit=True)
+        return purge().summary()
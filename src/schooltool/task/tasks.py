@@ -18,6 +18,7 @@
 from __future__ import absolute_import
 
 import sys
+import calendar
 import datetime
 import pkg_resources
 import pytz
@@ -29,6 +30,8 @@ import celery.states
 import transaction
 import transaction.interfaces
 from persistent import Persistent
+from BTrees.Length import Length
+from BTrees.OOBTree import OOBTree, OOTreeSet
 from zope.annotation.interfaces import IAnnotations
 from zope.interface import implements, implementer
 from zope.intid.interfaces import IIntIds
@@ -54,6 +57,7 @@ from schooltool.securitypolicy.crowds import Crowd
 from schooltool.task.celery import open_schooltool_db
 from schooltool.task.interfaces import IRemoteTask, ITaskContainer
 from schooltool.task.interfaces import IMessage, IMessageContainer
+from schooltool.task.interfaces import IMessageInbox
 from schooltool.task.interfaces import ITaskScheduledNotification
 from schooltool.task.interfaces import ITaskCompletedNotification
 from schooltool.task.interfaces import ITaskFailedNotification
@@ -139,6 +143,11 @@ class DBTaskMixin(object):
         tasks = ITaskContainer(app)
         return tasks.get(self.request.id)
 
+    @property
+    def transaction_target(self):
+        """The object that executes, completes or fails the task."""
+        return self.remote_task
+
     def beginTransaction(self):
         db = open_schooltool_db()
         if db is None:
@@ -147,7 +156,7 @@ class DBTaskMixin(object):
         root = self.db_connection.root()
         self.schooltool_app = root[ZopePublication.root_name]
         transaction.begin()
-        if self.remote_task is None:
+        if self.transaction_target is None:
             raise TPCNotReady()
 
     def abortTransaction(self):
@@ -180,7 +189,7 @@ class DBTaskMixin(object):
             try:
                 old_site = getSite()
                 setSite(self.schooltool_app)
-                callable = getattr(self.remote_task, attr)
+                callable = getattr(self.transaction_target, attr)
                 result = callable(*args, **kw)
                 setSite(old_site)
                 if set_committing:
@@ -243,8 +252,26 @@ def db_task(*args, **kw):
 
 
 class PeriodicDBTask(DBTaskMixin, celery.task.PeriodicTask):
+    """Periodic task run within a ZODB transaction.
+
+    Periodic runs are not scheduled by SchoolTool, so there is no remote
+    task: the periodic task itself executes, completes or fails.
+    """
     abstract = True
 
+    @property
+    def transaction_target(self):
+        return self
+
+    def execute(self, celery_task, *args, **kw):
+        pass
+
+    def complete(self, celery_task, result):
+        pass
+
+    def fail(self, celery_task, result, traceback):
+        pass
+
 
 def periodic_db_task(*args, **kw):
     return celery.task.task(*args, **dict({'base': PeriodicDBTask}, **kw))
@@ -480,6 +507,8 @@ class RemoteTask(Persistent, Contained):
 class TaskContainer(BTreeContainer):
     implements(ITaskContainer)
 
+    retention = datetime.timedelta(days=30)
+
 
 @adapter(ISchoolToolApplication)
 @implementer(ITaskContainer)
@@ -507,9 +536,178 @@ class RemoteTaskCatalog(AttributeCatalog):
 getRemoteTaskCatalog = RemoteTaskCatalog.get
 
 
+def _timestamp(dt):
+    """Microseconds since the epoch of a UTC datetime."""
+    if dt is None:
+        return 0
+    return calendar.timegm(dt.utctimetuple()) * 1000000 + dt.microsecond
+
+
+class MessageInbox(Persistent):
+    """Message int ids of a recipient, newest first.
+
+    Keeps a count of unread messages, i.e. messages updated since the
+    recipient last read messages.
+    """
+    implements(IMessageInbox)
+
+    _last_read = None
+
+    def __init__(self, last_read=None):
+        Persistent.__init__(self)
+        self._order = OOTreeSet()
+        self._keys = OOBTree()
+        self._unread = Length()
+        if last_read is not None:
+            self._last_read = _timestamp(last_read)
+
+    def _isUnread(self, key):
+        return self._last_read is None or -key[0] >= self._last_read
+
+    def add(self, message_id, updated_on):
+        self.remove(message_id)
+        key = (-_timestamp(updated_on), message_id)
+        self._order.insert(key)
+        self._keys[message_id] = key
+        if self._isUnread(key):
+            self._unread.change(1)
+
+    def remove(self, message_id):
+        key = self._keys.get(message_id)
+        if key is None:
+            return
+        del self._keys[message_id]
+        self._order.remove(key)
+        if self._isUnread(key):
+            self._unread.change(-1)
+
+    def markRead(self, dt):
+        self._last_read = _timestamp(dt)
+        unread = 0
+        for key in self._order:
+            if not self._isUnread(key):
+                break
+            unread += 1
+        if unread != self._unread():
+            self._unread.set(unread)
+
+    @property
+    def unread(self):
+        return self._unread()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, message_id):
+        return message_id in self._keys
+
+    def __iter__(self):
+        for key in self._order:
+            yield key[1]
+
+
 class MessageContainer(BTreeContainer):
+    """Messages, with an inbox of message int ids per recipient.
+
+    Containers created before inboxes were introduced have none until
+    enableInboxes is called.
+    """
     implements(IMessageContainer)
 
+    retention = datetime.timedelta(days=90)
+
+    # recipient int id -> MessageInbox
+    _inboxes = None
+    # message int id -> tuple of recipient int ids
+    _delivered = None
+
+    def __init__(self):
+        super(MessageContainer, self).__init__()
+        self.enableInboxes()
+
+    @property
+    def has_inboxes(self):
+        return self._inboxes is not None
+
+    def enableInboxes(self):
+        if self._inboxes is None:
+            self._inboxes = OOBTree()
+            self._delivered = OOBTree()
+
+    def getInbox(self, recipient_id):
+        """Return the inbox of a recipient.
+
+        Returns None if the container has no inboxes.
+        """
+        if self._inboxes is None:
+            return None
+        inbox = self._inboxes.get(recipient_id)
+        if inbox is None:
+            inbox = MessageInbox()
+        return inbox
+
+    def markInboxRead(self, recipient_id, dt):
+        if self._inboxes is None:
+            return
+        inbox = self._inboxes.get(recipient_id)
+        if inbox is not None:
+            inbox.markRead(dt)
+
+    def _createInbox(self, recipient_id, int_ids):
+        recipient = int_ids.queryObject(recipient_id)
+        if recipient is None:
+            return None
+        inbox = MessageInbox(getLastMessagesReadTime(recipient))
+        self._inboxes[recipient_id] = inbox
+        return inbox
+
+    def deliver(self, message):
+        """Update inboxes of message recipients."""
+        if self._inboxes is None:
+            return
+        int_ids = getUtility(IIntIds)
+        message_id = int_ids.queryId(message)
+        if message_id is None:
+            return
+        old_recipients = self._delivered.get(message_id, ())
+        recipients = tuple(sorted(message.recipient_ids or ()))
+        for recipient_id in old_recipients:
+            if recipient_id not in recipients:
+                inbox = self._inboxes.get(recipient_id)
+                if inbox is not None:
+                    inbox.remove(message_id)
+        for recipient_id in recipients:
+            inbox = self._inboxes.get(recipient_id)
+            if inbox is None:
+                inbox = self._createInbox(recipient_id, int_ids)
+            if inbox is not None:
+                inbox.add(message_id, message.updated_on)
+        if recipients:
+            if recipients != old_recipients:
+                self._delivered[message_id] = recipients
+        elif old_recipients:
+            del self._delivered[message_id]
+
+    def _undeliver(self, message_id):
+        for recipient_id in self._delivered.get(message_id, ()):
+            inbox = self._inboxes.get(recipient_id)
+            if inbox is not None:
+                inbox.remove(message_id)
+        if message_id in self._delivered:
+            del self._delivered[message_id]
+
+    def __setitem__(self, name, message):
+        super(MessageContainer, self).__setitem__(name, message)
+        self.deliver(message)
+
+    def __delitem__(self, name):
+        message_id = None
+        if self._inboxes is not None:
+            message_id = getUtility(IIntIds).queryId(self[name])
+        super(MessageContainer, self).__delitem__(name)
+        if message_id is not None:
+            self._undeliver(message_id)
+
 
 @adapter(ISchoolToolApplication)
 @implementer(IMessageContainer)
@@ -564,7 +762,9 @@ class Message(Persistent, Contained):
         if self.__name__:
             if (self.__name__ in messages):
                 if (sameProxiedObjects(messages[self.__name__], self)):
-                    return # already sent
+                    # already sent
+                    messages.deliver(self)
+                    return
                 del messages[self.__name__]
             messages[self.__name__] = self
         else:
@@ -712,12 +912,35 @@ class MessageCatalog(AttributeCatalog):
 getMessageCatalog = MessageCatalog.get
 
 
+def getMessageInbox(target):
+    """Return the message inbox of a recipient.
+
+    Returns None if inboxes of the message container are not built yet.
+    """
+    app = ISchoolToolApplication(None)
+    messages = IMessageContainer(app)
+    if not messages.has_inboxes:
+        return None
+    int_ids = getUtility(IIntIds)
+    recipient_id = int_ids.queryId(removeSecurityProxy(target), None)
+    if recipient_id is None:
+        return MessageInbox()
+    return messages.getInbox(recipient_id)
+
+
 def markMessagesRead(target, dt=None):
     target = removeSecurityProxy(target)
     ann = IAnnotations(target)
     if dt is None:
         dt = pytz.UTC.localize(datetime.datetime.utcnow())
     ann[LAST_READ_MESSAGES_TIME_KEY] = dt
+    int_ids = getUtility(IIntIds)
+    recipient_id = int_ids.queryId(target, None)
+    if recipient_id is None:
+        return
+    messages = IMessageContainer(ISchoolToolApplication(None), None)
+    if messages is not None:
+        messages.markInboxRead(recipient_id, dt)
 
 
 def getLastMessagesReadTime(target):
@@ -0,0 +1,292 @@
+#
+# SchoolTool - common information systems platform for school administration
+# Copyright (c) 2014 Shuttleworth Foundation
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Unit tests for schooltool.task.retention
+"""
+import unittest
+import doctest
+import datetime
+from transaction import abort
+
+import pytz
+from BTrees.IOBTree import IOBTree
+from zope.annotation.interfaces import IAttributeAnnotatable
+from zope.app.testing import setup
+from zope.component import provideAdapter, provideUtility
+from zope.container.contained import Contained
+from zope.interface import implements
+from zope.intid.interfaces import IIntIds
+
+from schooltool.app.catalog import getAppCatalogs
+from schooltool.task.interfaces import IRemoteTask, IMessage
+from schooltool.task.tasks import TaskContainer, MessageContainer
+from schooltool.task.tasks import getTaskContainerForApp
+from schooltool.task.tasks import getMessageContainerForApp
+
+
+utc = pytz.UTC
+
+
+def days_ago(days):
+    return NOW - datetime.timedelta(days=days)
+
+
+NOW = utc.localize(datetime.datetime(2014, 6, 30, 12, 0))
+
+
+class IntIdsStub(object):
+
+    def __init__(self):
+        self.refs = IOBTree()
+
+    def register(self, obj):
+        uid = len(self.refs) + 1
+        self.refs[uid] = obj
+        return uid
+
+    def queryObject(self, uid, default=None):
+        return self.refs.get(uid, default)
+
+    def queryId(self, obj, default=None):
+        for uid, ref in self.refs.items():
+            if ref is obj:
+                return uid
+        return default
+
+
+class ReportStub(object):
+
+    artifact = None
+
+    def __init__(self, size):
+        self.size = size
+
+
+class TaskStub(Contained):
+    implements(IRemoteTask)
+
+    report = None
+
+    def __init__(self, scheduled, finished=True, report=None):
+        self.scheduled = scheduled
+        self.finished = finished
+        self.report = report
+
+
+class RecipientStub(object):
+    implements(IAttributeAnnotatable)
+
+
+class MessageStub(Contained):
+    implements(IMessage)
+
+    def __init__(self, updated_on, recipient_ids=(), expires_on=None):
+        self.updated_on = updated_on
+        self.recipient_ids = recipient_ids
+        self.expires_on = expires_on
+
+
+def addTask(app, intids, name, task):
+    from schooltool.task.tasks import RemoteTaskCatalog
+    app['schooltool.tasks'][name] = task
+    uid = intids.register(task)
+    RemoteTaskCatalog.get()['scheduled'].index_doc(uid, task)
+    return task
+
+
+def addMessage(app, intids, name, message):
+    from schooltool.task.tasks import MessageCatalog
+    app['schooltool.task.messages'][name] = message
+    uid = intids.register(message)
+    MessageCatalog.get()['updated_on'].index_doc(uid, message)
+    return message
+
+
+def doctest_RetentionPurge_purgeTasks():
+    """Tests for RetentionPurge.purgeTasks.
+
+        >>> from schooltool.task.retention import RetentionPurge
+
+    Tasks are kept for 30 days.  Finished tasks scheduled before the
+    cutoff are purged.  Unfinished tasks are kept until they are
+    abandon_factor times past retention: their result may have been
+    lost, so they could stay pending forever.
+
+        >>> tasks = app['schooltool.tasks']
+        >>> tasks.retention
+        datetime.timedelta(30)
+        >>> RetentionPurge.abandon_factor
+        3
+
+        >>> shared = ReportStub(100)
+        >>> t = addTask(app, intids, 'recent', TaskStub(days_ago(29)))
+        >>> t = addTask(app, intids, 'old', TaskStub(days_ago(31), report=shared))
+        >>> t = addTask(app, intids, 'older', TaskStub(days_ago(40), report=shared))
+        >>> t = addTask(app, intids, 'other', TaskStub(days_ago(50),
+        ...                                   report=ReportStub(20)))
+        >>> t = addTask(app, intids, 'running',
+        ...             TaskStub(days_ago(89), finished=False))
+        >>> t = addTask(app, intids, 'lost',
+        ...             TaskStub(days_ago(91), finished=False))
+
+    Report files are counted once, however many purged tasks refer to
+    them.
+
+        >>> result = RetentionPurge(app, now=NOW)()
+        >>> print result.summary()
+        4 tasks, 0 messages purged, 2 report files (120 bytes) released
+        >>> sorted(tasks.keys())
+        [u'recent', u'running']
+
+    Without a retention period nothing is purged.
+
+        >>> tasks.retention = None
+        >>> print RetentionPurge(app, now=days_ago(-365))().summary()
+        0 tasks, 0 messages purged, 0 report files (0 bytes) released
+
+    """
+
+
+def doctest_RetentionPurge_limit():
+    """Tests for RetentionPurge with a limit.
+
+        >>> from schooltool.task.retention import RetentionPurge
+
+        >>> for n in range(5):
+        ...     t = addTask(app, intids, 'task%d' % n, TaskStub(days_ago(40 + n)))
+
+    At most limit objects are deleted in one run, the oldest first.  The
+    transaction is committed every chunk_size deletions if asked to.
+
+        >>> import transaction
+        >>> class DataManagerStub(object):
+        ...     def __init__(self):
+        ...         self.commits = 0
+        ...     def commit(self, transaction):
+        ...         self.commits += 1
+        ...     def abort(self, transaction): pass
+        ...     def tpc_begin(self, transaction): pass
+        ...     def tpc_vote(self, transaction): pass
+        ...     def tpc_finish(self, transaction): pass
+        ...     def tpc_abort(self, transaction): pass
+        ...     def sortKey(self): return 'stub'
+
+        >>> dm = DataManagerStub()
+        >>> transaction.get().join(dm)
+        >>> purge = RetentionPurge(app, now=NOW, chunk_size=2, limit=3,
+        ...                        commit=True)
+        >>> print purge().summary()
+        3 tasks, 0 messages purged, 0 report files (0 bytes) released
+        >>> dm.commits
+        1
+        >>> sorted(app['schooltool.tasks'].keys())
+        [u'task0', u'task1']
+
+        >>> print RetentionPurge(app, now=NOW, limit=3)().summary()
+        2 tasks, 0 messages purged, 0 report files (0 bytes) released
+
+    """
+
+
+def doctest_RetentionPurge_purgeMessages():
+    """Tests for RetentionPurge.purgeMessages.
+
+        >>> from schooltool.task.retention import RetentionPurge
+        >>> from schooltool.task.tasks import markMessagesRead
+
+        >>> messages = app['schooltool.task.messages']
+        >>> messages.retention
+        datetime.timedelta(90)
+
+        >>> reader = RecipientStub()
+        >>> reader_id = intids.register(reader)
+        >>> markMessagesRead(reader, days_ago(95))
+        >>> lurker = RecipientStub()
+        >>> lurker_id = intids.register(lurker)
+        >>> gone_id = 1000
+
+        >>> m = addMessage(app, intids, 'recent',
+        ...     MessageStub(days_ago(80), [reader_id]))
+        >>> m = addMessage(app, intids, 'read',
+        ...     MessageStub(days_ago(100), [reader_id, gone_id]))
+        >>> m = addMessage(app, intids, 'read-later',
+        ...     MessageStub(days_ago(94), [reader_id]))
+        >>> m = addMessage(app, intids, 'unread',
+        ...     MessageStub(days_ago(100), [reader_id, lurker_id]))
+        >>> m = addMessage(app, intids, 'expired',
+        ...     MessageStub(days_ago(100), [lurker_id],
+        ...                 expires_on=days_ago(1)))
+        >>> m = addMessage(app, intids, 'not-expired',
+        ...     MessageStub(days_ago(100), [lurker_id],
+        ...                 expires_on=days_ago(-1)))
+
+        >>> purge = RetentionPurge(app, now=NOW)
+        >>> [(name, purge.isRead(messages[name]))
+        ...  for name in sorted(messages.keys())]
+        [(u'expired', False), (u'not-expired', False), (u'read', True),
+         (u'read-later', False), (u'recent', False), (u'unread', False)]
+        >>> [(name, purge.isExpired(messages[name]))
+        ...  for name in sorted(messages.keys())]
+        [(u'expired', True), (u'not-expired', False), (u'read', False),
+         (u'read-later', False), (u'recent', False), (u'unread', False)]
+
+    Messages past retention are purged if they were read by all
+    recipients still around, or if they expired.
+
+        >>> print purge().summary()
+        0 tasks, 2 messages purged, 0 report files (0 bytes) released
+        >>> sorted(messages.keys())
+        [u'not-expired', u'read-later', u'recent', u'unread']
+
+    """
+
+
+def setUp(test):
+    from schooltool.testing.stubs import AppStub
+    from schooltool.task.tasks import RemoteTaskCatalog, MessageCatalog
+    setup.placefulSetUp()
+    setup.setUpAnnotations()
+    provideAdapter(getAppCatalogs)
+    provideAdapter(getTaskContainerForApp)
+    provideAdapter(getMessageContainerForApp)
+    intids = IntIdsStub()
+    provideUtility(intids, IIntIds)
+    app = AppStub()
+    app['schooltool.tasks'] = TaskContainer()
+    app['schooltool.task.messages'] = MessageContainer()
+    RemoteTaskCatalog(app)()
+    MessageCatalog(app)()
+    test.globs.update({'app': app, 'intids': intids})
+
+
+def tearDown(test):
+    setup.placefulTearDown()
+    abort()
+
+
+def test_suite():
+    optionflags = (doctest.NORMALIZE_WHITESPACE |
+                   doctest.ELLIPSIS | doctest.REPORT_NDIFF)
+    return unittest.TestSuite([
+        doctest.DocTestSuite(setUp=setUp, tearDown=tearDown,
+                             optionflags=optionflags),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -48,6 +48,13 @@ class ITerm(IDateRange, IContained):
         Raises a ValueError if the date is outside of the term covered.
         """
 
+    def countSchooldays(first=None, last=None):
+        """Count schooldays from first to last (inclusive).
+
+        The range is limited to the term; by default the whole term is
+        counted.
+        """
+
 
 class ITermWrite(Interface):
     """A term is a set of school days inside a given date range.
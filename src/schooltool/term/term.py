@@ -24,6 +24,7 @@ from datetime import datetime
 
 import zope.interface
 from zope.event import notify
+from ZODB.POSException import ConflictError
 from zope.proxy import sameProxiedObjects
 from zope.component import adapts
 from zope.component import adapter
@@ -31,6 +32,7 @@ from zope.component import getUtility
 from zope.interface import implements
 from zope.interface import implementer
 from zope.lifecycleevent.interfaces import IObjectRemovedEvent
+from zope.lifecycleevent.interfaces import IObjectMovedEvent
 from zope.container import contained, btree
 
 from schooltool.schoolyear.subscriber import EventAdapterSubscriber
@@ -39,6 +41,8 @@ from schooltool.schoolyear.interfaces import TermOverlapError
 from schooltool.schoolyear.interfaces import ISubscriber
 from schooltool.schoolyear.interfaces import ISchoolYear
 from schooltool.schoolyear.interfaces import ISchoolYearContainer
+from schooltool.schoolyear.dateindex import getRequestDateCache
+from schooltool.schoolyear.schoolyear import updateDateIndex
 from schooltool.app.interfaces import IApplicationPreferences
 from schooltool.app.interfaces import ISchoolToolApplication
 from schooltool.common import IDateRange
@@ -72,14 +76,28 @@ class EmergencyDayEvent(object):
         self.replacement_date = replacement_date
 
 
+def popcount(bits):
+    return bin(bits).count('1')
+
+
 class Term(DateRange, contained.Contained, persistent.Persistent):
+    """A term.
+
+    Schooldays are stored as a bitmap (a long): bit n is set if the
+    date n days after _schooldays_base is a schoolday.  The base is the
+    first date of the term, or earlier if the term was moved.
+    """
     zope.interface.implements(interfaces.ITerm, interfaces.ITermWrite)
 
+    _schooldays_base = None
+    _schooldays_bits = 0
+
     def __init__(self, title, first, last):
         self.title = title
         self._first = first
         self._last = last
-        self._schooldays = set()
+        self._schooldays_base = first
+        self._schooldays_bits = 0
         if last < first:
             raise ValueError("Last date %r less than first date %r" %
                              (last, first))
@@ -123,39 +141,106 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
             raise ValueError("Date %r not in term [%r, %r]" %
                              (date, self.first, self.last))
 
+    def _offset(self, date):
+        return (date - self._schooldays_base).days
+
+    def _rebase(self, date):
+        """Move the bitmap base back to date, if it is earlier."""
+        shift = self._offset(date)
+        if shift < 0:
+            self._schooldays_bits <<= -shift
+            self._schooldays_base = date
+
+    def _rangeMask(self, first, last):
+        """Bits of dates from first to last, inclusive."""
+        lo = max(self._offset(first), 0)
+        hi = self._offset(last) + 1
+        if hi <= lo:
+            return 0
+        return ((1 << (hi - lo)) - 1) << lo
+
+    def _weekdayMask(self, weekdays):
+        """Bits of the term dates that fall on the given weekdays.
+
+        The bitmap must be rebased to the term first.
+        """
+        base_weekday = self._schooldays_base.weekday()
+        pattern = 0
+        for n in range(7):
+            if (base_weekday + n) % 7 in weekdays:
+                pattern |= 1 << n
+        weeks = self._offset(self.last) // 7 + 1
+        # Repeat the 7 bit pattern for every week.
+        repeated = pattern * (((1 << (7 * weeks)) - 1) // 0x7f)
+        return repeated & self._rangeMask(self.first, self.last)
+
     def isSchoolday(self, date):
         self._validate(date)
-        if date in self._schooldays:
-            return True
-        return False
+        offset = self._offset(date)
+        if offset < 0:
+            return False
+        return bool(self._schooldays_bits >> offset & 1)
+
+    def countSchooldays(self, first=None, last=None):
+        if first is None or first < self.first:
+            first = self.first
+        if last is None or last > self.last:
+            last = self.last
+        return popcount(self._schooldays_bits & self._rangeMask(first, last))
 
     def add(self, date):
         self._validate(date)
-        self._schooldays.add(date)
-        self._schooldays = self._schooldays  # persistence
+        self._rebase(date)
+        self._schooldays_bits |= 1 << self._offset(date)
 
     def remove(self, date):
         self._validate(date)
-        self._schooldays.remove(date)
-        self._schooldays = self._schooldays  # persistence
+        if not self.isSchoolday(date):
+            raise KeyError(date)
+        self._schooldays_bits &= ~(1 << self._offset(date))
 
     def addWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays:
-                self.add(date)
+        self._rebase(self.first)
+        self._schooldays_bits |= self._weekdayMask(weekdays)
 
     def removeWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays and self.isSchoolday(date):
-                self.remove(date)
+        self._rebase(self.first)
+        self._schooldays_bits &= ~self._weekdayMask(weekdays)
 
     def toggleWeekdays(self, *weekdays):
-        for date in self:
-            if date.weekday() in weekdays:
-                if self.isSchoolday(date):
-                    self.remove(date)
-                else:
-                    self.add(date)
+        self._rebase(self.first)
+        self._schooldays_bits ^= self._weekdayMask(weekdays)
+
+    def _p_resolveConflict(self, old, committed, new):
+        """Merge concurrent schoolday changes.
+
+        Days added or removed by the new state are applied to the
+        committed one.  Changes to anything else still conflict.
+        """
+        bitmap_keys = ('_schooldays_base', '_schooldays_bits')
+        other = lambda state: dict([(key, value)
+                                    for key, value in state.items()
+                                    if key not in bitmap_keys])
+        try:
+            if other(committed) != other(old) or other(new) != other(old):
+                raise ConflictError
+        except ValueError:
+            # Persistent references that can not be compared.
+            raise ConflictError
+        states = (old, committed, new)
+        bases = [state.get('_schooldays_base') for state in states]
+        if None in bases:
+            raise ConflictError
+        base = min(bases)
+        old_bits, committed_bits, new_bits = [
+            state.get('_schooldays_bits', 0) << (state_base - base).days
+            for state, state_base in zip(states, bases)]
+        added = new_bits & ~old_bits
+        removed = old_bits & ~new_bits
+        resolved = dict(committed)
+        resolved['_schooldays_base'] = base
+        resolved['_schooldays_bits'] = (committed_bits | added) & ~removed
+        return resolved
 
     def reset(self, first, last):
         if last < first:
@@ -164,7 +249,8 @@ class Term(DateRange, contained.Contained, persistent.Persistent):
                              (last, first))
         self.first = first
         self.last = last
-        self._schooldays.clear()
+        self._schooldays_base = first
+        self._schooldays_bits = 0
 
 
 class TermContainer(btree.BTreeContainer):
@@ -176,12 +262,10 @@ def getTermForDate(date):
 
     Returns None if `date` falls outside all terms.
     """
-    terms = interfaces.ITermContainer(date, {})
-    for term in terms.values():
-        if date in term:
-            return term
-    else:
+    syc = ISchoolYearContainer(ISchoolToolApplication(None), None)
+    if syc is None:
         return None
+    return syc.date_index.getTermForDate(date)
 
 
 def getNextTermForDate(date):
@@ -193,20 +277,10 @@ def getNextTermForDate(date):
 
     Returns None if there are no terms.
     """
-    terms = interfaces.ITermContainer(date, {})
-    before, after = [], []
-    for term in terms.values():
-        if date in term:
-            return term
-        if date > term.last:
-            before.append((term.last, term))
-        if date < term.first:
-            after.append((term.first, term))
-    if after:
-        return min(after)[1]
-    if before:
-        return max(before)[1]
-    return None
+    syc = ISchoolYearContainer(ISchoolToolApplication(None), None)
+    if syc is None:
+        return None
+    return syc.date_index.getNextTermForDate(date)
 
 
 def listTerms(context):
@@ -246,14 +320,26 @@ class DateManagerUtility(object):
 
     @property
     def today(self):
+        cache = getRequestDateCache()
+        if cache is not None and 'today' in cache:
+            return cache['today']
         app = ISchoolToolApplication(None)
         tzinfo = pytz.timezone(IApplicationPreferences(app).timezone)
         dt = pytz.utc.localize(datetime.utcnow())
-        return dt.astimezone(tzinfo).date()
+        today = dt.astimezone(tzinfo).date()
+        if cache is not None:
+            cache['today'] = today
+        return today
 
     @property
     def current_term(self):
-        return getNextTermForDate(self.today)
+        cache = getRequestDateCache()
+        if cache is not None and 'current_term' in cache:
+            return cache['current_term']
+        term = getNextTermForDate(self.today)
+        if cache is not None:
+            cache['current_term'] = term
+        return term
 
 
 class TodayDescriptor(object):
@@ -304,6 +390,27 @@ class RemoveTermsWhenSchoolYearIsDeleted(ObjectEventAdapterSubscriber):
             del self.object[term_id]
 
 
+class UpdateDateIndexOnTermMove(ObjectEventAdapterSubscriber):
+    adapts(IObjectMovedEvent, interfaces.ITerm)
+
+    def __call__(self):
+        old_year, new_year = self.event.oldParent, self.event.newParent
+        if old_year is not None:
+            updateDateIndex(old_year.__parent__, exclude=[self.object])
+        if new_year is not None:
+            updateDateIndex(new_year.__parent__)
+
+
+class UpdateDateIndexOnTermChange(EventAdapterSubscriber):
+    adapts(TermAfterChangeEvent)
+    implements(ISubscriber)
+
+    def __call__(self):
+        schoolyear = self.event.term.__parent__
+        if schoolyear is not None:
+            updateDateIndex(schoolyear.__parent__)
+
+
 def validateTermsForOverlap(sy, dr, term):
     overlapping_terms = []
     for other_term in sy.values():
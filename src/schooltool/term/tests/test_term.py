@@ -141,6 +141,39 @@ class TestTerm(unittest.TestCase):
             self.assert_(not cal.isSchoolday(date(2003, 9, day+1)))
             self.assert_(cal.isSchoolday(date(2003, 9, day+2)))
 
+    def testCountSchooldays(self):
+        cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 30))
+        self.assertEqual(cal.countSchooldays(), 0)
+
+        cal.addWeekdays(calendar.MONDAY, calendar.TUESDAY, calendar.WEDNESDAY,
+                        calendar.THURSDAY, calendar.FRIDAY)
+        self.assertEqual(cal.countSchooldays(), 22)
+        self.assertEqual(cal.countSchooldays(date(2003, 9, 6),
+                                             date(2003, 9, 14)), 5)
+        self.assertEqual(cal.countSchooldays(date(2003, 8, 1),
+                                             date(2003, 9, 2)), 2)
+        self.assertEqual(cal.countSchooldays(date(2003, 9, 20),
+                                             date(2003, 9, 10)), 0)
+
+        cal.remove(date(2003, 9, 1))
+        self.assertEqual(cal.countSchooldays(), 21)
+        self.assertRaises(KeyError, cal.remove, date(2003, 9, 1))
+
+    def testMovedTerm(self):
+        cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 14))
+        cal.add(date(2003, 9, 2))
+        cal.first = date(2003, 8, 25)
+        self.assert_(not cal.isSchoolday(date(2003, 8, 25)))
+        cal.add(date(2003, 8, 26))
+        self.assert_(cal.isSchoolday(date(2003, 8, 26)))
+        self.assert_(cal.isSchoolday(date(2003, 9, 2)))
+        cal.addWeekdays(calendar.MONDAY)
+        self.assertEqual([d for d in cal if cal.isSchoolday(d)],
+                         [date(2003, 8, 25), date(2003, 8, 26),
+                          date(2003, 9, 1), date(2003, 9, 2),
+                          date(2003, 9, 8)])
+        self.assertEqual(cal.countSchooldays(), 5)
+
     def test_contains(self):
         cal = term.Term('Sample', date(2003, 9, 1), date(2003, 9, 16))
         self.assert_(date(2003, 8, 31) not in cal)
@@ -197,6 +197,13 @@ class SchooldaysForSchedule(object):
             if date in self:
                 yield date
 
+    def countDates(self, first, last):
+        count = 0
+        for term in self.schoolyear.values():
+            if term.first <= last and first <= term.last:
+                count += term.countSchooldays(first, last)
+        return count
+
 
 class SchooldaysForTimetable(SchooldaysForSchedule):
     adapts(interfaces.ITimetable)
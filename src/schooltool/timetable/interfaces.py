@@ -241,6 +241,9 @@ class ISchooldays(Interface):
     def __contains__(date):
         """Return whether the date is a schoolday."""
 
+    def countDates(first, last):
+        """Count schooldays from first to last (inclusive)."""
+
 
 class ISchoolDayTemplates(IDayTemplateSchedule):
     """Iterator that rotates on schooldays (as opposed to rotating on